@@ -0,0 +1,379 @@
+"""
+Headless HTTP API for missions (plain ASGI, no web framework).
+
+    uvicorn api:app --host 0.0.0.0 --port 8000
+
+Endpoints (JSON unless noted):
+  GET  /healthz
+  POST /v1/missions                  start a mission -> 202 {mission_id, status_url, events_url, result_url}
+  GET  /v1/missions/{id}             status: state, agents done/running, per-agent metrics
+  GET  /v1/missions/{id}/result      outputs + full_report (409 while running)
+  GET  /v1/missions/{id}/events      Server-Sent Events: the mission's ProgressChannel,
+                                     replayed from the start (?tokens=0 drops token events)
+  POST /v1/missions/{id}/cancel      stop after the in-flight agent
+
+Missions run exactly as in the app: a progress.SwarmRunner around
+main.run_marketing_swarm (run_multi_location when "locations" lists more
+than one city), so fair sharing, budgets and metrics all apply.
+
+Auth is HTTP Basic against the users table (bcrypt hashes as written by the
+app). The user's org supplies the plan (package), team_id and the agents the
+org may run. Missions are visible to their own org only (root sees all).
+"""
+import asyncio
+import base64
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from plans import allowed_agents
+from progress import SwarmRunner
+
+DB_PATH = os.getenv("SWARM_DB_PATH", "breatheeasy.db")
+AUTH_CACHE_S = 60.0  # bcrypt is slow on purpose; cache verified (hash, password) pairs briefly
+MISSION_TTL_S = 3600.0  # finished missions are kept this long for status/result/events
+MAX_MISSIONS = 1000
+MAX_BODY_BYTES = 64_000
+SSE_KEEPALIVE_S = 15.0
+MISSION_FIELDS = ("biz_name", "city", "directives", "url", "stream", "fused", "knowledge_scope", "locations")
+
+_ROUTE = re.compile(r"^/v1/missions(?:/(?P<id>[0-9a-f]{32})(?:/(?P<action>result|events|cancel))?)?/?$")
+
+
+class HTTPError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+# ============================================================
+# AUTH (users / orgs tables)
+# ============================================================
+def _check_password(password: str, stored: str) -> bool:
+    """bcrypt only: a stored value that is not a bcrypt hash never authenticates."""
+    stored = stored or ""
+    if not stored.startswith("$2"):
+        return False
+    import bcrypt
+    try:
+        return bcrypt.checkpw(password.encode("utf-8"), stored.encode("utf-8"))
+    except ValueError:
+        return False
+
+
+class Authenticator:
+    def __init__(self, db_path: str = DB_PATH):
+        self.db_path = db_path
+        self._verified: Dict[str, float] = {}  # sha256(stored hash, password) -> verified at
+        self._lock = threading.Lock()
+
+    def _load(self, username: str) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+        conn = sqlite3.connect(self.db_path)
+        conn.row_factory = sqlite3.Row
+        try:
+            user = conn.execute("SELECT * FROM users WHERE username=?", (username,)).fetchone()
+            org = conn.execute("SELECT * FROM orgs WHERE team_id=?", (user["team_id"],)).fetchone() if user else None
+        finally:
+            conn.close()
+        return (dict(user) if user else {}), (dict(org) if org else {})
+
+    def authenticate(self, header: str) -> Dict[str, Any]:
+        """Principal {username, role, team_id, plan, agents} for a Basic auth header; raises HTTPError(401/403)."""
+        if not header.lower().startswith("basic "):
+            raise HTTPError(401, "Basic auth required")
+        try:
+            username, _, password = base64.b64decode(header[6:]).decode("utf-8").partition(":")
+        except Exception:
+            raise HTTPError(401, "Malformed credentials")
+        # user and org are read on every request so disabling a user, changing a
+        # role or suspending an org applies at once; only the bcrypt result is cached
+        user, org = self._load(username)
+        if not user or not self._verify(password, str(user.get("password") or "")):
+            raise HTTPError(401, "Invalid credentials")
+        if not int(user.get("active") or 0):
+            raise HTTPError(403, "User is disabled")
+        role = str(user.get("role") or "viewer").lower()
+        if role != "root" and str(org.get("status") or "active") != "active":
+            raise HTTPError(403, "Organization is not active")
+        principal = {
+            "username": username,
+            "role": role,
+            "team_id": str(user.get("team_id") or ""),
+            "plan": str(org.get("plan") or user.get("plan") or "Lite"),
+            # None = unrestricted; an org without an explicit list gets its plan default, as in the app
+            "agents": None if role == "root" else allowed_agents(org),
+        }
+        return principal
+
+    def _verify(self, password: str, stored: str) -> bool:
+        """_check_password, cached per (stored hash, password); a password change changes the key."""
+        key = hashlib.sha256(f"{stored}\x00{password}".encode("utf-8")).hexdigest()
+        now = time.time()
+        with self._lock:
+            at = self._verified.get(key)
+        if at is not None and now - at < AUTH_CACHE_S:
+            return True
+        if not _check_password(password, stored):
+            return False
+        with self._lock:
+            self._verified = {k: t for k, t in self._verified.items() if now - t < AUTH_CACHE_S}
+            self._verified[key] = now
+        return True
+
+
+# ============================================================
+# MISSIONS
+# ============================================================
+class Mission:
+    def __init__(self, mission_id: str, principal: Dict[str, Any], runner: SwarmRunner):
+        self.id = mission_id
+        self.team_id = principal["team_id"]
+        self.created_by = principal["username"]
+        self.created_at = time.time()
+        self.runner = runner
+        self.done_agents: List[str] = []
+        self.error = ""
+        # Updated as events are published (created before runner.start()), so
+        # nothing queues between status polls.
+        runner.channel.listen(self._on_event)
+
+    def _on_event(self, evt: Dict[str, Any]):
+        if evt["type"] == "agent_done":
+            self.done_agents.append(evt["agent"])
+        elif evt["type"] == "mission_error":
+            self.error = str(evt.get("error") or "")
+
+    @property
+    def state(self) -> str:
+        if not self.runner.done.is_set():
+            return "stopping" if self.runner.control.stopped else "running"
+        if self.error:
+            return "error"
+        return "stopped" if self.runner.control.stopped else "done"
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "mission_id": self.id,
+            "state": self.state,
+            "created_at": self.created_at,
+            "created_by": self.created_by,
+            "agents": self.runner.agents,
+            "done": list(self.done_agents),
+            "running": self.runner.current,
+            "metrics": self.runner.metrics_snapshot(),
+            "error": self.error,
+        }
+
+
+class SwarmAPI:
+    """
+    The ASGI application. run_fn / multi_fn / agent_keys default to main's
+    mission entry points and TOGGLE_KEYS (loaded on first use); the load test
+    passes a stub run_fn.
+    """
+
+    def __init__(self, run_fn: Optional[Callable[..., Any]] = None, multi_fn: Optional[Callable[..., Any]] = None,
+                 db_path: str = DB_PATH, agent_keys: Optional[List[str]] = None):
+        self.run_fn = run_fn
+        self.multi_fn = multi_fn
+        self.agent_keys = set(agent_keys) if agent_keys else None
+        self.auth = Authenticator(db_path)
+        self.missions: Dict[str, Mission] = {}
+
+    # -- plumbing
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            while True:
+                msg = await receive()
+                if msg["type"] == "lifespan.startup":
+                    await send({"type": "lifespan.startup.complete"})
+                elif msg["type"] == "lifespan.shutdown":
+                    await send({"type": "lifespan.shutdown.complete"})
+                    return
+        if scope["type"] != "http":
+            return
+        try:
+            await self._dispatch(scope, receive, send)
+        except HTTPError as e:
+            await _send_json(send, e.status, {"error": e.message},
+                             extra=[(b"www-authenticate", b'Basic realm="swarm"')] if e.status == 401 else None)
+
+    async def _principal(self, scope) -> Dict[str, Any]:
+        header = _header(scope, b"authorization")
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, self.auth.authenticate, header)
+
+    async def _dispatch(self, scope, receive, send):
+        method, path = scope["method"], scope["path"]
+        if path == "/healthz":
+            running = sum(1 for m in self.missions.values() if not m.runner.done.is_set())
+            return await _send_json(send, 200, {"ok": True, "missions": len(self.missions), "running": running})
+        match = _ROUTE.match(path)
+        if not match:
+            raise HTTPError(404, "Not found")
+        principal = await self._principal(scope)
+        mission_id, action = match.group("id"), match.group("action")
+        if mission_id is None:
+            if method != "POST":
+                raise HTTPError(405, "Use POST to create a mission")
+            body = await _read_body(receive)
+            return await _send_json(send, 202, self._create(principal, body))
+        mission = self._get(principal, mission_id)
+        if action is None and method == "GET":
+            return await _send_json(send, 200, mission.status())
+        if action == "result" and method == "GET":
+            if not mission.runner.done.is_set():
+                raise HTTPError(409, "Mission still running")
+            return await _send_json(send, 200, {"mission_id": mission.id, "state": mission.state,
+                                                "error": mission.error, "results": mission.runner.results})
+        if action == "cancel" and method == "POST":
+            mission.runner.control.stop()
+            return await _send_json(send, 202, {"mission_id": mission.id, "state": mission.state})
+        if action == "events" and method == "GET":
+            tokens = b"tokens=0" not in scope.get("query_string", b"")
+            return await self._events(mission, send, receive, tokens)
+        raise HTTPError(405, "Method not allowed")
+
+    # -- handlers
+    def _create(self, principal: Dict[str, Any], body: bytes) -> Dict[str, Any]:
+        try:
+            req = json.loads(body or b"{}")
+        except ValueError:
+            raise HTTPError(400, "Body must be JSON")
+        if not isinstance(req, dict) or not str(req.get("biz_name") or "").strip():
+            raise HTTPError(400, "biz_name is required")
+        if self.agent_keys is None:
+            from main import TOGGLE_KEYS
+            self.agent_keys = set(TOGGLE_KEYS)
+        agents = [str(a).strip() for a in req.get("agents") or [] if str(a).strip() in self.agent_keys]
+        if not agents:
+            raise HTTPError(400, f"agents must list one or more of: {', '.join(sorted(self.agent_keys))}")
+        allowed = principal["agents"]
+        if allowed is not None:
+            denied = [a for a in agents if a not in allowed]
+            if denied:
+                raise HTTPError(403, f"Not enabled for this organization: {', '.join(denied)}")
+        self._prune()
+        mission_id = uuid.uuid4().hex
+        payload = {k: req[k] for k in MISSION_FIELDS if k in req}
+        payload.update(
+            biz_name=str(req["biz_name"]).strip(),
+            city=str(req.get("city") or "USA"),
+            package=principal["plan"],
+            team_id=principal["team_id"],
+            mission_id=mission_id,
+        )
+        multi = len(payload.get("locations") or []) > 1
+        run_fn = (self.multi_fn if multi else self.run_fn) or _default_run_fn(multi)
+        runner = SwarmRunner(payload, agents, run_fn, inbox=False)
+        self.missions[mission_id] = Mission(mission_id, principal, runner)
+        runner.start()
+        base = f"/v1/missions/{mission_id}"
+        return {"mission_id": mission_id, "agents": agents, "status_url": base,
+                "events_url": f"{base}/events", "result_url": f"{base}/result"}
+
+    def _get(self, principal: Dict[str, Any], mission_id: str) -> Mission:
+        mission = self.missions.get(mission_id)
+        if mission is None or (principal["role"] != "root" and mission.team_id != principal["team_id"]):
+            raise HTTPError(404, "Mission not found")
+        return mission
+
+    def _prune(self):
+        now = time.time()
+        for mid, m in list(self.missions.items()):
+            if m.runner.done.is_set() and now - m.created_at > MISSION_TTL_S:
+                del self.missions[mid]
+        if len(self.missions) >= MAX_MISSIONS:
+            raise HTTPError(503, "Too many missions in flight; retry later")
+
+    async def _events(self, mission: Mission, send, receive, tokens: bool):
+        """SSE stream of the mission's events, replayed from the start, until mission_done/error."""
+        await send({"type": "http.response.start", "status": 200, "headers": [
+            (b"content-type", b"text/event-stream"), (b"cache-control", b"no-cache"), (b"x-accel-buffering", b"no"),
+        ]})
+        inbox = mission.runner.channel.subscribe(replay=True)
+        disconnected = asyncio.Event()
+
+        async def _watch():
+            while (await receive())["type"] != "http.disconnect":
+                pass
+            disconnected.set()
+
+        watcher = asyncio.ensure_future(_watch())
+        seq, idle, last_sent = 0, 0.02, time.time()
+        try:
+            while not disconnected.is_set():
+                batch = []
+                while len(batch) < 200:
+                    try:
+                        batch.append(inbox.get_nowait())
+                    except Exception:
+                        break
+                if not batch:
+                    if mission.runner.done.is_set() and inbox.empty():
+                        break
+                    if time.time() - last_sent > SSE_KEEPALIVE_S:
+                        await send({"type": "http.response.body", "body": b": keepalive\n\n", "more_body": True})
+                        last_sent = time.time()
+                    await asyncio.sleep(idle)
+                    idle = min(0.25, idle * 2)  # back off while the mission is quiet
+                    continue
+                idle = 0.02
+                chunks, final = [], False
+                for evt in batch:
+                    seq += 1
+                    if evt["type"] == "token" and not tokens:
+                        continue
+                    chunks.append(f"id: {seq}\nevent: {evt['type']}\ndata: {json.dumps(evt, default=str)}\n\n")
+                    final = final or evt["type"] in ("mission_done", "mission_error")
+                if chunks:
+                    await send({"type": "http.response.body", "body": "".join(chunks).encode("utf-8"), "more_body": True})
+                    last_sent = time.time()
+                if final:
+                    break
+        finally:
+            mission.runner.channel.unsubscribe(inbox)
+            watcher.cancel()
+        if not disconnected.is_set():
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+
+
+def _default_run_fn(multi: bool) -> Callable[..., Any]:
+    from main import run_marketing_swarm, run_multi_location
+
+    return run_multi_location if multi else run_marketing_swarm
+
+
+def _header(scope, name: bytes) -> str:
+    for k, v in scope.get("headers") or []:
+        if k.lower() == name:
+            return v.decode("latin-1")
+    return ""
+
+
+async def _read_body(receive) -> bytes:
+    body, more = b"", True
+    while more:
+        msg = await receive()
+        body += msg.get("body", b"")
+        more = msg.get("more_body", False)
+        if len(body) > MAX_BODY_BYTES:
+            raise HTTPError(413, "Body too large")
+    return body
+
+
+async def _send_json(send, status: int, obj: Any, extra: Optional[List[Tuple[bytes, bytes]]] = None):
+    body = json.dumps(obj, default=str).encode("utf-8")
+    headers = [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())] + (extra or [])
+    await send({"type": "http.response.start", "status": status, "headers": headers})
+    await send({"type": "http.response.body", "body": body})
+
+
+app = SwarmAPI()
@@ -3,11 +3,12 @@
 # ===========================
 import os
 import json
-import time
+import hashlib
 import sqlite3
+import uuid
 from io import BytesIO
 from datetime import datetime
-from typing import Dict, Any, List, Tuple
+from typing import Dict, Any, List, Optional, Tuple
 
 import streamlit as st
 import pandas as pd
@@ -15,13 +16,21 @@ import streamlit_authenticator as stauth
 from docx import Document
 from fpdf import FPDF
 
-from main import run_marketing_swarm
+from main import VAULT_PAYLOAD_FIELDS, mission_input_hashes, research_input_hash, run_marketing_swarm, run_multi_location
+from progress import SwarmRunner
+from routing import estimate_cost, models_for, tier_report
+from digest import estimate_tokens
+import similarity
+from scheduler import CADENCES, create_schedule, init_schedule_tables, set_active
+from fair_share import FAIR_SHARE, PLAN_WEIGHTS
+from fanout import normalize_locations
+from report_store import REPORTS, ReportView
+from plans import default_allowed_agents_for_plan, stored_allowed_agents
 
 APP_NAME = "SwarmDigiz"
-DB_PATH = "breatheeasy.db"
+DB_PATH = os.getenv("SWARM_DB_PATH", "breatheeasy.db")  # shared with scheduler.py
 
 PLAN_SEATS = {"Lite": 1, "Basic": 1, "Pro": 5, "Enterprise": 20, "Unlimited": 9999}
-PLAN_AGENT_LIMITS = {"Lite": 3, "Basic": 3, "Pro": 5, "Enterprise": 8, "Unlimited": 12}
 
 st.set_page_config(page_title=APP_NAME, layout="wide", initial_sidebar_state="expanded")
 
@@ -45,14 +54,24 @@ ss_init("swarm_running", False)
 ss_init("swarm_paused", False)
 ss_init("swarm_stop", False)
 ss_init("swarm_autorun", True)
-ss_init("swarm_autodelay", 3)
-ss_init("swarm_next_ts", 0.0)
+ss_init("swarm_autodelay", 0)  # optional rate-limit spacing between agents (s)
 ss_init("swarm_queue", [])
-ss_init("swarm_idx", 0)
+ss_init("swarm_runner", None)
+ss_init("swarm_stream", True)
+ss_init("swarm_fused", False)
+ss_init("swarm_similar", False)  # opt-in: reuse outputs of near-identical past missions
+ss_init("swarm_delta", False)  # revise the latest vault report instead of regenerating
+ss_init("swarm_kb_tenant", False)  # share the research knowledge index across the team's missions
+ss_init("extra_locations", [])  # multi-location (franchise) mission: more cities besides the target
+ss_init("city_reports", {})  # {city: report_id} from the last multi-location mission
+ss_init("swarm_partial", {})  # agent -> streamed text kept when a run is stopped
+ss_init("swarm_metrics", {})  # agent -> {ttft_s, total_s, ...}
 ss_init("swarm_payload", {})
 ss_init("last_active_swarm", [])
 
-ss_init("report", {})
+ss_init("report_id", "")  # report text lives in report_store.REPORTS, not in the session
+ss_init("report_hashes", {})  # agent -> input hash of the output in report
+ss_init("swarm_hashes", {})  # input hashes of the mission in flight
 ss_init("gen", False)
 
 
@@ -95,7 +114,7 @@ DEPLOY_PROTOCOL = [
     "Configure mission: Brand + Location + Directives + Website URL (for Audit).",
     "Pick unlocked agents (locked are grayed out).",
     "Launch Swarm. Agents run sequentially.",
-    "Use Pause/Stop while running; outputs appear per seat.",
+    "Use Pause/Stop while running; Stop aborts the in-flight agent. Outputs appear per seat.",
     "Export deliverables and save to Reports Vault.",
     "Manage projects/leads and collaboration in Team Intel.",
 ]
@@ -226,6 +245,23 @@ inject_theme_css()
 def db_conn() -> sqlite3.Connection:
     return sqlite3.connect(DB_PATH, check_same_thread=False)
 
+# Per-rerun read snapshot: app.py re-executes top to bottom on every rerun, so this
+# dict starts empty each time and identical SELECTs within one rerun hit SQLite once.
+_QUERY_SNAPSHOT: Dict[Tuple[str, Tuple], pd.DataFrame] = {}
+
+def snapshot_query(sql: str, params: Tuple = ()) -> pd.DataFrame:
+    """Read-only query memoized for the current rerun. Callers must not mutate the frame."""
+    key = (sql, tuple(params))
+    if key not in _QUERY_SNAPSHOT:
+        conn = db_conn()
+        _QUERY_SNAPSHOT[key] = pd.read_sql_query(sql, conn, params=tuple(params))
+        conn.close()
+    return _QUERY_SNAPSHOT[key]
+
+def invalidate_snapshot():
+    """Call after a write when the same rerun reads the table again."""
+    _QUERY_SNAPSHOT.clear()
+
 def ensure_column(conn: sqlite3.Connection, table: str, col: str, col_def: str):
     cur = conn.cursor()
     cur.execute(f"PRAGMA table_info({table})")
@@ -329,6 +365,30 @@ def init_db_once():
             created_at TEXT DEFAULT (datetime('now'))
         )
     """)
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS mission_signatures (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            team_id TEXT,
+            city_norm TEXT,
+            signature_json TEXT,
+            url_hash TEXT,
+            outputs_json TEXT,
+            created_at TEXT DEFAULT (datetime('now'))
+        )
+    """)
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_mission_signatures_city ON mission_signatures(city_norm)")
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS mission_reuse_log (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            team_id TEXT,
+            source_team_id TEXT,
+            similarity REAL,
+            agents_json TEXT,
+            tokens_saved INTEGER,
+            cost_saved REAL,
+            created_at TEXT DEFAULT (datetime('now'))
+        )
+    """)
     cur.execute("""
         CREATE TABLE IF NOT EXISTS feedback (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -342,6 +402,9 @@ def init_db_once():
 
     ensure_column(conn, "orgs", "allowed_agents_json", "TEXT DEFAULT ''")
     ensure_column(conn, "orgs", "seats_allowed", "INTEGER DEFAULT 1")
+    ensure_column(conn, "reports_vault", "payload_json", "TEXT DEFAULT ''")
+    ensure_column(conn, "orgs", "share_pool", "INTEGER DEFAULT 0")  # opt-in to cross-tenant mission reuse
+    ensure_column(conn, "mission_signatures", "trade", "TEXT DEFAULT ''")  # similarity.trade
 
     # Seed geo if empty
     cur.execute("SELECT COUNT(*) FROM geo_locations")
@@ -384,8 +447,10 @@ def init_db_once():
             VALUES ('admin','admin@customer.ai','Org Admin',?, 'admin',1,'Lite',999,1,'ORG_001')
         """, (admin_pw,))
 
+    init_schedule_tables(conn)  # recurring missions (scheduler.py runs them)
     conn.commit()
     conn.close()
+    REPORTS.prune()  # unsaved reports older than REPORT_TTL_DAYS
 
 init_db_once()
 
@@ -401,15 +466,11 @@ def log_audit(team_id: str, actor: str, role: str, action: str, obj_type="", obj
         pass
 
 def get_user(username: str) -> Dict[str, Any]:
-    conn = db_conn()
-    df = pd.read_sql_query("SELECT * FROM users WHERE username=?", conn, params=(username,))
-    conn.close()
+    df = snapshot_query("SELECT * FROM users WHERE username=?", (username,))
     return df.iloc[0].to_dict() if not df.empty else {}
 
 def get_org(team_id: str) -> Dict[str, Any]:
-    conn = db_conn()
-    df = pd.read_sql_query("SELECT * FROM orgs WHERE team_id=?", conn, params=(team_id,))
-    conn.close()
+    df = snapshot_query("SELECT * FROM orgs WHERE team_id=?", (team_id,))
     return df.iloc[0].to_dict() if not df.empty else {"team_id": team_id, "org_name": team_id, "plan": "Lite", "seats_allowed": 1}
 
 def normalize_role(role: str) -> str:
@@ -417,9 +478,7 @@ def normalize_role(role: str) -> str:
     return role if role in {"viewer","editor","admin","root"} else "viewer"
 
 def active_user_count(team_id: str) -> int:
-    conn = db_conn()
-    df = pd.read_sql_query("SELECT COUNT(*) AS n FROM users WHERE team_id=? AND active=1 AND role!='root'", conn, params=(team_id,))
-    conn.close()
+    df = snapshot_query("SELECT COUNT(*) AS n FROM users WHERE team_id=? AND active=1 AND role!='root'", (team_id,))
     return int(df.iloc[0]["n"] or 0)
 
 def seats_allowed_for_team(team_id: str) -> int:
@@ -437,28 +496,16 @@ def can(role: str, perm: str) -> bool:
     perms = PERMISSIONS.get(normalize_role(role), {"read"})
     return "*" in perms or perm in perms or perm == "read"
 
-def plan_agent_limit(plan: str) -> int:
-    return int(PLAN_AGENT_LIMITS.get(plan, 3))
-
-def default_allowed_agents_for_plan(plan: str) -> List[str]:
-    keys = [k for _, k in AGENT_UI]
-    return keys[:min(plan_agent_limit(plan), len(keys))]
-
 def get_allowed_agents(team_id: str) -> List[str]:
     org = get_org(team_id)
-    raw = (org.get("allowed_agents_json") or "").strip()
-    try:
-        lst = json.loads(raw) if raw else []
-    except Exception:
-        lst = []
-    valid = {k for _, k in AGENT_UI}
-    lst = [x for x in lst if x in valid]
+    lst = stored_allowed_agents(org)
     if lst:
         return lst
     auto = default_allowed_agents_for_plan(org.get("plan", "Lite"))
     conn = db_conn()
     conn.execute("UPDATE orgs SET allowed_agents_json=? WHERE team_id=?", (json.dumps(auto), team_id))
     conn.commit(); conn.close()
+    invalidate_snapshot()
     return auto
 
 def set_org_plan_and_auto_agents(team_id: str, plan: str) -> List[str]:
@@ -469,6 +516,7 @@ def set_org_plan_and_auto_agents(team_id: str, plan: str) -> List[str]:
     conn.execute("UPDATE orgs SET plan=?, seats_allowed=?, allowed_agents_json=? WHERE team_id=?",
                  (plan, int(seats), json.dumps(agents), team_id))
     conn.commit(); conn.close()
+    invalidate_snapshot()
     return agents
 
 # ============================================================
@@ -559,6 +607,29 @@ org = get_org(my_team)
 org_plan = str(org.get("plan", "Lite"))
 unlocked_agents = [k for _, k in AGENT_UI] if is_root else get_allowed_agents(my_team)
 
+def city_report_ids(payload: Dict[str, Any]) -> Dict[str, str]:
+    """Stored report id per city of a multi-location mission."""
+    mid = payload.get("mission_id", "")
+    return {c: f"{mid}:{i}" for i, c in enumerate(normalize_locations(payload.get("locations") or []))}
+
+def restore_report():
+    """A refresh starts a new session; reopen the report named in the URL if it belongs to this team."""
+    rid = st.query_params.get("report")
+    if st.session_state["report_id"] or not rid:
+        return
+    meta = REPORTS.meta(rid)
+    if not meta or meta["team_id"] != my_team:
+        return
+    st.session_state["report_id"] = rid
+    st.session_state["swarm_payload"] = meta["payload"]
+    st.session_state["last_active_swarm"] = meta["agents"]
+    if len(meta["payload"].get("locations") or []) > 1:
+        st.session_state["city_reports"] = {c: r for c, r in city_report_ids(meta["payload"]).items() if REPORTS.meta(r)}
+        st.session_state["city_report_pick"] = next((c for c, r in st.session_state["city_reports"].items() if r == rid), None)
+    st.session_state["gen"] = True
+
+restore_report()
+
 # ============================================================
 # SWARM RUNNER HELPERS
 # ============================================================
@@ -566,7 +637,7 @@ def is_placeholder(val: Any) -> bool:
     if val is None:
         return True
     s = str(val).strip().lower()
-    return (not s) or s.startswith("agent not selected") or "no output returned" in s
+    return (not s) or s.startswith("agent not selected") or "no output returned" in s or s.startswith("⏱ timed out")
 
 def build_full_report(payload: Dict[str, Any], report: Dict[str, Any]) -> str:
     now = datetime.now().strftime("%Y-%m-%d %H:%M")
@@ -577,26 +648,218 @@ def build_full_report(payload: Dict[str, Any], report: Dict[str, Any]) -> str:
             parts.append(f"## {label}\n{report.get(k)}")
     return head + ("\n\n".join(parts) if parts else "## Summary\nNo outputs generated.")
 
-def run_one(agent_key: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+def current_report() -> ReportView:
+    """The session's report; sections are read from the store on access."""
+    return REPORTS.view(st.session_state["report_id"])
+
+def open_report(report_id: str):
+    st.session_state["report_id"] = report_id
+    st.query_params["report"] = report_id  # a refresh reopens it
+
+def update_report(sections: Dict[str, Any]):
+    """Store changed sections and rebuild full_report from the stored seats."""
+    rid = st.session_state["report_id"]
+    if not rid:
+        payload = st.session_state.get("swarm_payload") or {}
+        rid = payload.get("mission_id") or uuid.uuid4().hex
+        REPORTS.create(rid, my_team, payload, st.session_state.get("last_active_swarm") or [])
+        open_report(rid)
+    REPORTS.put(rid, sections)
+    REPORTS.put(rid, {"full_report": build_full_report(st.session_state.get("swarm_payload") or {}, current_report())})
+
+def session_payload(payload: Dict[str, Any]) -> Dict[str, Any]:
+    """The payload kept in the session: inputs only, not the other outputs it carries."""
+    return {k: v for k, v in payload.items() if k not in {"prior_outputs", "previous_report", "resume_partial"}}
+
+def run_one(agent_key: str, payload: Dict[str, Any], resume_from: str = "") -> Dict[str, Any]:
     p = dict(payload)
     p["active_swarm"] = [agent_key]
+    p["stream"] = False  # synchronous call; nothing to stream into
+    # other seats' outputs feed strategist's synthesis digest
+    p["prior_outputs"] = {k: v for k, v in current_report().items()
+                          if k not in {agent_key, "full_report"} and not is_placeholder(v)}
+    if resume_from:
+        p["resume_partial"] = {agent_key: resume_from}
     return run_marketing_swarm(p) or {}
 
-def retry_agent(agent_key: str):
-    payload = dict(st.session_state.get("swarm_payload") or {})
-    if not payload:
+def reusable(val: Any) -> bool:
+    """A stored output that can stand in for a re-run (not empty, failed or timed out)."""
+    return not is_placeholder(val) and not str(val).lstrip().startswith(("❌", "Missing website URL"))
+
+def mission_payload() -> Dict[str, Any]:
+    """Mission payload from the current sidebar inputs."""
+    return {
+        "biz_name": st.session_state["biz_name"].strip(),
+        "city": st.session_state.get("target_location") or "USA",
+        "directives": st.session_state["directives"].strip(),
+        "url": st.session_state["website_url"].strip(),
+        "package": org_plan,
+        "stream": bool(st.session_state["swarm_stream"]),
+        "fused": bool(st.session_state["swarm_fused"]),
+        "team_id": my_team,
+        "knowledge_scope": "tenant" if st.session_state["swarm_kb_tenant"] else "mission",
+        "locations": ([st.session_state.get("target_location") or "USA"] + list(st.session_state["extra_locations"])
+                      if st.session_state["extra_locations"] else []),
+    }
+
+def show_city_report():
+    """Swap the seats to another city's report from the last multi-location mission."""
+    city = st.session_state.get("city_report_pick")
+    rid = (st.session_state.get("city_reports") or {}).get(city)
+    if rid:
+        open_report(rid)
+        meta = REPORTS.meta(rid)
+        if meta:
+            st.session_state["swarm_payload"] = meta["payload"]
+        st.session_state["report_hashes"] = {}
+        st.session_state["gen"] = True
+
+def carry_research_brief(payload: Dict[str, Any], prev: Dict[str, Any]):
+    """Reuse the previous mission's brief when the research inputs are unchanged."""
+    if prev.get("research_brief") and research_input_hash(payload) == research_input_hash(prev):
+        payload["research_brief"] = prev["research_brief"]
+
+
+def latest_vault_report(team_id: str, biz_name: str, location: str) -> Optional[Dict[str, Any]]:
+    """Most recent vault report for this brand + location, or None."""
+    conn = db_conn()
+    row = conn.execute("""
+        SELECT id, name, report_json, payload_json, created_at FROM reports_vault
+        WHERE team_id=? AND lower(trim(biz_name))=lower(?) AND lower(trim(location))=lower(?)
+        ORDER BY id DESC LIMIT 1
+    """, (team_id, biz_name.strip(), location.strip())).fetchone()
+    conn.close()
+    if not row:
+        return None
+    try:
+        outputs = json.loads(row[2] or "{}")
+        inputs = json.loads(row[3] or "{}")
+    except ValueError:
+        return None
+    return {"id": row[0], "name": row[1], "outputs": outputs, "inputs": inputs, "date": row[4]}
+
+def _url_hash(url: str) -> str:
+    return hashlib.sha256(url.strip().lower().encode("utf-8")).hexdigest()[:16] if url.strip() else ""
+
+def record_mission_signature(team_id: str, payload: Dict[str, Any], report: Dict[str, Any]):
+    """Index a finished mission (outputs scrubbed per similarity.py) for near-duplicate reuse."""
+    brand, url = payload.get("biz_name", ""), payload.get("url", "")
+    outputs = {k: similarity.scrub(report[k], brand, url) for _, k in AGENT_UI if reusable(report.get(k))}
+    if not outputs:
+        return
+    conn = db_conn()
+    conn.execute("""
+        INSERT INTO mission_signatures (team_id,city_norm,signature_json,url_hash,outputs_json,trade)
+        VALUES (?,?,?,?,?,?)
+    """, (team_id, similarity.normalize_city(payload.get("city", "")), json.dumps(similarity.signature(payload)),
+          _url_hash(url), json.dumps(outputs), similarity.trade(payload)))
+    conn.commit(); conn.close()
+
+def find_similar_mission(team_id: str, payload: Dict[str, Any], wanted: List[str]) -> Optional[Dict[str, Any]]:
+    """
+    Best near-identical past mission in the same city that can supply any of
+    `wanted` under the privacy rules. Returns {"outputs", "similarity",
+    "source_team_id"} with outputs restored for this brand.
+    """
+    my_trade = similarity.trade(payload)
+    if not my_trade:
+        return None  # no known trade, nothing is comparable
+    me_shares = int(get_org(team_id).get("share_pool") or 0)
+    conn = db_conn()
+    rows = conn.execute("""
+        SELECT s.team_id, s.signature_json, s.url_hash, s.outputs_json, s.trade FROM mission_signatures s
+        LEFT JOIN orgs o ON o.team_id = s.team_id
+        WHERE s.city_norm=? AND s.trade=? AND (s.team_id=? OR (?=1 AND COALESCE(o.share_pool,0)=1))
+        ORDER BY s.id DESC LIMIT 200
+    """, (similarity.normalize_city(payload.get("city", "")), my_trade, team_id, me_shares)).fetchall()
+    conn.close()
+
+    url_hash = _url_hash(payload.get("url", ""))
+    candidates = []
+    for src_team, sig_json, src_url_hash, outputs_json, src_trade in rows:
+        try:
+            outputs = json.loads(outputs_json or "{}")
+        except ValueError:
+            continue
+        same_team = src_team == team_id
+        allowed = similarity.allowed_agents(
+            [k for k in wanted if k in outputs], same_team,
+            url_matches=bool(url_hash) and url_hash == src_url_hash, both_opted_in=bool(me_shares),
+        )
+        if allowed:
+            candidates.append({"signature": json.loads(sig_json or "[]"), "source_team_id": src_team,
+                               "trade": src_trade, "outputs": {k: outputs[k] for k in allowed}})
+    threshold = float(os.getenv("SWARM_SIMILARITY_THRESHOLD", similarity.DEFAULT_THRESHOLD))
+    match = similarity.best_match(similarity.signature(payload), candidates, my_trade, threshold)
+    if match is None:
+        return None
+    brand, url = payload.get("biz_name", ""), payload.get("url", "")
+    match["outputs"] = {k: similarity.restore(v, brand, url) for k, v in match["outputs"].items()}
+    return match
+
+def log_mission_reuse(team_id: str, match: Dict[str, Any]):
+    """Record a near-duplicate hit with the estimated output tokens and cost it saved."""
+    tokens = cost = 0
+    for key, text in match["outputs"].items():
+        t = estimate_tokens(text)
+        tokens += t
+        cost += estimate_cost(models_for(key)[0], 0, t)
+    conn = db_conn()
+    conn.execute("""
+        INSERT INTO mission_reuse_log (team_id,source_team_id,similarity,agents_json,tokens_saved,cost_saved)
+        VALUES (?,?,?,?,?,?)
+    """, (team_id, match["source_team_id"], match["similarity"], json.dumps(sorted(match["outputs"])), tokens, cost))
+    conn.commit(); conn.close()
+
+def retry_agent(agent_key: str, resume_from: str = "", force: bool = False):
+    prev = dict(st.session_state.get("swarm_payload") or {})
+    if not prev:
         st.error("No mission payload found. Launch a swarm first.")
         return
-    with st.status(f"Retrying {agent_key}…", expanded=False):
-        out = run_one(agent_key, payload)
-    rep = dict(st.session_state.get("report") or {})
+    # pick up sidebar edits; an agent whose inputs did not change keeps its output
+    payload = mission_payload() if st.session_state["biz_name"].strip() else dict(prev)
+    carry_research_brief(payload, prev)
+    payload["mission_id"] = prev.get("mission_id") or uuid.uuid4().hex  # same knowledge index
+    selected = list(st.session_state.get("last_active_swarm") or [agent_key])
+    if agent_key not in selected:
+        selected.append(agent_key)
+    new_hash = mission_input_hashes(selected, payload)[agent_key]
+    rep = current_report()
+    if (not force and not resume_from and reusable(rep.get(agent_key))
+            and st.session_state["report_hashes"].get(agent_key) == new_hash):
+        st.toast(f"Inputs unchanged — kept the existing {agent_key} output.", icon="♻️")
+        return
+
+    verb, done = ("Resuming", "Resumed") if resume_from else ("Retrying", "Retried")
+    with st.status(f"{verb} {agent_key}…", expanded=False):
+        out = run_one(agent_key, payload, resume_from=resume_from)
+    st.session_state["swarm_payload"] = session_payload(payload)
     if agent_key in out:
-        rep[agent_key] = out.get(agent_key)
-    rep["full_report"] = build_full_report(payload, rep)
-    st.session_state["report"] = rep
-    st.toast(f"✅ Retried {agent_key}", icon="✅")
+        st.session_state["report_hashes"][agent_key] = new_hash
+    update_report({agent_key: out[agent_key]} if agent_key in out else {})
+    REPORTS.update_meta(st.session_state["report_id"], payload=payload, agents=selected)
+    st.session_state["swarm_partial"].pop(agent_key, None)
+    st.toast(f"✅ {done} {agent_key}", icon="✅")
     st.rerun()
 
+def queue_retry(agent_key: str, resume_from: str = "", force: bool = False):
+    """Button callback: retry_agent runs in the script body (st.status/st.rerun do nothing in callbacks)."""
+    st.session_state["retry_request"] = (agent_key, resume_from, force)
+
+def keep_partial(agent_key: str):
+    partial = st.session_state["swarm_partial"].pop(agent_key, "")
+    if partial:
+        update_report({agent_key: partial})
+
+def save_edit(agent_key: str):
+    """Store a Refine Intel edit, so exports, the vault and a refresh all see it."""
+    text = st.session_state.get(f"ed_{agent_key}")
+    if text is not None and text != current_report().get(agent_key):
+        update_report({agent_key: text})
+
+def discard_partial(agent_key: str):
+    st.session_state["swarm_partial"].pop(agent_key, None)
+
 def report_integrity(report: Dict[str, Any], selected: List[str]) -> pd.DataFrame:
     rows = []
     for _lbl, k in AGENT_UI:
@@ -625,9 +888,7 @@ with st.sidebar:
     st.text_area("✍️ Strategic Directives", key="directives", height=90)
 
     # Dynamic Geo + save custom
-    conn = db_conn()
-    geo_df = pd.read_sql_query("SELECT state, city FROM geo_locations WHERE team_id IN ('', ?) ORDER BY state, city", conn, params=(my_team,))
-    conn.close()
+    geo_df = snapshot_query("SELECT state, city FROM geo_locations WHERE team_id IN ('', ?) ORDER BY state, city", (my_team,))
     states = sorted(list(geo_df["state"].unique()))
     state = st.selectbox("🎯 Target State", states)
     mode = st.radio("City", ["Pick from list", "Add custom"], horizontal=True, key="city_mode")
@@ -644,11 +905,27 @@ with st.sidebar:
             st.rerun()
 
     full_loc = f"{city}, {state}".strip(", ").strip()
+    st.session_state["target_location"] = full_loc
+    all_locs = [f"{r['city']}, {r['state']}" for r in geo_df.to_dict("records")]
+    st.multiselect("🏙️ More locations (multi-location mission)", [l for l in all_locs if l != full_loc],
+                   key="extra_locations",
+                   help="Same brand in several cities: shared work runs once, city-specific sections per city.")
 
     st.divider()
     st.checkbox("🔔 Notify when complete", key="notify_on_done")
     st.checkbox("⚡ Auto-run remaining agents", key="swarm_autorun")
-    st.selectbox("⏱ Auto-run delay", [1, 3, 5], key="swarm_autodelay")
+    st.checkbox("📡 Stream output live", key="swarm_stream")
+    st.checkbox("🧬 Fuse light agents (Ads/Social/GBP/GEO in one call)", key="swarm_fused")
+    st.checkbox("🔎 Reuse near-identical past missions", key="swarm_similar",
+                help="Reuse sections from a near-identical earlier mission in the same city (privacy rules apply).")
+    st.checkbox("🗂 Update from previous report", key="swarm_delta",
+                help="Revise the latest saved vault report for this brand + city instead of regenerating it.")
+    st.checkbox("📚 Share research across this team's missions", key="swarm_kb_tenant",
+                help="Search results and scraped pages stay searchable for later missions of this team.")
+    st.selectbox("⏱ Rate-limit delay (s)", [0, 1, 3, 5], key="swarm_autodelay")
+    if st.session_state["city_reports"]:
+        st.selectbox("📍 City report", list(st.session_state["city_reports"]), key="city_report_pick",
+                     on_change=show_city_report)
 
     # Navigation hint while running
     if st.session_state["swarm_running"]:
@@ -672,22 +949,76 @@ with st.sidebar:
             elif not selected:
                 st.warning("Select at least one agent.")
             else:
-                st.session_state["swarm_payload"] = {
-                    "biz_name": st.session_state["biz_name"].strip(),
-                    "city": full_loc or "USA",
-                    "directives": st.session_state["directives"].strip(),
-                    "url": st.session_state["website_url"].strip(),
-                    "package": org_plan,
-                }
-                st.session_state["swarm_queue"] = selected[:]
-                st.session_state["swarm_idx"] = 0
-                st.session_state["swarm_next_ts"] = time.time()
+                payload = mission_payload()
+                payload["mission_id"] = uuid.uuid4().hex
+                prev = st.session_state.get("swarm_payload") or {}
+                carry_research_brief(payload, prev)
+
+                # Only agents whose input hash changed are re-run; the rest keep their output.
+                # Multi-location missions always run in full (outputs are per city).
+                multi = len(payload["locations"]) > 1
+                hashes = mission_input_hashes(selected, payload)
+                prev_rep = current_report()
+                prev_hashes = st.session_state["report_hashes"]
+                reused = {k: prev_rep[k] for k in selected
+                          if not multi and prev_hashes.get(k) == hashes[k] and reusable(prev_rep.get(k))}
+                to_run = [k for k in selected if k not in reused]
+                st.session_state["city_reports"] = {}
+
+                # an agent of this brand re-run because its inputs changed is never replaced by a near-match
+                same_brand = similarity.normalize(prev.get("biz_name", "")) == similarity.normalize(payload["biz_name"])
+                changed = [k for k in to_run if same_brand and k in prev_hashes and prev_hashes[k] != hashes[k]]
+                wanted = [k for k in to_run if k not in changed]
+                if st.session_state["swarm_similar"] and wanted and not multi:
+                    match = find_similar_mission(my_team, payload, wanted)
+                    if match:
+                        reused.update(match["outputs"])
+                        to_run = [k for k in to_run if k not in match["outputs"]]
+                        log_mission_reuse(my_team, match)
+                        st.toast(f"🔎 Near-identical mission found ({match['similarity']:.0%}); "
+                                 f"reused {len(match['outputs'])} sections.", icon="🔎")
+
+                rep = dict(reused)
+                rep["full_report"] = build_full_report(payload, rep)
+                REPORTS.create(payload["mission_id"], my_team, payload, selected, sections=rep)
+                open_report(payload["mission_id"])
+                st.session_state["report_hashes"] = {k: hashes[k] for k in reused}
+                st.session_state["swarm_hashes"] = hashes
+                st.session_state["swarm_partial"] = {}
+                st.session_state["last_active_swarm"] = selected[:]
+                if reused:
+                    payload["prior_outputs"] = reused  # strategist's digest still sees them
+                st.session_state["swarm_payload"] = session_payload(payload)
+
+                if st.session_state["swarm_delta"] and to_run and not multi:
+                    prior = latest_vault_report(my_team, payload["biz_name"], payload["city"])
+                    if prior:
+                        payload["previous_report"] = {
+                            "outputs": {k: v for k, v in prior["outputs"].items() if k in to_run},
+                            "inputs": prior["inputs"],
+                            "date": prior["date"],
+                        }
+                        st.toast(f"🗂 Updating from “{prior['name']}”.", icon="🗂")
+                    else:
+                        st.toast("No saved report for this brand + city — generating in full.", icon="ℹ️")
+
+                if not to_run:
+                    st.session_state["gen"] = True
+                    st.toast(f"Inputs unchanged — reused all {len(reused)} outputs.", icon="♻️")
+                    st.rerun()
+                st.session_state["swarm_queue"] = to_run[:]
+                st.session_state["swarm_runner"] = SwarmRunner(
+                    payload, to_run, run_multi_location if multi else run_marketing_swarm,
+                    min_interval_s=float(st.session_state["swarm_autodelay"]),
+                    pause_after_each=not st.session_state["swarm_autorun"],
+                ).start()
                 st.session_state["swarm_running"] = True
                 st.session_state["swarm_paused"] = False
                 st.session_state["swarm_stop"] = False
-                st.session_state["report"] = {}
+                st.session_state["swarm_metrics"] = {}
                 st.session_state["gen"] = False
-                st.session_state["last_active_swarm"] = selected[:]
+                if reused:
+                    st.toast(f"♻️ Reusing {len(reused)} unchanged outputs; running {len(to_run)}.", icon="♻️")
                 st.toast("Swarm started 🚀", icon="🚀")
                 st.rerun()
     else:
@@ -695,15 +1026,24 @@ with st.sidebar:
         c1,c2,c3 = st.columns(3)
         with c1:
             if st.button("⏸ Pause", use_container_width=True, key="pause_btn"):
+                if st.session_state["swarm_runner"] is not None:
+                    st.session_state["swarm_runner"].control.pause()
                 st.session_state["swarm_paused"] = True
                 st.rerun()
         with c2:
             if st.button("▶ Resume", use_container_width=True, key="resume_btn"):
+                if st.session_state["swarm_runner"] is not None:
+                    st.session_state["swarm_runner"].control.resume()
                 st.session_state["swarm_paused"] = False
-                st.session_state["swarm_next_ts"] = time.time()
                 st.rerun()
         with c3:
             if st.button("🛑 Stop", use_container_width=True, key="stop_btn"):
+                if st.session_state["swarm_runner"] is not None:
+                    st.session_state["swarm_runner"].control.stop()
+                    # keep streamed drafts so the seat can resume or discard them
+                    st.session_state["swarm_partial"] = {
+                        k: v for k, v in st.session_state["swarm_runner"].partial.items() if v
+                    }
                 st.session_state["swarm_stop"] = True
                 st.session_state["swarm_running"] = False
                 st.toast("Swarm stopped.", icon="🛑")
@@ -712,40 +1052,70 @@ with st.sidebar:
     authenticator.logout("🔒 Sign Out", "sidebar")
 
 # ============================================================
-# SWARM RUNNER (auto tick)
+# SWARM RUNNER (event-driven)
 # ============================================================
-if st.session_state["swarm_running"] and (not st.session_state["swarm_paused"]) and (not st.session_state["swarm_stop"]):
-    if time.time() >= float(st.session_state["swarm_next_ts"]):
-        q = st.session_state["swarm_queue"]
-        idx = int(st.session_state["swarm_idx"])
-
-        if idx >= len(q):
-            st.session_state["swarm_running"] = False
-            st.session_state["gen"] = True
-            if st.session_state.get("notify_on_done", True):
-                st.toast("✅ Swarm completed.", icon="✅")
-            st.rerun()
-
-        agent = q[idx]
-        payload = dict(st.session_state["swarm_payload"])
-        with st.status(f"Running {agent}…", expanded=False):
-            try:
-                out = run_one(agent, payload)
-            except Exception as e:
-                out = {agent: f"❌ Error: {e}"}
-
-        rep = dict(st.session_state["report"] or {})
-        if agent in out:
-            rep[agent] = out.get(agent)
-        rep["full_report"] = build_full_report(payload, rep)
-        st.session_state["report"] = rep
-
-        st.session_state["swarm_idx"] = idx + 1
-        st.session_state["swarm_next_ts"] = time.time() + float(st.session_state["swarm_autodelay"]) if st.session_state["swarm_autorun"] else 10**12
-        if not st.session_state["swarm_autorun"]:
-            st.session_state["swarm_paused"] = True
-
-        st.rerun()
+# The mission runs on a background thread (progress.SwarmRunner). Each rerun
+# applies whatever events arrived; the live wait at the bottom of the script
+# reruns as soon as the next event lands instead of polling on a timer.
+def apply_runner_events(runner: SwarmRunner, events: List[Dict[str, Any]]):
+    payload = dict(st.session_state["swarm_payload"] or {})
+    done: Dict[str, str] = {}
+    for evt in events:
+        if evt["type"] == "metric":
+            vals = {k: v for k, v in evt.items() if k not in {"type", "ts", "agent"}}
+            st.session_state["swarm_metrics"].setdefault(evt["agent"], {}).update(vals)
+        elif evt["type"] == "agent_done":
+            done[evt["agent"]] = evt.get("output", "")
+            if evt["agent"] in st.session_state["swarm_hashes"]:
+                st.session_state["report_hashes"][evt["agent"]] = st.session_state["swarm_hashes"][evt["agent"]]
+            if runner.control.paused:
+                st.session_state["swarm_paused"] = True
+        elif evt["type"] == "research_brief":
+            # retries of this mission reuse the brief instead of re-researching
+            st.session_state["swarm_payload"]["research_brief"] = evt.get("brief", "")
+        elif evt["type"] == "mission_error":
+            st.error(f"❌ Swarm error: {evt.get('error')}")
+    if done:
+        update_report(done)
+
+    if runner.done.is_set() and st.session_state["swarm_running"]:
+        if len(payload.get("locations") or []) > 1:
+            # per-city reports replace the [CITY] templates shown while running
+            ids = city_report_ids(payload)
+            city_reports = {}
+            for city, out in runner.results.items():
+                if isinstance(out, dict) and city in ids:
+                    REPORTS.create(ids[city], my_team, dict(payload, city=city),
+                                   st.session_state["last_active_swarm"], sections=out)
+                    city_reports[city] = ids[city]
+            st.session_state["city_reports"] = city_reports
+            if city_reports:
+                st.session_state["city_report_pick"] = next(iter(city_reports))
+                show_city_report()
+        else:
+            REPORTS.update_meta(st.session_state["report_id"], payload=st.session_state["swarm_payload"])
+            if not st.session_state["swarm_stop"]:
+                record_mission_signature(my_team, payload, current_report())
+        st.session_state["swarm_running"] = False
+        st.session_state["swarm_paused"] = False
+        st.session_state["gen"] = True
+        if st.session_state.get("notify_on_done", True) and not st.session_state["swarm_stop"]:
+            st.toast("✅ Swarm completed.", icon="✅")
+
+_runner = st.session_state.get("swarm_runner")
+if _runner is not None:
+    apply_runner_events(_runner, _runner.drain())
+    if _runner.done.is_set() and not st.session_state["swarm_running"]:
+        # Outputs are in REPORTS now; the finished runner would pin its event
+        # history, results and partial drafts in the session until logout.
+        st.session_state["swarm_runner"] = None
+
+_retry = st.session_state.pop("retry_request", None)
+if _retry is not None:
+    retry_agent(*_retry)
+
+# Seat placeholders registered by render_seat for the agent currently streaming.
+LIVE_SLOTS: Dict[str, Any] = {}
 
 # ============================================================
 # GUIDE + SEATS
@@ -776,7 +1146,7 @@ def render_guide():
 
     st.markdown("---")
     st.subheader("Report Integrity Check")
-    rep = st.session_state.get("report", {}) or {}
+    rep = current_report()
     selected = st.session_state.get("last_active_swarm", []) or []
     if not selected:
         st.info("Run a swarm to see integrity.")
@@ -790,28 +1160,29 @@ def render_guide():
         cols = st.columns(4)
         for i, a in enumerate(empty):
             with cols[i % 4]:
-                st.button(f"Retry {a}", key=f"retry_integrity_{a}", on_click=retry_agent, args=(a,), use_container_width=True)
+                st.button(f"Retry {a}", key=f"retry_integrity_{a}", on_click=queue_retry, args=(a,), use_container_width=True)
 
 def render_seat(label: str, key: str):
     st.subheader(f"{label} Seat")
     st.caption(AGENT_SPECS.get(key, ""))
     st.info(seat_how_to_use(key))
 
-    rep = st.session_state.get("report", {}) or {}
+    rep = current_report()
     if key not in rep or is_placeholder(rep.get(key)):
         st.warning("No report yet. Select agent + run Swarm.")
         if key in (st.session_state.get("last_active_swarm") or []):
-            st.button("🔁 Retry this agent", key=f"retry_in_seat_{key}", on_click=retry_agent, args=(key,))
+            st.button("🔁 Retry this agent", key=f"retry_in_seat_{key}", on_click=queue_retry, args=(key,))
         return
 
-    edited = st.text_area("Refine Intel", value=str(rep.get(key)), height=380, key=f"ed_{key}")
+    edited = st.text_area("Refine Intel", value=str(rep.get(key)), height=380, key=f"ed_{key}",
+                          on_change=save_edit, args=(key,))
     c1, c2, c3 = st.columns(3)
     with c1:
         st.download_button("📄 Word", export_word(edited, label), file_name=f"{key}.docx", key=f"w_{key}", use_container_width=True)
     with c2:
         st.download_button("📕 PDF", export_pdf(edited, label), file_name=f"{key}.pdf", key=f"p_{key}", use_container_width=True)
     with c3:
-        st.button("🔁 Retry", key=f"retry_btn_{key}", on_click=retry_agent, args=(key,), use_container_width=True)
+        st.button("🔁 Retry", key=f"retry_btn_{key}", on_click=queue_retry, args=(key,), use_container_width=True)
 
 def render_team_intel(key_prefix: str):
     """
@@ -821,16 +1192,16 @@ def render_team_intel(key_prefix: str):
     st.caption("Viewer sees read-only. Admin sees full tools. Same tab layout always.")
     is_admin_like = (my_role in {"admin","root"})
 
-    tabs = st.tabs(["📌 Projects", "📋 Kanban Leads", "🧾 Reports Vault", "👥 Users & RBAC", "🔐 Security Logs", "💬 Feedback", "⬆ Upgrade"])
+    # Radio instead of st.tabs: only the selected section runs its queries/widgets.
+    sections = ["📌 Projects", "📋 Kanban Leads", "🧾 Reports Vault", "👥 Users & RBAC", "🔐 Security Logs", "💬 Feedback", "⬆ Upgrade"]
+    section = st.radio("Section", sections, horizontal=True, key=f"{key_prefix}_section", label_visibility="collapsed")
 
     def viewer_notice():
         st.info("Viewer access: read-only. Ask Org Admin for create/edit access.")
 
     # Projects
-    with tabs[0]:
-        conn = db_conn()
-        df = pd.read_sql_query("SELECT id,name,owner,status,created_at FROM projects WHERE team_id=? ORDER BY id DESC", conn, params=(my_team,))
-        conn.close()
+    if section == sections[0]:
+        df = snapshot_query("SELECT id,name,owner,status,created_at FROM projects WHERE team_id=? ORDER BY id DESC", (my_team,))
         st.dataframe(df, use_container_width=True, hide_index=True)
 
         if is_admin_like:
@@ -853,7 +1224,7 @@ def render_team_intel(key_prefix: str):
             viewer_notice()
 
     # Kanban
-    with tabs[1]:
+    if section == sections[1]:
         st.subheader("Kanban (drag-like)")
         kanban_board(my_team, editable=is_admin_like)
         if not is_admin_like:
@@ -876,13 +1247,11 @@ def render_team_intel(key_prefix: str):
                     st.rerun()
 
     # Vault
-    with tabs[2]:
-        conn = db_conn()
-        vdf = pd.read_sql_query("SELECT id,name,biz_name,location,created_by,created_at FROM reports_vault WHERE team_id=? ORDER BY id DESC", conn, params=(my_team,))
-        conn.close()
+    if section == sections[2]:
+        vdf = snapshot_query("SELECT id,name,biz_name,location,created_by,created_at FROM reports_vault WHERE team_id=? ORDER BY id DESC", (my_team,))
         st.dataframe(vdf, use_container_width=True, hide_index=True)
 
-        rep = st.session_state.get("report", {}) or {}
+        rep = current_report()
         if is_admin_like and rep:
             with st.form(f"{key_prefix}_vault_save"):
                 name = st.text_input("Report name", value=f"{st.session_state.get('biz_name','Report')} • {datetime.now().strftime('%Y-%m-%d %H:%M')}", key=f"{key_prefix}_vault_name")
@@ -891,10 +1260,11 @@ def render_team_intel(key_prefix: str):
                 payload = st.session_state.get("swarm_payload", {}) or {}
                 conn = db_conn()
                 conn.execute("""
-                    INSERT INTO reports_vault (team_id,name,created_by,location,biz_name,selected_agents_json,report_json,full_report)
-                    VALUES (?,?,?,?,?,?,?,?)
+                    INSERT INTO reports_vault (team_id,name,created_by,location,biz_name,selected_agents_json,report_json,full_report,payload_json)
+                    VALUES (?,?,?,?,?,?,?,?,?)
                 """, (my_team,name,me["username"],payload.get("city",""),payload.get("biz_name",""),
-                      json.dumps(st.session_state.get("last_active_swarm",[])), json.dumps(rep), rep.get("full_report","")))
+                      json.dumps(st.session_state.get("last_active_swarm",[])), json.dumps(dict(rep)), rep.get("full_report",""),
+                      json.dumps({k: payload.get(k, "") for k in VAULT_PAYLOAD_FIELDS})))
                 conn.commit(); conn.close()
                 log_audit(my_team, me["username"], my_role, "vault.save", "report", "", name)
                 st.success("Saved.")
@@ -902,11 +1272,55 @@ def render_team_intel(key_prefix: str):
         elif not is_admin_like:
             viewer_notice()
 
+        # Recurring missions: scheduler.py runs them off-peak and saves the result here.
+        st.markdown("#### ⏰ Scheduled Missions")
+        sdf = snapshot_query("""
+            SELECT id,name,cadence,window_start,window_end,tz,active,next_run_at AS next_run_utc,last_run_at,last_status
+            FROM mission_schedules WHERE team_id=? ORDER BY id DESC
+        """, (my_team,))
+        st.dataframe(sdf, use_container_width=True, hide_index=True)
+        payload = st.session_state.get("swarm_payload", {}) or {}
+        if is_admin_like and payload.get("biz_name"):
+            with st.form(f"{key_prefix}_sched_add"):
+                sname = st.text_input("Schedule name", value=f"{payload['biz_name']} • {payload.get('city','')}", key=f"{key_prefix}_sched_name")
+                c1, c2, c3 = st.columns(3)
+                cadence = c1.selectbox("Cadence", CADENCES, index=1, key=f"{key_prefix}_sched_cadence")
+                weekday = c2.selectbox("Weekday (weekly)", list(range(7)), format_func=lambda d: "MonTueWedThuFriSatSun"[d*3:d*3+3], key=f"{key_prefix}_sched_wd")
+                tz = c3.text_input("Timezone", value="America/Chicago", key=f"{key_prefix}_sched_tz")
+                w1, w2 = st.columns(2)
+                wstart = w1.text_input("Window start", value="01:00", key=f"{key_prefix}_sched_ws")
+                wend = w2.text_input("Window end", value="05:00", key=f"{key_prefix}_sched_we")
+                add = st.form_submit_button("Schedule Last Mission", use_container_width=True)
+            if add:
+                agents = st.session_state.get("last_active_swarm", []) or []
+                keep = {k: v for k, v in payload.items() if k not in {"prior_outputs", "previous_report", "resume_partial", "mission_id", "research_brief"}}
+                conn = db_conn()
+                try:
+                    sid = create_schedule(conn, my_team, sname, keep, agents, created_by=me["username"],
+                                          cadence=cadence, weekday=weekday, window=(wstart, wend), tz=tz)
+                except ValueError as e:
+                    sid = None
+                    st.error(str(e))
+                finally:
+                    conn.close()
+                if sid is not None:
+                    log_audit(my_team, me["username"], my_role, "schedule.create", "schedule", str(sid), sname)
+                    st.success("Scheduled.")
+                    st.rerun()
+        if is_admin_like and not sdf.empty:
+            c1, c2 = st.columns(2)
+            sid = c1.selectbox("Schedule", sdf["id"].tolist(), key=f"{key_prefix}_sched_pick")
+            if c2.button("⏯ Pause / Resume", use_container_width=True, key=f"{key_prefix}_sched_toggle"):
+                paused = not bool(sdf.loc[sdf["id"] == sid, "active"].iloc[0])
+                conn = db_conn()
+                set_active(conn, int(sid), my_team, active=paused)  # resuming books the next window
+                conn.close()
+                log_audit(my_team, me["username"], my_role, "schedule.toggle", "schedule", str(sid), "")
+                st.rerun()
+
     # Users/RBAC
-    with tabs[3]:
-        conn = db_conn()
-        udf = pd.read_sql_query("SELECT username,name,email,role,credits,active,last_login_at,created_at FROM users WHERE team_id=? AND role!='root' ORDER BY created_at DESC", conn, params=(my_team,))
-        conn.close()
+    if section == sections[3]:
+        udf = snapshot_query("SELECT username,name,email,role,credits,active,last_login_at,created_at FROM users WHERE team_id=? AND role!='root' ORDER BY created_at DESC", (my_team,))
         st.dataframe(udf, use_container_width=True, hide_index=True)
 
         if is_admin_like:
@@ -931,14 +1345,12 @@ def render_team_intel(key_prefix: str):
             viewer_notice()
 
     # Logs
-    with tabs[4]:
-        conn = db_conn()
-        logs = pd.read_sql_query("SELECT timestamp,actor,actor_role,action_type,object_type,object_id,details FROM audit_logs WHERE team_id=? ORDER BY id DESC LIMIT 250", conn, params=(my_team,))
-        conn.close()
+    if section == sections[4]:
+        logs = snapshot_query("SELECT timestamp,actor,actor_role,action_type,object_type,object_id,details FROM audit_logs WHERE team_id=? ORDER BY id DESC LIMIT 250", (my_team,))
         st.dataframe(logs, use_container_width=True, hide_index=True)
 
     # Feedback
-    with tabs[5]:
+    if section == sections[5]:
         st.subheader("Feedback")
         with st.form(f"{key_prefix}_feedback"):
             rating = st.selectbox("Rating", [5,4,3,2,1], index=0, key=f"{key_prefix}_fb_rating")
@@ -949,15 +1361,14 @@ def render_team_intel(key_prefix: str):
             conn.execute("INSERT INTO feedback (team_id,username,rating,message) VALUES (?,?,?,?)",
                          (my_team, me["username"], int(rating), msg))
             conn.commit(); conn.close()
+            invalidate_snapshot()
             st.success("Thanks — feedback received.")
 
-        conn = db_conn()
-        fdf = pd.read_sql_query("SELECT rating,message,username,created_at FROM feedback WHERE team_id=? ORDER BY id DESC LIMIT 50", conn, params=(my_team,))
-        conn.close()
+        fdf = snapshot_query("SELECT rating,message,username,created_at FROM feedback WHERE team_id=? ORDER BY id DESC LIMIT 50", (my_team,))
         st.dataframe(fdf, use_container_width=True, hide_index=True)
 
     # Upgrade request
-    with tabs[6]:
+    if section == sections[6]:
         st.subheader("Upgrade Plan")
         st.info("In this build, upgrades are requests. Root Admin can apply plan upgrades manually.")
         with st.form(f"{key_prefix}_upgrade_req"):
@@ -972,18 +1383,28 @@ def render_root_admin():
     st.header("🛡 SaaS Root Admin")
     st.caption("Manage orgs, users, credits, plan upgrades, health, and logs.")
 
-    tabs = st.tabs(["🏢 Orgs", "👥 Users", "💳 Credits", "⬆ Upgrades", "🩺 SaaS Health", "📜 Global Logs"])
+    sections = ["🏢 Orgs", "👥 Users", "💳 Credits", "⬆ Upgrades", "🩺 SaaS Health", "📜 Global Logs"]
+    section = st.radio("Section", sections, horizontal=True, key="root_admin_section", label_visibility="collapsed")
 
-    with tabs[0]:
-        conn = db_conn()
-        odf = pd.read_sql_query("SELECT team_id,org_name,plan,seats_allowed,status,allowed_agents_json,created_at FROM orgs ORDER BY created_at DESC", conn)
-        conn.close()
+    if section == sections[0]:
+        odf = snapshot_query("SELECT team_id,org_name,plan,seats_allowed,status,allowed_agents_json,share_pool,created_at FROM orgs ORDER BY created_at DESC")
         st.dataframe(odf, use_container_width=True, hide_index=True)
 
-    with tabs[1]:
-        conn = db_conn()
-        udf = pd.read_sql_query("SELECT username,name,email,role,credits,active,team_id,created_at FROM users ORDER BY created_at DESC", conn)
-        conn.close()
+        with st.form("root_share_pool"):
+            st.caption("Shared mission pool: opted-in orgs reuse each other's market-level sections (scrubbed of brand, URL and contacts).")
+            team_id = st.text_input("Team ID", key="sp_team")
+            share = st.checkbox("Opt in to shared pool", key="sp_share")
+            submit = st.form_submit_button("Apply", use_container_width=True)
+        if submit:
+            conn = db_conn()
+            conn.execute("UPDATE orgs SET share_pool=? WHERE team_id=?", (1 if share else 0, team_id.strip()))
+            conn.commit(); conn.close()
+            invalidate_snapshot()
+            st.success("Updated.")
+            st.rerun()
+
+    if section == sections[1]:
+        udf = snapshot_query("SELECT username,name,email,role,credits,active,team_id,created_at FROM users ORDER BY created_at DESC")
         st.dataframe(udf, use_container_width=True, hide_index=True)
 
         st.markdown("### Add / Remove / Deactivate User")
@@ -1013,7 +1434,7 @@ def render_root_admin():
                 st.success("User deleted.")
             st.rerun()
 
-    with tabs[2]:
+    if section == sections[2]:
         st.subheader("Credits")
         with st.form("root_credits"):
             team_id = st.text_input("Team ID", key="rc_team")
@@ -1028,7 +1449,7 @@ def render_root_admin():
             st.success("Applied.")
             st.rerun()
 
-    with tabs[3]:
+    if section == sections[3]:
         st.subheader("Manual Plan Upgrade")
         team_id = st.text_input("Org Team ID", key="up_team")
         plan = st.selectbox("New Plan", ["Lite","Pro","Enterprise","Unlimited"], index=1, key="up_plan")
@@ -1037,20 +1458,46 @@ def render_root_admin():
             st.success(f"Updated {team_id} → {plan} agents={agents}")
             st.rerun()
 
-    with tabs[4]:
+    if section == sections[4]:
         st.subheader("SaaS Health")
-        conn = db_conn()
-        tables = pd.read_sql_query("SELECT name FROM sqlite_master WHERE type='table' ORDER BY name", conn)
-        conn.close()
+        tables = snapshot_query("SELECT name FROM sqlite_master WHERE type='table' ORDER BY name")
         st.dataframe(tables, use_container_width=True, hide_index=True)
         st.write("UTC:", datetime.utcnow().isoformat())
         st.write("Python:", os.sys.version.split()[0])
+        st.markdown("#### Model tiers (since process start)")
+        tiers = tier_report()
+        if tiers:
+            st.dataframe(pd.DataFrame(tiers), use_container_width=True, hide_index=True)
+        else:
+            st.caption("No agent calls yet.")
+        st.markdown("#### Fair-share queue (this server process)")
+        queue = FAIR_SHARE.snapshot()
+        if queue:
+            st.dataframe(pd.DataFrame(queue), use_container_width=True, hide_index=True)
+            st.caption(f"Global concurrency: {FAIR_SHARE.global_concurrency} agents • "
+                       f"weights: {', '.join(f'{p} {w:g}' for p, w in PLAN_WEIGHTS.items())}")
+        else:
+            st.caption("No agents admitted yet.")
+        cache = REPORTS.cache.stats()
+        st.caption(f"Report section cache: {cache['entries']} entries • {cache['bytes'] / 1e6:.1f} / "
+                   f"{cache['max_bytes'] / 1e6:.0f} MB • hits {cache['hits']} / misses {cache['misses']}")
+        st.markdown("#### Near-duplicate reuse")
+        reuse = snapshot_query("""
+            SELECT CASE WHEN team_id=source_team_id THEN 'same tenant' ELSE 'cross tenant' END AS scope,
+                   COUNT(*) AS hits, ROUND(AVG(similarity),3) AS avg_similarity,
+                   SUM(tokens_saved) AS output_tokens_saved, ROUND(SUM(cost_saved),4) AS est_cost_saved_usd
+            FROM mission_reuse_log GROUP BY scope
+        """)
+        if reuse.empty:
+            st.caption("No cache hits yet.")
+        else:
+            st.dataframe(reuse, use_container_width=True, hide_index=True)
+        sigs = snapshot_query("SELECT COUNT(*) AS indexed_missions FROM mission_signatures")
+        st.caption(f"Indexed missions: {int(sigs.iloc[0]['indexed_missions'])}")
         st.info("If agents fail: check GOOGLE_API_KEY / SERPER_API_KEY, rate limits, and main.py output keys.")
 
-    with tabs[5]:
-        conn = db_conn()
-        gdf = pd.read_sql_query("SELECT timestamp,team_id,actor,actor_role,action_type,object_type,object_id,details FROM audit_logs ORDER BY id DESC LIMIT 500", conn)
-        conn.close()
+    if section == sections[5]:
+        gdf = snapshot_query("SELECT timestamp,team_id,actor,actor_role,action_type,object_type,object_id,details FROM audit_logs ORDER BY id DESC LIMIT 500")
         st.dataframe(gdf, use_container_width=True, hide_index=True)
 
 # ============================================================
@@ -1082,12 +1529,16 @@ def render_guide():
 
     st.markdown("---")
     st.subheader("Report Integrity Check")
-    rep = st.session_state.get("report", {}) or {}
+    rep = current_report()
     selected = st.session_state.get("last_active_swarm", []) or []
     if not selected:
         st.info("Run a swarm to see integrity.")
         return
     df = report_integrity(rep, selected)
+    metrics = st.session_state.get("swarm_metrics") or {}
+    if metrics:
+        for col in ("model", "ttft_s", "total_s", "cost_usd", "tool_calls", "tool_budget_hit", "page_digests"):
+            df[col] = df["agent"].map(lambda a, c=col: metrics.get(a, {}).get(c))
     st.dataframe(df, use_container_width=True, hide_index=True)
 
     empty = [r["agent"] for r in df.to_dict("records") if r["status"] == "EMPTY"]
@@ -1096,37 +1547,60 @@ def render_guide():
         cols = st.columns(4)
         for i, a in enumerate(empty):
             with cols[i % 4]:
-                st.button(f"Retry {a}", key=f"retry_integrity_{a}", on_click=retry_agent, args=(a,), use_container_width=True)
+                st.button(f"Retry {a}", key=f"retry_integrity_{a}", on_click=queue_retry, args=(a,), use_container_width=True)
 
 def render_seat(label: str, key: str):
     st.subheader(f"{label} Seat")
     st.caption(AGENT_SPECS.get(key, ""))
     st.info(seat_how_to_use(key))
 
-    rep = st.session_state.get("report", {}) or {}
+    rep = current_report()
+    runner = st.session_state.get("swarm_runner")
+    if st.session_state["swarm_running"] and runner is not None and runner.current == key:
+        st.caption("📡 Streaming…" if st.session_state["swarm_payload"].get("stream") else "⏳ Running…")
+        LIVE_SLOTS[key] = st.empty()
+        LIVE_SLOTS[key].markdown(runner.partial.get(key, ""))
+        return
+
+    partial = (st.session_state.get("swarm_partial") or {}).get(key)
+    if (key not in rep or is_placeholder(rep.get(key))) and partial:
+        st.warning("Stopped mid-run. Partial output kept — resume, keep, or discard it.")
+        with st.expander("Partial output", expanded=True):
+            st.markdown(partial)
+        c1, c2, c3 = st.columns(3)
+        with c1:
+            st.button("▶ Resume", key=f"resume_partial_{key}", on_click=queue_retry, args=(key, partial), use_container_width=True)
+        with c2:
+            st.button("✅ Keep as is", key=f"keep_partial_{key}", on_click=keep_partial, args=(key,), use_container_width=True)
+        with c3:
+            st.button("🗑 Discard", key=f"discard_partial_{key}", on_click=discard_partial, args=(key,), use_container_width=True)
+        return
+
     if key not in rep or is_placeholder(rep.get(key)):
         st.warning("No report yet. Select agent + run Swarm.")
         if key in (st.session_state.get("last_active_swarm") or []):
-            st.button("🔁 Retry this agent", key=f"retry_in_seat_{key}", on_click=retry_agent, args=(key,))
+            st.button("🔁 Retry this agent", key=f"retry_in_seat_{key}", on_click=queue_retry, args=(key,))
         return
 
-    edited = st.text_area("Refine Intel", value=str(rep.get(key)), height=380, key=f"ed_{key}")
-    c1, c2, c3 = st.columns(3)
+    edited = st.text_area("Refine Intel", value=str(rep.get(key)), height=380, key=f"ed_{key}",
+                          on_change=save_edit, args=(key,))
+    c1, c2, c3, c4 = st.columns(4)
     with c1:
         st.download_button("📄 Word", export_word(edited, label), file_name=f"{key}.docx", key=f"w_{key}", use_container_width=True)
     with c2:
         st.download_button("📕 PDF", export_pdf(edited, label), file_name=f"{key}.pdf", key=f"p_{key}", use_container_width=True)
     with c3:
-        st.button("🔁 Retry", key=f"retry_btn_{key}", on_click=retry_agent, args=(key,), use_container_width=True)
+        st.button("🔁 Retry", key=f"retry_btn_{key}", on_click=queue_retry, args=(key,), use_container_width=True,
+                  help="Re-runs only if this agent's inputs changed since the output was made.")
+    with c4:
+        st.button("♻️ Regenerate", key=f"regen_btn_{key}", on_click=queue_retry, args=(key, "", True), use_container_width=True)
 
 # ============================================================
 # DRAG-LIKE KANBAN (HTML + session_state, no custom component)
 # ============================================================
 def kanban_board(team_id: str, editable: bool):
     stages = ["Discovery", "Execution", "ROI Verified"]
-    conn = db_conn()
-    df = pd.read_sql_query("SELECT id,title,city,service,stage,created_at FROM leads WHERE team_id=? ORDER BY id DESC", conn, params=(team_id,))
-    conn.close()
+    df = snapshot_query("SELECT id,title,city,service,stage,created_at FROM leads WHERE team_id=? ORDER BY id DESC", (team_id,))
 
     cols = st.columns(3)
     for i, stage in enumerate(stages):
@@ -1231,31 +1705,48 @@ org_plan = str(org.get("plan", "Lite"))
 unlocked_agents = [k for _, k in AGENT_UI] if is_root else get_allowed_agents(my_team)
 
 # ============================================================
-# MAIN NAV TABS
+# MAIN NAV (only the active view executes)
 # ============================================================
-tab_labels = ["📖 Guide"] + [lbl for lbl, _ in AGENT_UI] + ["🤝 Team Intel"]
+# st.tabs runs every tab body on each rerun; a radio-driven view keeps
+# seats, Team Intel and admin consoles from querying when not visible.
+view_labels = ["📖 Guide"] + [lbl for lbl, _ in AGENT_UI] + ["🤝 Team Intel"]
 if my_role in {"admin","root"}:
-    tab_labels.append("⚙ Org Admin")
+    view_labels.append("⚙ Org Admin")
 if is_root:
-    tab_labels.append("🛡 Root Admin")
+    view_labels.append("🛡 Root Admin")
 
-tabs_obj = st.tabs(tab_labels)
-TAB = {name: tabs_obj[i] for i, name in enumerate(tab_labels)}
+if st.session_state.get("nav_view") not in view_labels:
+    st.session_state["nav_view"] = view_labels[0]
+active_view = st.radio("View", view_labels, horizontal=True, key="nav_view", label_visibility="collapsed")
+SEAT_BY_LABEL = {lbl: k for lbl, k in AGENT_UI}
 
-with TAB["📖 Guide"]:
+if active_view == "📖 Guide":
     render_guide()
-
-for lbl, k in AGENT_UI:
-    with TAB[lbl]:
-        render_seat(lbl, k)
-
-with TAB["🤝 Team Intel"]:
+elif active_view in SEAT_BY_LABEL:
+    render_seat(active_view, SEAT_BY_LABEL[active_view])
+elif active_view == "🤝 Team Intel":
     render_team_intel(key_prefix="teamintel")
+elif active_view == "⚙ Org Admin":
+    render_team_intel(key_prefix="orgadmin")  # ✅ avoids duplicate form keys
+elif active_view == "🛡 Root Admin":
+    render_root_admin()
 
-if "⚙ Org Admin" in TAB:
-    with TAB["⚙ Org Admin"]:
-        render_team_intel(key_prefix="orgadmin")  # ✅ avoids duplicate form keys
-
-if "🛡 Root Admin" in TAB:
-    with TAB["🛡 Root Admin"]:
-        render_root_admin()
+# ============================================================
+# LIVE WAIT (rerun as soon as the runner publishes)
+# ============================================================
+_runner = st.session_state.get("swarm_runner")
+if _runner is not None and st.session_state["swarm_running"] and not st.session_state["swarm_paused"]:
+    _live = st.empty()
+    while not _runner.done.is_set():
+        if _runner.wait(timeout=0.5):
+            events = _runner.drain()
+            apply_runner_events(_runner, events)
+            if any(e["type"] != "token" for e in events):
+                break  # an agent started/finished: rerun to redraw seats
+            slot = LIVE_SLOTS.get(_runner.current or "")
+            if slot is not None:
+                slot.markdown(_runner.partial.get(_runner.current, ""))
+                continue
+        # touching an element lets Streamlit interrupt this loop on user input
+        _live.caption(f"⏳ Running {_runner.current or 'next agent'}…")
+    st.rerun()
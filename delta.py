@@ -0,0 +1,98 @@
+"""
+Delta updates for recurring missions.
+
+Instead of regenerating a deliverable from scratch, the agent gets its prior
+output plus what changed since, and answers with replacement blocks for the
+Markdown sections that need revising:
+
+    <<<SECTION: ## Week 1>>>
+    ...new section body, heading line included...
+    <<<END>>>
+
+merge_sections swaps those sections into the prior output (new headings are
+appended). "NO_CHANGES" keeps the prior output as is.
+"""
+import re
+from typing import Dict, List, Optional, Tuple
+
+NO_CHANGES = "NO_CHANGES"
+
+_HEADING = re.compile(r"^(#{1,6})\s+\S")
+_BLOCK = re.compile(r"<<<SECTION:\s*(.+?)\s*>>>\s*\n(.*?)\n?<<<END>>>", re.DOTALL)
+
+
+def _norm(heading: str) -> str:
+    return re.sub(r"\s+", " ", heading.strip().lstrip("#").strip().lower())
+
+
+def split_sections(markdown: str) -> List[Tuple[str, str]]:
+    """[(heading_line, text)] where text includes the heading line; preamble has heading ""."""
+    sections: List[Tuple[str, str]] = []
+    heading, buf = "", []
+    for line in (markdown or "").splitlines():
+        if _HEADING.match(line):
+            if buf or heading:
+                sections.append((heading, "\n".join(buf)))
+            heading, buf = line.strip(), [line]
+        else:
+            buf.append(line)
+    if buf or heading:
+        sections.append((heading, "\n".join(buf)))
+    return sections
+
+
+def changed_context(previous: Dict[str, str], current: Dict[str, str]) -> Dict[str, Tuple[str, str]]:
+    """field -> (old, new) for fields whose value differs."""
+    return {
+        k: (str(previous.get(k) or ""), str(current.get(k) or ""))
+        for k in current
+        if str(previous.get(k) or "").strip() != str(current.get(k) or "").strip()
+    }
+
+
+def build_delta_prompt(task: str, prior: str, changes: Dict[str, Tuple[str, str]], prior_date: str = "") -> str:
+    """Revision prompt: the original task, what changed, the prior deliverable, the output contract."""
+    if changes:
+        lines = "\n".join(f"- {k}: {old or '[empty]'} -> {new or '[empty]'}" for k, (old, new) in changes.items())
+    else:
+        lines = "- No input changes; refresh only what is dated or stale."
+    headings = [h for h, _ in split_sections(prior) if h]
+    return (
+        f"{task.strip()}\n\n"
+        "UPDATE MODE: a previous version of this deliverable exists"
+        + (f" (from {prior_date})" if prior_date else "") + ". Revise it; do not rewrite it.\n"
+        f"What changed since then:\n{lines}\n\n"
+        "Return ONLY replacement blocks for sections that must change, each in this exact form:\n"
+        "<<<SECTION: <heading line exactly as in the previous version, or a new heading>>>\n"
+        "<full new section text, starting with its heading line>\n"
+        "<<<END>>>\n"
+        f"If nothing needs to change, return exactly {NO_CHANGES}.\n"
+        + (f"Existing headings: {' | '.join(headings)}\n" if headings else "")
+        + "\n--- PREVIOUS VERSION ---\n" + prior.strip()
+    )
+
+
+def parse_delta(text: str) -> Optional[List[Tuple[str, str]]]:
+    """[(heading, new_text)]; [] for NO_CHANGES; None when the reply ignored the format."""
+    raw = (text or "").strip()
+    if raw.upper().startswith(NO_CHANGES):
+        return []
+    blocks = [(h.strip(), body.strip()) for h, body in _BLOCK.findall(raw)]
+    return blocks or None
+
+
+def merge_sections(prior: str, replacements: List[Tuple[str, str]]) -> str:
+    """Replace sections of `prior` by heading (case/space-insensitive); append unknown ones."""
+    sections = split_sections(prior)
+    index = {_norm(h): i for i, (h, _) in enumerate(sections) if h}
+    appended: List[str] = []
+    for heading, body in replacements:
+        i = index.get(_norm(heading))
+        if i is None:
+            appended.append(body)
+        else:
+            sections[i] = (sections[i][0], body)
+    merged = "\n".join(text.rstrip() for _, text in sections)
+    if appended:
+        merged = merged.rstrip() + "\n\n" + "\n\n".join(appended)
+    return merged.strip()
@@ -0,0 +1,273 @@
+"""
+Token-budget helpers: estimate, clip, and LLM-compress text to a fixed size.
+
+Estimates use ~4 characters per token, which is close enough for Gemini on
+English marketing copy and keeps this module free of tokenizer dependencies.
+"""
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+CHARS_PER_TOKEN = 4
+DOC_CHUNK_TOKENS = 1500
+SUMMARY_CACHE_DIR = os.getenv("SWARM_SUMMARY_CACHE", os.path.join(".cache", "chunk_summaries"))
+SUMMARY_CACHE_BYTES = int(float(os.getenv("SWARM_SUMMARY_CACHE_MB", "16") or 16) * 1024 * 1024)
+SUMMARY_TTL_DAYS = float(os.getenv("SWARM_SUMMARY_CACHE_DAYS", "30") or 30)
+_PRUNE_EVERY = 500  # disk cleanup cadence, in puts
+_TRUNCATED = "\n…[truncated]"
+
+
+def estimate_tokens(text: str) -> int:
+    return (len(text or "") + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def clip_to_tokens(text: str, max_tokens: int) -> str:
+    """Hard cap (marker included), cut at the last line break that fits."""
+    text = (text or "").strip()
+    cap = max(0, int(max_tokens)) * CHARS_PER_TOKEN
+    if len(text) <= cap:
+        return text
+    limit = cap - len(_TRUNCATED)
+    if limit <= 0:
+        return text[:cap]
+    cut = text[:limit]
+    nl = cut.rfind("\n")
+    if nl > limit // 2:
+        cut = cut[:nl]
+    return cut.rstrip() + _TRUNCATED
+
+
+def _call(llm: Any, prompt: str) -> str:
+    try:
+        out = llm.call([{"role": "user", "content": prompt}])
+        return str(out or "").strip()
+    except Exception:
+        return ""
+
+
+def summarize_to_budget(text: str, budget_tokens: int, llm: Optional[Any] = None, focus: str = "") -> str:
+    """
+    Return text unchanged if it already fits; otherwise ask `llm` for a
+    bullet summary within the budget, then hard-clip as a guarantee.
+    """
+    text = (text or "").strip()
+    if estimate_tokens(text) <= budget_tokens or llm is None:
+        return clip_to_tokens(text, budget_tokens)
+    words = max(60, int(budget_tokens * 0.7))
+    prompt = (
+        f"Compress the material below into at most {words} words of dense bullets.\n"
+        "Keep concrete facts, names, offers, objections and open questions. "
+        "Drop filler. Do not add facts that are not in the material.\n"
+        + (f"Focus: {focus}\n" if focus else "")
+        + "\n--- MATERIAL ---\n" + text
+    )
+    summary = _call(llm, prompt)
+    return clip_to_tokens(summary or text, budget_tokens)
+
+
+def map_reduce_digest(
+    outputs: Dict[str, str],
+    budget_tokens: int,
+    llm_factory: Optional[Callable[[], Any]] = None,
+    max_workers: int = 6,
+) -> Tuple[str, Dict[str, int]]:
+    """
+    Fan-in for synthesis: summarize each output in parallel into an equal
+    share of `budget_tokens`, then merge into one sectioned digest.
+    The digest size is bounded by the budget no matter how many outputs.
+    Returns (digest, stats) with input/digest token counts.
+    """
+    items = [(k, (v or "").strip()) for k, v in outputs.items() if (v or "").strip()]
+    stats = {"sources": len(items), "input_tokens": sum(estimate_tokens(v) for _, v in items), "digest_tokens": 0}
+    if not items:
+        return "", stats
+
+    # ~12 tokens per section heading
+    share = max(60, budget_tokens // len(items) - 12)
+
+    def _one(item: Tuple[str, str]) -> Tuple[str, str]:
+        key, text = item
+        llm = llm_factory() if (llm_factory and estimate_tokens(text) > share) else None
+        return key, summarize_to_budget(text, share, llm=llm, focus="decisions, priorities, KPIs, deliverables")
+
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(items)))) as pool:
+        summaries = dict(pool.map(_one, items))
+
+    digest = "\n\n".join(f"### {key}\n{summaries[key]}" for key, _ in items)
+    digest = clip_to_tokens(digest, budget_tokens)
+    stats["digest_tokens"] = estimate_tokens(digest)
+    return digest, stats
+
+
+def split_chunks(text: str, max_chars: int, overlap: int = 0) -> List[str]:
+    """Chunks of at most max_chars, cut at a paragraph/line/sentence break when one is near."""
+    text = re.sub(r"\n{3,}", "\n\n", (text or "").strip())
+    if len(text) <= max_chars:
+        return [text] if text else []
+    chunks, start = [], 0
+    while start < len(text):
+        end = min(len(text), start + max_chars)
+        if end < len(text):
+            floor = start + max_chars // 2
+            cut = max(text.rfind("\n", floor, end), text.rfind(". ", floor, end))
+            end = cut + 1 if cut > 0 else end
+        chunks.append(text[start:end].strip())
+        if end >= len(text):
+            break
+        start = max(end - overlap, start + 1)
+    return [c for c in chunks if c]
+
+
+class SummaryCache:
+    """
+    Chunk summaries keyed by content hash: an in-memory LRU bounded by UTF-8
+    bytes, plus one JSON file per entry on disk. Disk entries older than
+    max_age_days are deleted by prune(), which runs on creation and every
+    _PRUNE_EVERY puts.
+    """
+
+    def __init__(self, root: Optional[str] = SUMMARY_CACHE_DIR, max_bytes: int = SUMMARY_CACHE_BYTES,
+                 max_age_days: float = SUMMARY_TTL_DAYS):
+        self.root = root
+        self.max_bytes = max(0, int(max_bytes))
+        self.max_age_days = max_age_days
+        self._mem: "OrderedDict[str, Tuple[str, int]]" = OrderedDict()
+        self._bytes = 0
+        self._puts = 0
+        self._lock = threading.Lock()
+        self.prune()
+
+    @staticmethod
+    def key(*parts: Any) -> str:
+        return hashlib.sha256("\x1f".join(str(p) for p in parts).encode("utf-8")).hexdigest()[:40]
+
+    def _remember(self, key: str, summary: str):
+        # caller holds self._lock
+        size = len(summary.encode("utf-8")) + 64
+        old = self._mem.pop(key, None)
+        if old is not None:
+            self._bytes -= old[1]
+        if size > self.max_bytes:
+            return
+        self._mem[key] = (summary, size)
+        self._bytes += size
+        while self._bytes > self.max_bytes and self._mem:
+            _, (_, dropped) = self._mem.popitem(last=False)
+            self._bytes -= dropped
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            item = self._mem.get(key)
+            if item is not None:
+                self._mem.move_to_end(key)
+                return item[0]
+        if not self.root:
+            return None
+        try:
+            with open(os.path.join(self.root, key + ".json"), "r", encoding="utf-8") as f:
+                val = json.load(f).get("summary")
+        except (OSError, ValueError):
+            return None
+        if val:
+            with self._lock:
+                self._remember(key, val)
+        return val
+
+    def put(self, key: str, summary: str):
+        with self._lock:
+            self._remember(key, summary)
+            self._puts += 1
+            due = self._puts % _PRUNE_EVERY == 0
+        if not self.root:
+            return
+        if due:
+            self.prune()
+        try:
+            os.makedirs(self.root, exist_ok=True)
+            path = os.path.join(self.root, key + ".json")
+            with open(path + ".tmp", "w", encoding="utf-8") as f:
+                json.dump({"summary": summary}, f)
+            os.replace(path + ".tmp", path)
+        except OSError:
+            pass
+
+    def prune(self) -> int:
+        """Delete disk entries older than max_age_days; returns how many were removed."""
+        if not self.root:
+            return 0
+        cutoff = time.time() - self.max_age_days * 86400
+        removed = 0
+        try:
+            names = os.listdir(self.root)
+        except OSError:
+            return 0
+        for name in names:
+            path = os.path.join(self.root, name)
+            try:
+                if os.path.getmtime(path) < cutoff:
+                    os.remove(path)
+                    removed += 1
+            except OSError:
+                continue
+        return removed
+
+
+_default_cache: Optional[SummaryCache] = None
+
+
+def summary_cache() -> SummaryCache:
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = SummaryCache()
+    return _default_cache
+
+
+def digest_document(
+    text: str,
+    budget_tokens: int,
+    llm_factory: Optional[Callable[[], Any]] = None,
+    focus: str = "",
+    chunk_tokens: int = DOC_CHUNK_TOKENS,
+    cache: Optional[SummaryCache] = None,
+    max_workers: int = 6,
+) -> Tuple[str, Dict[str, int]]:
+    """
+    Map-reduce one long document (e.g. a scraped page): split it into chunks,
+    summarize the chunks concurrently into equal shares of `budget_tokens`,
+    and join them in document order. Chunk summaries are cached by content
+    hash, so an unchanged page costs no LLM calls the second time.
+    Returns (digest, stats) with chunk, cache-hit and token counts.
+    """
+    text = (text or "").strip()
+    stats = {"chunks": 0, "cache_hits": 0, "input_tokens": estimate_tokens(text), "digest_tokens": 0}
+    if estimate_tokens(text) <= budget_tokens or llm_factory is None:
+        digest = clip_to_tokens(text, budget_tokens)
+        stats["digest_tokens"] = estimate_tokens(digest)
+        return digest, stats
+    cache = cache if cache is not None else summary_cache()
+    chunks = split_chunks(text, chunk_tokens * CHARS_PER_TOKEN)
+    share = max(60, budget_tokens // len(chunks) - 4)
+    stats["chunks"] = len(chunks)
+
+    def _one(chunk: str) -> Tuple[str, bool]:
+        key = SummaryCache.key(focus, share, chunk)
+        cached = cache.get(key)
+        if cached is not None:
+            return cached, True
+        summary = summarize_to_budget(chunk, share, llm=llm_factory(), focus=focus)
+        if summary != clip_to_tokens(chunk, share):  # a failed call falls back to clipping; retry it next time
+            cache.put(key, summary)
+        return summary, False
+
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(chunks)))) as pool:
+        results = list(pool.map(_one, chunks))
+    digest = clip_to_tokens("\n".join(p for p, _ in results if p), budget_tokens)
+    stats["cache_hits"] = sum(1 for _, hit in results if hit)
+    stats["digest_tokens"] = estimate_tokens(digest)
+    return digest, stats
@@ -0,0 +1,193 @@
+"""
+Plan-aware fair sharing of LLM capacity across tenants.
+
+PLAN_SEATS / PLAN_AGENT_LIMITS decide what an org may select; this module
+decides when its agents may run. Every agent run (and fused, research,
+localization, strategist digest and fused validation follow-up call) takes
+a slot from the process-wide FAIR_SHARE before it calls the model. Slots do
+not nest: an org limited to one concurrent slot would wait on itself.
+
+  - Weighted fair queuing (start-time fair queuing): each request gets a
+    virtual start tag max(V, last finish of its org) and a finish tag
+    start + cost / weight(plan). The waiting request with the smallest start
+    tag among eligible orgs runs next. A big Unlimited mission cannot starve
+    a Lite org: the Lite org's next request is tagged near "now" in virtual
+    time, not behind the big mission's backlog.
+  - Per-org concurrency (ORG_CONCURRENCY) and tokens-per-minute (ORG_TPM)
+    limits make an org ineligible until a slot or TPM room frees up.
+  - GLOBAL_CONCURRENCY bounds the agents running at once in the process.
+
+Cost is an estimate at admission; charge() replaces it with actual usage
+once the call returns, so the TPM window tracks real tokens. snapshot()
+feeds Root Admin (queue depth, running, wait times per org).
+
+The scheduler is in-process: the Streamlit server and scheduler.py each hold
+their own instance.
+"""
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Deque, Dict, Iterator, List, Optional, Tuple
+
+PLAN_WEIGHTS: Dict[str, float] = {"Lite": 1.0, "Basic": 1.0, "Pro": 2.0, "Enterprise": 4.0, "Unlimited": 6.0}
+ORG_CONCURRENCY: Dict[str, int] = {"Lite": 1, "Basic": 1, "Pro": 2, "Enterprise": 4, "Unlimited": 6}
+ORG_TPM: Dict[str, int] = {"Lite": 60_000, "Basic": 60_000, "Pro": 200_000, "Enterprise": 600_000, "Unlimited": 1_000_000}
+GLOBAL_CONCURRENCY = int(os.getenv("SWARM_MAX_CONCURRENT_AGENTS", "8") or 8)
+DEFAULT_COST_TOKENS = 6000
+_WAIT_HISTORY = 200
+_TPM_WINDOW_S = 60.0
+_TICK_S = 0.5  # re-check TPM windows and cancellation while waiting
+
+
+class _Org:
+    def __init__(self, plan: str):
+        self.plan = plan
+        self.finish = 0.0  # virtual finish tag of the org's last admitted request
+        self.queued = 0
+        self.running = 0
+        self.usage: Deque[List[float]] = deque()  # [timestamp, tokens]
+        self.waits: Deque[float] = deque(maxlen=_WAIT_HISTORY)
+        self.admitted = 0
+
+    def tokens_last_minute(self, now: float) -> float:
+        while self.usage and now - self.usage[0][0] > _TPM_WINDOW_S:
+            self.usage.popleft()
+        return sum(t for _, t in self.usage)
+
+
+class Grant:
+    """An admitted request; charge() records actual tokens against the org's TPM window."""
+
+    def __init__(self, org: str, entry: List[float], waited_s: float):
+        self.org = org
+        self.waited_s = waited_s
+        self._entry = entry  # the org's usage record, adjusted in place
+
+
+class FairShareScheduler:
+    def __init__(self, global_concurrency: int = GLOBAL_CONCURRENCY):
+        self.global_concurrency = max(1, int(global_concurrency))
+        self._cv = threading.Condition()
+        self._orgs: Dict[str, _Org] = {}
+        self._queue: List[Tuple[float, int, str, float]] = []  # (start tag, seq, org, cost)
+        self._vtime = 0.0
+        self._running = 0
+        self._seq = 0
+        self._local = threading.local()
+
+    # -- internals (caller holds self._cv)
+    def _org(self, org: str, plan: str) -> _Org:
+        o = self._orgs.get(org)
+        if o is None:
+            o = self._orgs[org] = _Org(plan)
+        o.plan = plan or o.plan
+        return o
+
+    def _eligible(self, org: str, cost: float, now: float) -> bool:
+        o = self._orgs[org]
+        if o.running >= ORG_CONCURRENCY.get(o.plan, 1):
+            return False
+        used = o.tokens_last_minute(now)
+        # an idle org may always start one request, even one larger than its TPM
+        return used == 0 or used + cost <= ORG_TPM.get(o.plan, ORG_TPM["Lite"])
+
+    def _next(self, now: float) -> Optional[Tuple[float, int, str, float]]:
+        if self._running >= self.global_concurrency:
+            return None
+        for item in sorted(self._queue):
+            if self._eligible(item[2], item[3], now):
+                return item
+        return None
+
+    # -- public
+    def acquire(self, org: str, plan: str = "Lite", cost: float = DEFAULT_COST_TOKENS,
+                cancel: Optional[Any] = None) -> Grant:
+        """Block until the request is admitted; cancel (a CancelToken) aborts the wait."""
+        org = str(org or "default")
+        cost = max(1.0, float(cost))
+        t0 = time.time()
+        with self._cv:
+            o = self._org(org, plan)
+            weight = PLAN_WEIGHTS.get(o.plan, 1.0)
+            start = max(self._vtime, o.finish)
+            o.finish = start + cost / weight
+            self._seq += 1
+            item = (start, self._seq, org, cost)
+            self._queue.append(item)
+            o.queued += 1
+            try:
+                while self._next(time.time()) is not item:
+                    if cancel is not None and cancel.cancelled:
+                        cancel.check()  # raises MissionCancelled / AgentTimeout
+                    self._cv.wait(_TICK_S)
+            finally:
+                self._queue.remove(item)
+                o.queued -= 1
+                if cancel is not None and cancel.cancelled:
+                    o.finish -= cost / weight  # give back the unused virtual time
+                    self._cv.notify_all()
+            self._vtime = max(self._vtime, start)
+            self._running += 1
+            o.running += 1
+            o.admitted += 1
+            entry = [time.time(), cost]
+            o.usage.append(entry)
+            waited = round(time.time() - t0, 3)
+            o.waits.append(waited)
+            self._cv.notify_all()
+        return Grant(org, entry, waited)
+
+    def release(self, grant: Grant):
+        with self._cv:
+            o = self._orgs[grant.org]
+            o.running -= 1
+            self._running -= 1
+            self._cv.notify_all()
+
+    def charge(self, tokens: float, grant: Optional[Grant] = None):
+        """Replace the admitted estimate with actual tokens (defaults to this thread's grant)."""
+        grant = grant or getattr(self._local, "grant", None)
+        if grant is None:
+            return
+        with self._cv:
+            grant._entry[1] = max(0.0, float(tokens))
+            self._cv.notify_all()
+
+    @contextmanager
+    def slot(self, org: str, plan: str = "Lite", cost: float = DEFAULT_COST_TOKENS,
+             cancel: Optional[Any] = None) -> Iterator[Grant]:
+        grant = self.acquire(org, plan, cost, cancel=cancel)
+        prev = getattr(self._local, "grant", None)
+        self._local.grant = grant
+        try:
+            yield grant
+        finally:
+            self._local.grant = prev
+            self.release(grant)
+
+    def snapshot(self) -> List[Dict[str, Any]]:
+        """One row per org: plan, queue depth, running, TPM use and wait times."""
+        now = time.time()
+        rows = []
+        with self._cv:
+            for org, o in sorted(self._orgs.items()):
+                waits = sorted(o.waits)
+                rows.append({
+                    "org": org,
+                    "plan": o.plan,
+                    "queued": o.queued,
+                    "running": o.running,
+                    "concurrency_max": ORG_CONCURRENCY.get(o.plan, 1),
+                    "tokens_last_min": int(o.tokens_last_minute(now)),
+                    "tpm_max": ORG_TPM.get(o.plan, ORG_TPM["Lite"]),
+                    "admitted": o.admitted,
+                    "avg_wait_s": round(sum(waits) / len(waits), 2) if waits else 0.0,
+                    "p95_wait_s": waits[min(len(waits) - 1, int(len(waits) * 0.95))] if waits else 0.0,
+                    "max_wait_s": waits[-1] if waits else 0.0,
+                })
+        return rows
+
+
+FAIR_SHARE = FairShareScheduler()
@@ -0,0 +1,116 @@
+"""
+Multi-location fan-out for franchise missions.
+
+The same brand across N cities mostly repeats city-independent work. A
+multi-location mission runs every agent once as a template, with CITY_TOKEN
+in place of the location, then localizes the templates per city:
+
+  - CITY_INVARIANT_AGENTS (brand-level deliverables) are reused verbatim,
+    with CITY_TOKEN filled in.
+  - Every other agent's template is localized in batches of up to
+    LOCALIZE_BATCH cities per LLM call, fewer when the template is long
+    enough that the batch's reply could exceed the model's output limit
+    (localize_batch_size). The reply is a JSON object keyed by city
+    (fusion.py) whose values are section replacement blocks (delta.py). Only
+    the city-specific sections are rewritten; the rest is filled in locally.
+
+The template run does no city research (the location is a placeholder);
+each city gets a search-only brief that the localize prompt carries.
+
+Calls grow with ceil(cities / LOCALIZE_BATCH) per localized agent instead of
+one full run per city, and the batches run concurrently.
+"""
+import json
+from typing import Dict, List, Optional
+
+from delta import NO_CHANGES, merge_sections, parse_delta, split_sections
+from fusion import parse_fused
+
+CITY_TOKEN = "[CITY]"
+LOCALIZE_BATCH = 5
+FANOUT_WORKERS = 6
+# JSON string escaping (quotes, newlines) plus block markers inflate a rewritten section.
+_REPLY_OVERHEAD = 1.25
+
+# Brand-level deliverables: one template serves every city.
+CITY_INVARIANT_AGENTS = ("creative", "ecommerce_marketer", "guest_posting", "audit")
+
+TEMPLATE_DIRECTIVE = (
+    f"MULTI-LOCATION TEMPLATE: this deliverable is reused for several cities. Write {CITY_TOKEN} "
+    "wherever the location name belongs. Keep city-independent material (positioning, offers, "
+    "creative concepts, funnels) general, and put location-specific material (neighbourhoods, "
+    "local competitors, seasonality, local keywords, events) under its own headings. "
+    f"Never put {CITY_TOKEN} in a web search: research brand- and category-level facts only; each "
+    "city is researched separately afterwards."
+)
+
+
+def normalize_locations(locations: List[str]) -> List[str]:
+    """Strip, drop empties and case-insensitive duplicates, keep order."""
+    seen, out = set(), []
+    for loc in locations or []:
+        loc = str(loc or "").strip()
+        if loc and loc.lower() not in seen:
+            seen.add(loc.lower())
+            out.append(loc)
+    return out
+
+
+def batches(locations: List[str], size: int = LOCALIZE_BATCH) -> List[List[str]]:
+    size = max(1, int(size))
+    return [locations[i:i + size] for i in range(0, len(locations), size)]
+
+
+def localize_batch_size(template_tokens: int, max_output_tokens: int, limit: int = LOCALIZE_BATCH) -> int:
+    """Cities per call such that each one rewriting the whole template still fits the output limit."""
+    per_city = int(max(0, template_tokens) * _REPLY_OVERHEAD) + 50
+    return max(1, min(int(limit), int(max_output_tokens * 0.9) // per_city))
+
+
+def fill_city(text: str, city: str) -> str:
+    return (text or "").replace(CITY_TOKEN, city)
+
+
+def build_localize_prompt(task: str, template: str, biz_name: str, cities: List[str],
+                          briefs: Optional[Dict[str, str]] = None) -> str:
+    """One prompt that localizes a template for several cities (JSON keyed by city)."""
+    headings = [h for h, _ in split_sections(template) if h]
+    keys = ", ".join(json.dumps(c) for c in cities)
+    research = "".join(
+        f"\n--- LOCAL RESEARCH: {c} ---\n{briefs[c].strip()}\n" for c in cities if (briefs or {}).get(c)
+    )
+    return (
+        f"{task.strip()}\n\n"
+        f"LOCALIZATION MODE: below is a finished multi-location template for {biz_name}, with "
+        f"{CITY_TOKEN} standing for the location. Adapt it to each of these cities: {', '.join(cities)}.\n"
+        "For each city, return ONLY replacement blocks for the sections whose content must differ for "
+        "that city (local competitors, neighbourhoods, seasonality, keywords, events, regulations), "
+        "each in this exact form:\n"
+        "<<<SECTION: <heading line exactly as in the template>>>\n"
+        "<full localized section text, starting with its heading line>\n"
+        "<<<END>>>\n"
+        f"Sections you do not return are reused with {CITY_TOKEN} replaced by the city name. "
+        f"If a city needs no changes, its value is exactly {NO_CHANGES}. Do not invent statistics.\n"
+        + ("Base local specifics on the LOCAL RESEARCH for that city below; where it is silent, stay "
+           "general rather than guessing.\n" if research else "")
+        + (f"Template headings: {' | '.join(headings)}\n" if headings else "")
+        + "\nOUTPUT FORMAT (strict):\n"
+        f"Return ONLY a JSON object with exactly these keys: {keys}. Each value is a string "
+        "holding that city's replacement blocks. No text outside the JSON.\n"
+        + research
+        + "\n--- TEMPLATE ---\n" + template.strip()
+    )
+
+
+def parse_localized(text: str, template: str, cities: List[str]) -> Optional[Dict[str, str]]:
+    """city -> localized deliverable; None if the reply is unusable (caller falls back)."""
+    per_city = parse_fused(text, cities)
+    if per_city is None:
+        return None
+    out: Dict[str, str] = {}
+    for city in cities:
+        blocks = parse_delta(per_city[city])
+        if blocks is None:
+            return None
+        out[city] = fill_city(merge_sections(template, blocks), city)
+    return out
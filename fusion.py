@@ -0,0 +1,61 @@
+"""
+Fused execution for lightweight agents.
+
+ads, social, gbp_growth and geo share the same safety preamble and the same
+brand/city context. When several are selected together they can be answered
+by one structured LLM call that returns a JSON object keyed by agent; the
+result is split back into per-agent outputs. Callers fall back to individual
+runs when parse_fused returns None.
+"""
+import json
+import re
+from typing import Dict, List, Optional, Tuple
+
+FUSABLE_AGENTS = ("ads", "social", "gbp_growth", "geo")
+
+
+def fusable(active: List[str]) -> List[str]:
+    """Fusable agents in `active`, in a stable order; [] unless at least two."""
+    keys = [k for k in FUSABLE_AGENTS if k in active]
+    return keys if len(keys) >= 2 else []
+
+
+def build_fused_prompt(preamble: str, prompts: Dict[str, Tuple[str, str]]) -> str:
+    """One prompt with a section per agent. prompts: key -> (description, expected)."""
+    sections = []
+    for key, (desc, expected) in prompts.items():
+        sections.append(f"## SECTION `{key}` (deliverable: {expected})\n{desc.strip()}")
+    keys = ", ".join(f'"{k}"' for k in prompts)
+    return (
+        f"{preamble.strip()}\n\n"
+        "You will complete several independent deliverables in one response.\n\n"
+        + "\n\n".join(sections)
+        + "\n\nOUTPUT FORMAT (strict):\n"
+        f"Return ONLY a JSON object with exactly these keys: {keys}.\n"
+        "Each value is the complete Markdown deliverable for that section as a string "
+        "(tables, headings and lists allowed inside the string). No text outside the JSON."
+    )
+
+
+_FENCE = re.compile(r"^```(?:json)?\s*|\s*```$", re.IGNORECASE)
+
+
+def parse_fused(text: str, keys: List[str]) -> Optional[Dict[str, str]]:
+    """Split a fused response back into per-agent Markdown; None if unusable."""
+    raw = _FENCE.sub("", (text or "").strip())
+    start, end = raw.find("{"), raw.rfind("}")
+    if start < 0 or end <= start:
+        return None
+    try:
+        data = json.loads(raw[start:end + 1])
+    except (ValueError, TypeError):
+        return None
+    if not isinstance(data, dict):
+        return None
+    out: Dict[str, str] = {}
+    for key in keys:
+        val = data.get(key)
+        if not isinstance(val, str) or not val.strip():
+            return None
+        out[key] = val.strip()
+    return out
@@ -0,0 +1,181 @@
+"""
+Mission knowledge store: a local BM25 index over what research gathered.
+
+Search snippets, scraped pages and the research output are chunked into an
+SQLite FTS5 table as tool calls return (GuardedTool's sink), scoped to one
+mission ("mission:<id>") or to a tenant ("team:<id>") so later missions of
+the same team can reuse them. Agents query it through LookupTool, which
+answers in milliseconds instead of triggering another web search.
+
+Falls back to LIKE matching when the SQLite build lacks FTS5.
+"""
+import os
+import re
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+try:  # crewai >= 0.80
+    from crewai.tools import BaseTool
+except Exception:  # pragma: no cover - older crewai_tools layout
+    from crewai_tools import BaseTool
+
+from pydantic import BaseModel, Field
+
+from digest import split_chunks
+
+KNOWLEDGE_DB = os.getenv("SWARM_KNOWLEDGE_DB", "knowledge.db")
+CHUNK_CHARS = 900
+CHUNK_OVERLAP = 120
+MISSION_TTL_DAYS = 7
+_WORD = re.compile(r"[A-Za-z0-9]{2,}")
+
+
+def chunk_text(text: str, size: int = CHUNK_CHARS, overlap: int = CHUNK_OVERLAP) -> List[str]:
+    """Paragraph-aware chunks of about `size` chars with a small overlap."""
+    return split_chunks(text, size, overlap)
+
+
+def _fts_query(query: str) -> str:
+    """Free text -> FTS5 OR-query of quoted terms (no syntax errors from user text)."""
+    terms = _WORD.findall(query or "")
+    return " OR ".join(f'"{t}"' for t in terms[:12])
+
+
+class KnowledgeStore:
+    """Thread-safe; one connection per store, shared by the mission's agents."""
+
+    def __init__(self, scope: str, path: str = KNOWLEDGE_DB, read_scopes: Optional[List[str]] = None):
+        self.scope = scope
+        self.read_scopes = read_scopes or [scope]
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self.fts = True
+        try:
+            self._conn.execute(
+                "CREATE VIRTUAL TABLE IF NOT EXISTS knowledge USING fts5("
+                "scope UNINDEXED, source UNINDEXED, title, body, created_at UNINDEXED)"
+            )
+        except sqlite3.OperationalError:
+            self.fts = False
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS knowledge_plain (scope TEXT, source TEXT, title TEXT, body TEXT, created_at REAL)"
+            )
+        self._conn.commit()
+        self.added = 0
+        self.lookups = 0
+        self.opened_at = time.time()
+
+    @property
+    def _table(self) -> str:
+        return "knowledge" if self.fts else "knowledge_plain"
+
+    def add(self, source: str, text: str, title: str = "") -> int:
+        """
+        Index text under (scope, source). A source already indexed by this
+        store is skipped; one left by an earlier mission (tenant scope) is
+        replaced, so shared research does not go stale.
+        """
+        chunks = chunk_text(text)
+        if not chunks:
+            return 0
+        now = time.time()
+        with self._lock:
+            newest = self._conn.execute(
+                f"SELECT MAX(created_at) FROM {self._table} WHERE scope=? AND source=?", (self.scope, source)
+            ).fetchone()[0]
+            if newest is not None and float(newest) >= self.opened_at:
+                return 0
+            if newest is not None:
+                self._conn.execute(f"DELETE FROM {self._table} WHERE scope=? AND source=?", (self.scope, source))
+            self._conn.executemany(
+                f"INSERT INTO {self._table} (scope, source, title, body, created_at) VALUES (?,?,?,?,?)",
+                [(self.scope, source, title, c, now) for c in chunks],
+            )
+            self._conn.commit()
+            self.added += len(chunks)
+        return len(chunks)
+
+    def capture(self, tool_name: str, args: Dict[str, Any], result: Any):
+        """GuardedTool sink: index a tool result under a source derived from its arguments."""
+        text = str(result or "")
+        if len(text) < 80:
+            return
+        arg = next((str(v) for v in args.values() if v), "") if args else ""
+        self.add(f"{tool_name}:{arg}"[:300], text, title=arg[:200])
+
+    def search(self, query: str, k: int = 5) -> List[Dict[str, Any]]:
+        marks = ",".join("?" * len(self.read_scopes))
+        with self._lock:
+            self.lookups += 1
+            if self.fts:
+                q = _fts_query(query)
+                if not q:
+                    return []
+                rows = self._conn.execute(
+                    f"SELECT source, title, body, bm25(knowledge) AS score FROM knowledge "
+                    f"WHERE knowledge MATCH ? AND scope IN ({marks}) ORDER BY score LIMIT ?",
+                    (q, *self.read_scopes, k),
+                ).fetchall()
+            else:
+                terms = _WORD.findall(query or "")[:6]
+                if not terms:
+                    return []
+                like = " OR ".join("body LIKE ?" for _ in terms)
+                rows = self._conn.execute(
+                    f"SELECT source, title, body, 0 FROM knowledge_plain WHERE ({like}) AND scope IN ({marks}) LIMIT ?",
+                    (*[f"%{t}%" for t in terms], *self.read_scopes, k),
+                ).fetchall()
+        return [{"source": r[0], "title": r[1], "text": r[2], "score": r[3]} for r in rows]
+
+    def prune(self, max_age_days: float = MISSION_TTL_DAYS):
+        """Drop mission-scoped chunks older than max_age_days (tenant scopes are kept)."""
+        cutoff = time.time() - max_age_days * 86400
+        with self._lock:
+            self._conn.execute(f"DELETE FROM {self._table} WHERE scope LIKE 'mission:%' AND created_at < ?", (cutoff,))
+            self._conn.commit()
+
+    def usage(self) -> Dict[str, int]:
+        return {"kb_chunks_added": self.added, "kb_lookups": self.lookups}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def store_for(inputs: Dict[str, Any]) -> KnowledgeStore:
+    """
+    inputs["knowledge_scope"] = "tenant" shares the index across a team's
+    missions. inputs["mission_id"] is required: the index of one mission must
+    never be found again under another's key.
+    """
+    mission_id = str(inputs.get("mission_id") or "").strip()
+    if not mission_id:
+        raise ValueError("store_for needs inputs['mission_id']")
+    mission = f"mission:{mission_id}"
+    team = str(inputs.get("team_id") or "").strip()
+    if inputs.get("knowledge_scope") == "tenant" and team:
+        scope = f"team:{team}"
+        return KnowledgeStore(scope, read_scopes=[scope, mission])
+    return KnowledgeStore(mission)
+
+
+class _LookupArgs(BaseModel):
+    query: str = Field(..., description="What you need to know, in a few keywords.")
+
+
+class LookupTool(BaseTool):
+    name: str = "knowledge_lookup"
+    description: str = (
+        "Search facts already gathered in this mission (web search results, scraped pages, research). "
+        "Instant and free: use it before a new web search."
+    )
+    args_schema: Any = _LookupArgs
+    store: Any = None
+
+    def _run(self, query: str = "", **kwargs) -> str:
+        hits = self.store.search(query or str(kwargs.get("q") or ""), k=5) if self.store is not None else []
+        if not hits:
+            return "No stored facts match. Use web search if you need this."
+        return "\n\n".join(f"[{h['source']}]\n{h['text']}" for h in hits)
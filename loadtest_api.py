@@ -0,0 +1,172 @@
+"""
+Load test for api.py against a stub LLM.
+
+Starts the API in-process under uvicorn with a stub mission function in place
+of run_marketing_swarm: each agent takes a fair-share slot, "generates" for
+--agent-latency seconds (streaming --chunks token events when --stream), and
+publishes the same events as a real agent. This measures the HTTP/SSE layer,
+the runner threads and the fair-share queue, not Gemini.
+
+    python loadtest_api.py --missions 200 --concurrency 50 --agents 5
+
+A throwaway SQLite DB with one org and one user is created per run. Reports
+create latency, time to first SSE event, mission wall time and event
+throughput (p50 / p95 / max).
+
+Recorded results (stub LLM, --agent-latency 0.5, --plan Unlimited, one
+Linux container, Python 3.11, uvicorn 0.54; seconds):
+
+  --missions 200 --concurrency 50 --agents 5
+    create p50 0.006 / p95 1.689, first event p50 0.011 / p95 1.756,
+    total p50 21.113 / p95 25.476; wall 90.3, 49 events/s,
+    fair-share wait avg 3.7 / p95 3.84
+  --missions 100 --concurrency 25 --agents 5 --stream
+    create p50 0.003 / p95 1.803, first event p50 0.006 / p95 1.833,
+    total p50 10.584 / p95 12.325; wall 44.1, 276 events/s,
+    fair-share wait avg 1.59 / p95 1.82
+
+The create p95 is the first wave of requests verifying the password with
+bcrypt concurrently before the verification cache is warm; total time is
+dominated by the fair-share queue: one org on Unlimited runs 6 slots, so
+200 x 5 agent runs x 0.5 s / 6 is ~83 s of the 90 s wall time.
+"""
+import argparse
+import base64
+import json
+import os
+import random
+import socket
+import sqlite3
+import tempfile
+import threading
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List
+
+from fair_share import FAIR_SHARE
+from progress import publish
+
+STUB_AGENTS = ["market_researcher", "analyst", "ads", "social", "geo", "seo", "creative", "strategist"]
+USER, PASSWORD = "loadtest", "loadtest-pw"
+
+
+def stub_mission(latency_s: float, chunks: int):
+    """A run_marketing_swarm stand-in: same event contract, sleeps instead of calling an LLM."""
+
+    def _run(inputs: Dict[str, Any], channel=None, control=None) -> Dict[str, str]:
+        out: Dict[str, str] = {}
+        for key in inputs.get("active_swarm") or []:
+            if control is not None and not control.wait_turn():
+                break
+            publish(channel, "agent_started", agent=key)
+            t0 = time.time()
+            with FAIR_SHARE.slot(inputs.get("team_id") or "default", inputs.get("package") or "Lite", cost=2000) as grant:
+                publish(channel, "metric", agent=key, queue_wait_s=grant.waited_s)
+                for i in range(chunks if inputs.get("stream") else 1):
+                    time.sleep(latency_s * random.uniform(0.8, 1.2) / max(1, chunks if inputs.get("stream") else 1))
+                    if inputs.get("stream"):
+                        publish(channel, "token", agent=key, chunk=f"chunk {i} ")
+                FAIR_SHARE.charge(1500)
+            out[key] = f"## {key}\nStub output for {inputs.get('biz_name')} in {inputs.get('city')}."
+            publish(channel, "metric", agent=key, total_s=round(time.time() - t0, 3), prompt_tokens=1000, completion_tokens=500)
+            publish(channel, "agent_done", agent=key, output=out[key], seconds=round(time.time() - t0, 3))
+            if control is not None:
+                control.agent_finished()
+        out["full_report"] = "\n\n".join(out.values())
+        return out
+
+    return _run
+
+
+def _seed_db(path: str, plan: str):
+    import bcrypt
+
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE orgs (team_id TEXT PRIMARY KEY, org_name TEXT, plan TEXT, status TEXT, allowed_agents_json TEXT)")
+    conn.execute("CREATE TABLE users (username TEXT PRIMARY KEY, password TEXT, role TEXT, active INTEGER, plan TEXT, team_id TEXT)")
+    conn.execute("INSERT INTO orgs VALUES ('LOAD','Load test',?,'active',?)", (plan, json.dumps(STUB_AGENTS)))
+    pw = bcrypt.hashpw(PASSWORD.encode(), bcrypt.gensalt()).decode()
+    conn.execute("INSERT INTO users VALUES (?,?,'admin',1,?,'LOAD')", (USER, pw, plan))
+    conn.commit(); conn.close()
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _pct(values: List[float], q: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return round(values[min(len(values) - 1, int(len(values) * q))], 3)
+
+
+def _one_mission(base: str, auth: str, agents: List[str], stream: bool) -> Dict[str, float]:
+    body = json.dumps({"biz_name": "Acme HVAC", "city": "Austin, TX", "agents": agents, "stream": stream}).encode()
+    req = urllib.request.Request(f"{base}/v1/missions", data=body, method="POST",
+                                 headers={"Authorization": auth, "Content-Type": "application/json"})
+    t0 = time.time()
+    with urllib.request.urlopen(req, timeout=60) as resp:
+        created = json.loads(resp.read())
+    create_s = time.time() - t0
+    req = urllib.request.Request(base + created["events_url"], headers={"Authorization": auth})
+    first, events = None, 0
+    with urllib.request.urlopen(req, timeout=600) as resp:
+        for raw in resp:
+            if raw.startswith(b"event: "):
+                events += 1
+                first = first if first is not None else time.time() - t0
+                if raw.strip() in (b"event: mission_done", b"event: mission_error"):
+                    break
+    return {"create_s": create_s, "first_event_s": first or 0.0, "total_s": time.time() - t0, "events": events}
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    ap.add_argument("--missions", type=int, default=100)
+    ap.add_argument("--concurrency", type=int, default=25)
+    ap.add_argument("--agents", type=int, default=5, help=f"agents per mission (max {len(STUB_AGENTS)})")
+    ap.add_argument("--agent-latency", type=float, default=0.5, help="stub seconds per agent")
+    ap.add_argument("--stream", action="store_true", help="publish token events")
+    ap.add_argument("--chunks", type=int, default=20, help="token events per agent when streaming")
+    ap.add_argument("--plan", default="Unlimited", help="org plan (fair-share weight, concurrency, TPM)")
+    args = ap.parse_args()
+
+    import uvicorn
+
+    from api import SwarmAPI
+
+    db = os.path.join(tempfile.mkdtemp(prefix="swarm-load-"), "load.db")
+    _seed_db(db, args.plan)
+    api = SwarmAPI(run_fn=stub_mission(args.agent_latency, args.chunks), db_path=db, agent_keys=STUB_AGENTS)
+    port = _free_port()
+    server = uvicorn.Server(uvicorn.Config(api, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+
+    base = f"http://127.0.0.1:{port}"
+    auth = "Basic " + base64.b64encode(f"{USER}:{PASSWORD}".encode()).decode()
+    agents = STUB_AGENTS[:max(1, min(args.agents, len(STUB_AGENTS)))]
+    t0 = time.time()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        results = list(pool.map(lambda _: _one_mission(base, auth, agents, args.stream), range(args.missions)))
+    wall = time.time() - t0
+    server.should_exit = True
+
+    events = sum(r["events"] for r in results)
+    print(f"missions={args.missions} concurrency={args.concurrency} agents={len(agents)} "
+          f"agent_latency={args.agent_latency}s stream={args.stream} plan={args.plan}")
+    print(f"wall={wall:.2f}s missions/s={args.missions / wall:.2f} events={events} events/s={events / wall:.0f}")
+    for key in ("create_s", "first_event_s", "total_s"):
+        vals = [r[key] for r in results]
+        print(f"{key:>14}: p50={_pct(vals, 0.5)} p95={_pct(vals, 0.95)} max={round(max(vals), 3)}")
+    for row in FAIR_SHARE.snapshot():
+        print(f"fair-share {row['org']}: admitted={row['admitted']} avg_wait={row['avg_wait_s']}s p95_wait={row['p95_wait_s']}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,13 @@
 import os
 import json
 import time
+import hashlib
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
 from datetime import datetime
-from typing import Dict, Any, Optional, List
+from typing import Dict, Any, Callable, Optional, List
 
 from pydantic import BaseModel
 from dotenv import load_dotenv
@@ -10,8 +15,28 @@ from dotenv import load_dotenv
 import streamlit as st
 
 from crewai import Agent, Task, Crew, Process, LLM
+from crewai.tasks.task_output import TaskOutput
 from crewai_tools import SerperDevTool, ScrapeWebsiteTool
 
+from progress import AgentTimeout, CancelToken, MissionCancelled, OutputDegenerated, ProgressChannel, RunControl, publish
+from streaming import StreamCapture, stream_to, streaming_supported
+from tooling import GuardedTool, ToolBudget, guard_tools, tool_budget
+from routing import max_output_tokens, models_for, record_call, tier_for, tier_models, usage_from
+from digest import digest_document, estimate_tokens, map_reduce_digest, summarize_to_budget
+from fusion import build_fused_prompt, fusable, parse_fused
+from prompt_cache import MissionPrefix, get_backend
+from delta import build_delta_prompt, changed_context, merge_sections, parse_delta
+from validators import VALIDATORS, fill, followup_prompt, repair, validate
+from runaway import RETRY_LLM_PARAMS, RunawayGuard, output_budget, trim_loop
+from site_crawler import crawl_site, site_digest
+from page_speed import analyze, render_facts
+from knowledge import KnowledgeStore, LookupTool, store_for
+from fair_share import FAIR_SHARE
+from fanout import (
+    CITY_INVARIANT_AGENTS, CITY_TOKEN, FANOUT_WORKERS, TEMPLATE_DIRECTIVE,
+    batches, build_localize_prompt, fill_city, localize_batch_size, normalize_locations, parse_localized,
+)
+
 # ============================================================
 # ENV / SECRETS
 # ============================================================
@@ -30,11 +55,74 @@ def _is_429(err: Exception) -> bool:
     msg = str(err)
     return ("429" in msg) or ("RESOURCE_EXHAUSTED" in msg)
 
-def kickoff_with_retry(crew: Crew, retries: int = 2, base_sleep: int = 15):
-    """Retry Crew kickoff on common Gemini/GCP 429 rate-limit errors."""
+# HTTP timeout for every LLM call; a deadline on the call's CancelToken lowers it.
+# This (not thread interruption) is what bounds a hung request.
+LLM_TIMEOUT_S = float(_get_secret("SWARM_LLM_TIMEOUT_S", "180") or 180)
+CANCEL_GRACE_S = 2.0  # how long a cancelled call may take to wind down before the caller moves on
+
+class _StepCancelled(BaseException):
+    """Raised from the agent's step callback when its token is cancelled.
+    BaseException so CrewAI's `except Exception` retry loops do not restart
+    the task; raised synchronously, so locks and finally blocks unwind normally."""
+
+def _llm_timeout(token: Optional[CancelToken]) -> float:
+    remaining = token.remaining() if token is not None else None
+    return LLM_TIMEOUT_S if remaining is None else max(1.0, min(LLM_TIMEOUT_S, remaining))
+
+def _step_guard(token: Optional[CancelToken]):
+    """Agent.step_callback that ends the ReAct loop between steps once token cancels."""
+    def _check(_step: Any):
+        if token is not None and token.cancelled:
+            raise _StepCancelled("cancelled")
+    return _check
+
+def _kickoff_cancellable(crew: Crew, token: Optional[CancelToken]):
+    return _call_cancellable(crew.kickoff, token)
+
+def _call_cancellable(fn, token: Optional[CancelToken]):
+    """
+    Run fn() on a worker thread and return to the caller as soon as token
+    cancels. Nothing is injected into the worker: it stops at its next step
+    (_step_guard, GuardedTool) or when its LLM's HTTP timeout (_llm_timeout,
+    capped by the same deadline) closes the request. It gets CANCEL_GRACE_S to
+    do so before the caller raises.
+    """
+    if token is None:
+        return fn()
+
+    box: Dict[str, Any] = {}
+
+    def _target():
+        try:
+            box["result"] = fn()
+        except _StepCancelled:
+            pass
+        except BaseException as e:
+            box["error"] = e
+
+    worker = threading.Thread(target=_target, name="llm-call", daemon=True)
+    worker.start()
+    while worker.is_alive():
+        worker.join(timeout=0.25)
+        if worker.is_alive() and token.cancelled:
+            worker.join(timeout=CANCEL_GRACE_S)
+            token.check()  # raises MissionCancelled / AgentTimeout
+    if "error" in box:
+        raise box["error"]
+    if "result" not in box:
+        token.check()  # the worker stopped at a step check
+    return box.get("result")
+
+def kickoff_with_retry(crew: Crew, retries: int = 2, base_sleep: int = 15, token: Optional[CancelToken] = None):
+    """Retry Crew kickoff on common Gemini/GCP 429 rate-limit errors.
+    token: optional CancelToken; cancels the in-flight kickoff and retry sleeps."""
     for attempt in range(retries + 1):
+        if token is not None:
+            token.check()
         try:
-            return crew.kickoff()
+            return _kickoff_cancellable(crew, token)
+        except MissionCancelled:
+            raise
         except Exception as e:
             if _is_429(e) and attempt < retries:
                 wait = base_sleep * (attempt + 1)
@@ -42,7 +130,10 @@ def kickoff_with_retry(crew: Crew, retries: int = 2, base_sleep: int = 15):
                     st.warning(f"⚠️ Rate limited (429). Retrying in {wait}s...")
                 except Exception:
                     pass
-                time.sleep(wait)
+                if token is not None:
+                    token.sleep(wait)
+                else:
+                    time.sleep(wait)
                 continue
             raise
 
@@ -106,15 +197,47 @@ SERPER_API_KEY = _get_secret("SERPER_API_KEY")
 if not GOOGLE_API_KEY:
     raise RuntimeError("Missing GOOGLE_API_KEY in Streamlit secrets or environment variables.")
 
-gemini_llm = LLM(
-    model="google/gemini-2.0-flash",
-    api_key=GOOGLE_API_KEY,
-    temperature=0.2,  # lower = less hallucination
-)
+DEFAULT_MODEL = "google/gemini-2.0-flash"
+
+def _make_llm(
+    model: str = DEFAULT_MODEL,
+    stream: bool = False,
+    timeout: Optional[float] = None,
+    **params: Any,
+) -> LLM:
+    """params override sampling settings (e.g. max_tokens, penalties on a retry)."""
+    extra = dict(params)
+    extra.setdefault("temperature", 0.2)  # lower = less hallucination
+    return LLM(
+        model=model,
+        api_key=GOOGLE_API_KEY,
+        stream=stream,
+        timeout=timeout or LLM_TIMEOUT_S,  # hard HTTP timeout, aligned with the agent deadline
+        **extra,
+    )
+
+gemini_llm = _make_llm()  # construction-time default; _run_one swaps in the routed model
 
 scrape_tool = ScrapeWebsiteTool()
 search_tool = SerperDevTool(api_key=SERPER_API_KEY) if SERPER_API_KEY else None
 
+# Wall-clock deadline per agent (seconds). Tool-using agents get more room.
+# Override globally with SWARM_AGENT_DEADLINE_S or per run via inputs["agent_deadlines"].
+DEFAULT_AGENT_DEADLINE_S = float(_get_secret("SWARM_AGENT_DEADLINE_S", "150") or 150)
+AGENT_DEADLINES_S: Dict[str, float] = {
+    "market_researcher": 240,
+    "analyst": 240,
+    "guest_posting": 240,
+    "audit": 180,
+}
+
+def agent_deadline(agent_key: str, inputs: Optional[Dict[str, Any]] = None) -> float:
+    overrides = (inputs or {}).get("agent_deadlines") or {}
+    try:
+        return float(overrides.get(agent_key) or AGENT_DEADLINES_S.get(agent_key) or DEFAULT_AGENT_DEADLINE_S)
+    except (TypeError, ValueError):
+        return DEFAULT_AGENT_DEADLINE_S
+
 SAFETY_INSTRUCTIONS = (
     "Important rules:\n"
     "- Do NOT invent facts, citations, customer counts, revenue, market share, or performance metrics.\n"
@@ -123,24 +246,273 @@ SAFETY_INSTRUCTIONS = (
     "- Prefer concise, executive-ready bullets. Avoid long essays.\n"
 )
 
+# ============================================================
+# RESEARCH CONTEXT (research once, fan out a bounded brief)
+# ============================================================
+# Agents that receive the shared brief. audit works from the client URL only.
+RESEARCH_CONSUMERS = {
+    "analyst", "marketing_adviser", "strategist", "ecommerce_marketer", "ads",
+    "creative", "seo", "guest_posting", "geo", "gbp_growth", "social",
+}
+RESEARCH_BRIEF_TOKENS = 600
+RESEARCH_SEARCHES = 3  # queries behind search_brief()
+# Cap for the locally crawled site digest handed to the audit agent.
+AUDIT_DIGEST_TOKENS = 1500
+# Fixed input budget for the strategist's digest of other agents' outputs.
+STRATEGIST_DIGEST_TOKENS = 1200
+VALIDATION_FOLLOWUP_COST = 3000  # fair-share admission estimate for one missing-sections call
+# Tool results over PAGE_DIGEST_TOKENS (long scraped pages) are map-reduced to
+# that size with the lite model before they reach these agents; value = focus.
+PAGE_DIGEST_TOKENS = 1800
+PAGE_DIGEST_FOCUS = {
+    "analyst": "competitors, services, pricing, positioning, gaps and weaknesses",
+    "guest_posting": "site topics, audience, editorial/guest post guidelines, contact details, authority signals",
+    "audit": "CTAs, forms, phone/contact paths, trust signals, offers, friction and missing information",
+}
+
+def _is_usable(txt: Optional[str]) -> bool:
+    s = str(txt or "").strip()
+    if not s or s.startswith(("❌", "⏱", "Agent not selected", "Missing website URL")):
+        return False
+    return "no output returned" not in s.lower()
+
+def compress_research_brief(research: str) -> str:
+    """Bounded-size brief from the market_researcher output (lite model)."""
+    if not _is_usable(research):
+        return ""
+    llm = _make_llm(tier_models("lite")[0])
+    return summarize_to_budget(
+        research, RESEARCH_BRIEF_TOKENS, llm=llm,
+        focus="ICP, buyer triggers, competitors, offer/pricing patterns, demand themes, opportunity angles",
+    )
+
+def research_queries(inputs: Dict[str, Any], city: Optional[str] = None) -> List[str]:
+    biz = str(inputs.get("biz_name") or "").strip()
+    city = str(city or inputs.get("city") or "").strip()
+    if city == CITY_TOKEN:  # multi-location template: no city research, see run_multi_location
+        city = ""
+    focus = " ".join(str(inputs.get("directives") or "").split()[:8])
+    queries = [f"{biz} {city}", f"{biz} competitors {city}", f"{focus or biz} prices reviews {city}"]
+    return [" ".join(q.split()) for q in queries if q.strip()][:RESEARCH_SEARCHES]
+
+def search_brief(
+    inputs: Dict[str, Any],
+    city: Optional[str] = None,
+    token: Optional[CancelToken] = None,
+    knowledge: Optional[KnowledgeStore] = None,
+) -> str:
+    """
+    Brief for missions that do not include market_researcher: a few direct web
+    searches (no agent loop, no scraping) compressed by the lite model. Empty
+    without a Serper key.
+    """
+    if search_tool is None:
+        return ""
+    results = []
+    for query in research_queries(inputs, city):
+        if token is not None:
+            token.check()
+        try:
+            res = str(search_tool.run(search_query=query) or "")
+        except Exception:
+            continue
+        if knowledge is not None:
+            knowledge.capture("search", {"search_query": query}, res)
+        results.append(f"### {query}\n{res}")
+    if not results:
+        return ""
+    llm = _make_llm(tier_models("lite")[0], timeout=_llm_timeout(token))
+    return _call_cancellable(lambda: summarize_to_budget(
+        "\n\n".join(results), RESEARCH_BRIEF_TOKENS, llm=llm,
+        focus="competitors, offer/pricing patterns, demand themes, local specifics; mark uncertain points",
+    ), token) or ""
+
+def _completed_context_task(text: str, agent: Agent, description: str, expected: str) -> Task:
+    """A pre-completed Task whose output CrewAI injects via Task(context=[...])."""
+    task = Task(description=description, expected_output=expected, agent=agent)
+    task.output = TaskOutput(
+        description=task.description,
+        expected_output=task.expected_output,
+        raw=text,
+        agent=agent.role,
+    )
+    return task
+
+def audit_context(url: str) -> tuple:
+    """
+    (text, speed) for the audit agent: measured speed facts for the landing
+    page plus a merged, token-capped digest of the client's key pages (home,
+    services, contact, booking), crawled concurrently with conditional-GET
+    caching. ("", {}) if the site is unreachable.
+    """
+    crawl = crawl_site(url)
+    pages = crawl.get("pages") or []
+    if not pages:
+        return "", {}
+    speed = analyze(pages[0])
+    facts = render_facts(speed)
+    digest = site_digest(crawl, AUDIT_DIGEST_TOKENS)
+    return (f"{facts}\n\n{digest}" if facts else digest), speed
+
+def synthesis_digest(outputs: Dict[str, str]) -> tuple:
+    """Map-reduce the other agents' outputs into a fixed-size digest for strategist."""
+    usable = {k: v for k, v in outputs.items() if k != "strategist" and _is_usable(v)}
+    lite = tier_models("lite")[0]
+    return map_reduce_digest(usable, STRATEGIST_DIGEST_TOKENS, llm_factory=lambda: _make_llm(lite))
+
+def page_condenser(agent_key: str, channel: Optional[ProgressChannel] = None):
+    """
+    GuardedTool condense step for agents in PAGE_DIGEST_FOCUS: long tool
+    results become a bounded map-reduce digest (digest_document; chunk
+    summaries cached by content hash). Publishes running page_digest_* metrics.
+    """
+    focus = PAGE_DIGEST_FOCUS.get(agent_key)
+    if focus is None:
+        return None
+    lite = tier_models("lite")[0]
+    totals = {"page_digests": 0, "page_digest_chunks": 0, "page_digest_cache_hits": 0,
+              "page_digest_input_tokens": 0, "page_digest_tokens": 0}
+    lock = threading.Lock()
+
+    def _condense(tool_name: str, result: Any) -> Any:
+        text = result if isinstance(result, str) else str(result)
+        if estimate_tokens(text) <= PAGE_DIGEST_TOKENS:
+            return result
+        digest, stats = digest_document(text, PAGE_DIGEST_TOKENS, llm_factory=lambda: _make_llm(lite), focus=focus)
+        with lock:
+            totals["page_digests"] += 1
+            totals["page_digest_chunks"] += stats["chunks"]
+            totals["page_digest_cache_hits"] += stats["cache_hits"]
+            totals["page_digest_input_tokens"] += stats["input_tokens"]
+            totals["page_digest_tokens"] += stats["digest_tokens"]
+            publish(channel, "metric", agent=agent_key, **totals)
+        return f"[Digest of a {stats['input_tokens']}-token page from {tool_name}]\n{digest}"
+
+    return _condense
+
 # ============================================================
 # AGENTS
 # ============================================================
+def shared_prefix(inputs: Dict[str, Any], brief: str = "") -> str:
+    """
+    Invariant system-prompt block shared by every agent in a mission: safety
+    rules, brand profile, research brief. Keep it deterministic (no timestamps):
+    it is registered as one cached content per model (prompt_cache.py).
+    """
+    biz = inputs.get("biz_name", "The Business")
+    city = inputs.get("city", "the local area")
+    block = (
+        f"{SAFETY_INSTRUCTIONS}\n"
+        "Brand profile:\n"
+        f"- Business: {biz}\n"
+        f"- Location: {city}\n"
+    )
+    if brief:
+        block += f"\nShared research brief:\n{brief}\n"
+    return block
+
+# Role-specific backstory text; the shared prefix is prepended, or referenced from the cache.
+AGENT_BACKSTORIES: Dict[str, str] = {
+    "market_researcher": "Use search/scrape when available. If SERPER key is missing, state limitations.",
+    "analyst": "You quantify pricing gaps, positioning, and quick wins.",
+    "marketing_adviser": "You recommend channels, messaging, and a weekly execution cadence.",
+    "strategist": "You produce a weekly roadmap, KPIs, priorities, and owner/operator tasks.",
+    "ecommerce_marketer": "You deliver funnel steps, email/SMS flows, offers, retention.\nIf not e-commerce, adapt to lead-gen.",
+    "ads": "Google Search + Meta copy in tables. Don’t fabricate claims.",
+    "creative": "Return concepts, angles, prompts + ad variants. Be specific.",
+    "seo": "E-E-A-T, local intent, FAQs, CTA. No fake stats.",
+    "guest_posting": "You produce targets, outreach templates, topic angles, and safe anchors.\nIf sites not validated, mark as examples.",
+    "social": "Daily topics, hooks, captions, CTAs. Avoid unverifiable claims.",
+    "geo": "Citations, GBP optimization, near-me targeting steps.",
+    "gbp_growth": (
+        "You deliver:\n"
+        "- Weekly GBP posts\n"
+        "- Review reply templates (positive & negative)\n"
+        "- Keyword/service suggestions\n"
+        "- Ranking drop triage checklist (no fake rank data)"
+    ),
+    "audit": "Audit speed, trust, mobile UX, conversion friction.\nIf URL missing, ask for it clearly.",
+}
+
+# Payload fields each agent reads beyond the shared prefix (biz_name, city).
+# role_backstory renders them and agent_input_hash hashes them, so an edit to
+# the URL only invalidates the agents that actually see it.
+PREFIX_INPUTS = ("biz_name", "city")
+# Mission inputs persisted with vault reports (what delta updates diff against).
+VAULT_PAYLOAD_FIELDS = ("biz_name", "city", "directives", "url", "package")
+AGENT_INPUTS: Dict[str, tuple] = {
+    "market_researcher": ("directives",),
+    "analyst": ("directives",),
+    "marketing_adviser": ("directives",),
+    "gbp_growth": ("directives", "url"),
+    "audit": ("url",),
+}
+# Bump when prompts change so stored outputs stop counting as current.
+PROMPT_VERSION = 1
+
+def _input_value(inputs: Dict[str, Any], field: str) -> str:
+    if field == "url":
+        return str(inputs.get("url") or inputs.get("website") or "").strip()
+    return str(inputs.get(field) or "").strip()
+
+def role_backstory(agent_key: str, inputs: Dict[str, Any]) -> str:
+    """Role text plus the agent's declared inputs; the shared prefix goes in front."""
+    text = AGENT_BACKSTORIES[agent_key]
+    fields = AGENT_INPUTS.get(agent_key, ())
+    if "directives" in fields:
+        text += f"\nDirectives: {_input_value(inputs, 'directives') or 'Standard growth optimization.'}"
+    if "url" in fields:
+        text += f"\nURL: {_input_value(inputs, 'url') or '[missing]'}"
+    return text
+
+def _hash(doc: Dict[str, Any]) -> str:
+    return hashlib.sha256(json.dumps(doc, sort_keys=True).encode("utf-8")).hexdigest()[:16]
+
+def agent_input_hash(agent_key: str, inputs: Dict[str, Any], research: str = "", upstream: Optional[Dict[str, str]] = None) -> str:
+    """Content hash of everything that reaches one agent's prompt."""
+    fields = PREFIX_INPUTS + AGENT_INPUTS.get(agent_key, ())
+    return _hash({
+        "v": PROMPT_VERSION,
+        "agent": agent_key,
+        "inputs": {f: _input_value(inputs, f) for f in fields},
+        "research": research,
+        "upstream": sorted((upstream or {}).items()),
+    })
+
+def research_input_hash(inputs: Dict[str, Any]) -> str:
+    """Hash of what the research brief is derived from (market_researcher's inputs)."""
+    return agent_input_hash("market_researcher", inputs)
+
+def mission_input_hashes(active: List[str], inputs: Dict[str, Any]) -> Dict[str, str]:
+    """
+    Input hash per active agent. When a research brief is in play it sits in
+    the shared prefix, so every agent also depends on the research inputs;
+    strategist additionally depends on the hashes of the agents it synthesizes.
+    """
+    research_once = bool(inputs.get("research_once", True))
+    research = research_input_hash(inputs) if research_once and any(k in RESEARCH_CONSUMERS for k in active) else ""
+    hashes = {k: agent_input_hash(k, inputs, research) for k in active if k != "strategist"}
+    if "strategist" in active:
+        hashes["strategist"] = agent_input_hash("strategist", inputs, research, upstream=hashes)
+    return hashes
+
 def get_swarm_agents(inputs: Dict[str, Any]) -> Dict[str, Agent]:
     biz = inputs.get("biz_name", "The Business")
     city = inputs.get("city", "the local area")
-    url = (inputs.get("url") or inputs.get("website") or "").strip()
-    directives = inputs.get("directives") or "Standard growth optimization."
+    prefix = shared_prefix(inputs)
 
     research_tools = [scrape_tool]
     if search_tool:
         research_tools = [search_tool, scrape_tool]
 
+    def backstory(key: str) -> str:
+        return f"{prefix}\n{role_backstory(key, inputs)}"
+
     return {
         "market_researcher": Agent(
             role="Market Researcher",
             goal=f"Produce an executive market research snapshot for {biz} in {city}.",
-            backstory=f"{SAFETY_INSTRUCTIONS}\nDirectives: {directives}\nUse search/scrape when available. If SERPER key is missing, state limitations.",
+            backstory=backstory("market_researcher"),
             tools=research_tools,
             llm=gemini_llm,
             verbose=True,
@@ -148,7 +520,7 @@ def get_swarm_agents(inputs: Dict[str, Any]) -> Dict[str, Agent]:
         "analyst": Agent(
             role="Chief Market Strategist (McKinsey Level)",
             goal=f"Identify high-value market entry gaps for {biz} in {city}.",
-            backstory=f"{SAFETY_INSTRUCTIONS}\nYou quantify pricing gaps, positioning, and quick wins.\nDirectives: {directives}",
+            backstory=backstory("analyst"),
             tools=research_tools,
             llm=gemini_llm,
             verbose=True,
@@ -156,49 +528,49 @@ def get_swarm_agents(inputs: Dict[str, Any]) -> Dict[str, Agent]:
         "marketing_adviser": Agent(
             role="Marketing Adviser",
             goal=f"Create a pragmatic marketing plan for {biz} in {city}.",
-            backstory=f"{SAFETY_INSTRUCTIONS}\nYou recommend channels, messaging, and a weekly execution cadence.\nDirectives: {directives}",
+            backstory=backstory("marketing_adviser"),
             llm=gemini_llm,
             verbose=True,
         ),
         "strategist": Agent(
             role="Chief Growth Officer",
             goal=f"Synthesize into a CEO-ready 30-day execution plan for {biz}.",
-            backstory=f"{SAFETY_INSTRUCTIONS}\nYou produce a weekly roadmap, KPIs, priorities, and owner/operator tasks.",
+            backstory=backstory("strategist"),
             llm=gemini_llm,
             verbose=True,
         ),
         "ecommerce_marketer": Agent(
             role="E-Commerce Marketer",
             goal=f"Design an e-commerce growth system for {biz} (or a store-ready funnel if not e-commerce).",
-            backstory=f"{SAFETY_INSTRUCTIONS}\nYou deliver funnel steps, email/SMS flows, offers, retention.\nIf not e-commerce, adapt to lead-gen.",
+            backstory=backstory("ecommerce_marketer"),
             llm=gemini_llm,
             verbose=True,
         ),
         "ads": Agent(
             role="Performance Ads Architect",
             goal=f"Generate deployable ad copy for {biz} targeting {city}.",
-            backstory=f"{SAFETY_INSTRUCTIONS}\nGoogle Search + Meta copy in tables. Don’t fabricate claims.",
+            backstory=backstory("ads"),
             llm=gemini_llm,
             verbose=True,
         ),
         "creative": Agent(
             role="Creative Director (Assets & Prompts)",
             goal=f"Create creative direction + prompt packs for {biz}.",
-            backstory=f"{SAFETY_INSTRUCTIONS}\nReturn concepts, angles, prompts + ad variants. Be specific.",
+            backstory=backstory("creative"),
             llm=gemini_llm,
             verbose=True,
         ),
         "seo": Agent(
             role="Search Engine Marketing (SEO)",
             goal=f"Write a local SEO authority article for {biz} in {city}.",
-            backstory=f"{SAFETY_INSTRUCTIONS}\nE-E-A-T, local intent, FAQs, CTA. No fake stats.",
+            backstory=backstory("seo"),
             llm=gemini_llm,
             verbose=True,
         ),
         "guest_posting": Agent(
             role="Guest Posting Specialist",
             goal=f"Build a guest posting plan to earn relevant backlinks and referral traffic for {biz}.",
-            backstory=f"{SAFETY_INSTRUCTIONS}\nYou produce targets, outreach templates, topic angles, and safe anchors.\nIf sites not validated, mark as examples.",
+            backstory=backstory("guest_posting"),
             tools=research_tools,
             llm=gemini_llm,
             verbose=True,
@@ -206,37 +578,28 @@ def get_swarm_agents(inputs: Dict[str, Any]) -> Dict[str, Agent]:
         "social": Agent(
             role="Social Distribution Architect",
             goal=f"Create a 30-day social plan for {biz} in {city}.",
-            backstory=f"{SAFETY_INSTRUCTIONS}\nDaily topics, hooks, captions, CTAs. Avoid unverifiable claims.",
+            backstory=backstory("social"),
             llm=gemini_llm,
             verbose=True,
         ),
         "geo": Agent(
             role="GEO / Local Search Specialist",
             goal=f"Create a local GEO plan for {biz} in {city}.",
-            backstory=f"{SAFETY_INSTRUCTIONS}\nCitations, GBP optimization, near-me targeting steps.",
+            backstory=backstory("geo"),
             llm=gemini_llm,
             verbose=True,
         ),
         "gbp_growth": Agent(
             role="Google Business Profile (GBP) Growth Agent",
             goal=f"Grow Google Business Profile visibility for {biz} in {city}.",
-            backstory=(
-                f"{SAFETY_INSTRUCTIONS}\n"
-                "You deliver:\n"
-                "- Weekly GBP posts\n"
-                "- Review reply templates (positive & negative)\n"
-                "- Keyword/service suggestions\n"
-                "- Ranking drop triage checklist (no fake rank data)\n"
-                f"Directives: {directives}\n"
-                f"URL: {url or '[missing]'}"
-            ),
+            backstory=backstory("gbp_growth"),
             llm=gemini_llm,
             verbose=True,
         ),
         "audit": Agent(
             role="Conversion UX Auditor",
             goal=f"Diagnose conversion leaks for {biz} based on the provided website.",
-            backstory=f"{SAFETY_INSTRUCTIONS}\nAudit speed, trust, mobile UX, conversion friction.\nIf URL missing, ask for it clearly.\nURL: {url or '[missing]'}",
+            backstory=backstory("audit"),
             tools=[scrape_tool],
             llm=gemini_llm,
             verbose=True,
@@ -285,8 +648,10 @@ def _extract_output(task: Task, kickoff_result: Any) -> str:
     except Exception:
         return ""
 
-def _run_one(agent_key: str, agent: Agent, state: SwarmState) -> str:
-    """Run exactly one task and return its output as text."""
+MISSING_URL_MSG = "Missing website URL. Please provide a business website URL in the sidebar."
+
+def _task_prompt(agent_key: str, state: SwarmState) -> tuple:
+    """(description, expected_output) for one agent's task."""
     biz = state.biz_name
     city = state.location
     url = state.url.strip()
@@ -326,6 +691,8 @@ def _run_one(agent_key: str, agent: Agent, state: SwarmState) -> str:
         desc = (
             f"Create a CEO-ready 30-day execution roadmap for {biz} in {city}.\n"
             "Include:\n- Weekly plan\n- KPIs\n- Quick wins\n- Priorities\n- Owner/operator checklist\n"
+            "If a digest of the other agents' outputs is in context, synthesize it into the plan "
+            "(sequence and prioritize it) rather than starting from scratch.\n"
         )
         expected = "CEO-ready roadmap."
     elif agent_key == "ecommerce_marketer":
@@ -411,8 +778,6 @@ def _run_one(agent_key: str, agent: Agent, state: SwarmState) -> str:
         )
         expected = "Executive GBP Growth Pack."
     elif agent_key == "audit":
-        if not url:
-            return "Missing website URL. Please provide a business website URL in the sidebar."
         desc = (
             f"Audit this website for conversion friction: {url}\n"
             "Return executive output:\n"
@@ -424,12 +789,308 @@ def _run_one(agent_key: str, agent: Agent, state: SwarmState) -> str:
         desc = f"Generate an executive report for {biz} in {city}."
         expected = "Executive report."
 
-    task = Task(description=desc, agent=agent, expected_output=expected)
-    crew = Crew(agents=[agent], tasks=[task], process=Process.sequential)
+    if city == CITY_TOKEN:  # multi-location template run (run_multi_location)
+        desc += "\n\n" + TEMPLATE_DIRECTIVE
+    return desc, expected
+
+def _run_one(
+    agent_key: str,
+    agent: Agent,
+    state: SwarmState,
+    channel: Optional[ProgressChannel] = None,
+    stream: bool = False,
+    resume_from: str = "",
+    token: Optional[CancelToken] = None,
+    inputs: Optional[Dict[str, Any]] = None,
+    context_tasks: Optional[List[Task]] = None,
+    prefix: Optional[MissionPrefix] = None,
+    has_brief: bool = False,
+    delta_from: Optional[Dict[str, Any]] = None,
+    knowledge: Optional[KnowledgeStore] = None,
+) -> str:
+    """
+    Run exactly one task and return its output as text.
+    stream=True publishes "token" events per chunk and a ttft_s metric;
+    resume_from continues an interrupted partial draft instead of starting over;
+    token cancels the kickoff, its retry sleeps and tool calls (deadline or Stop);
+    inputs are the mission inputs (role text, optional tier overrides in inputs["agent_tiers"]);
+    context_tasks are completed tasks (e.g. strategist's digest) passed as Task context;
+    prefix is the mission's shared prompt block: tool-free agents reference its
+    cached content when one is registered for the model (no system prompt, the
+    block is not re-sent), otherwise it is prepended to the backstory
+    (prompt_cache.py; the per-agent "prefix_cache" metric says which);
+    delta_from = {"output", "inputs", "date"} revises a previous report's output
+    with section replacement blocks (delta.py) instead of regenerating it.
+    Tool agents run under a ToolBudget (tooling.py: iterations, tool calls,
+    scraped bytes, repeated calls) reported in the metric event; long pages
+    scraped by analyst/guest_posting/audit arrive as map-reduce digests. With a
+    knowledge store, their tool results are indexed into it and they get the
+    knowledge_lookup tool to query what earlier agents already gathered.
+    Looping, oversized or empty output is aborted early (runaway.py) and the
+    agent is retried once with adjusted sampling; "degenerated" metrics record it.
+    """
+    if agent_key == "audit" and not state.url.strip():
+        return MISSING_URL_MSG
+    desc, expected = _task_prompt(agent_key, state)
+    base_desc = desc
+
+    prior = str((delta_from or {}).get("output") or "") if not resume_from else ""
+    if prior:
+        fields = PREFIX_INPUTS + AGENT_INPUTS.get(agent_key, ())
+        changes = changed_context(
+            {f: _input_value(delta_from.get("inputs") or {}, f) for f in fields},
+            {f: _input_value(inputs or {}, f) for f in fields},
+        )
+        desc = build_delta_prompt(desc, prior, changes, prior_date=str(delta_from.get("date") or ""))
+        expected = "Section replacement blocks, or NO_CHANGES."
+
+    if resume_from:
+        desc += (
+            "\n\nA previous run was interrupted. Continue the draft below from exactly where it stops; "
+            "do not repeat what is already written.\n--- DRAFT SO FAR ---\n" + resume_from
+        )
+
+    if has_brief and agent.tools:
+        desc += (
+            "\n\nA shared research brief is in your instructions. Use search/scrape only "
+            "for facts the brief does not cover."
+        )
+
+    if agent_key == "audit":
+        site, speed = _call_cancellable(lambda: audit_context(state.url.strip()), token) or ("", {})
+        publish(channel, "metric", agent=agent_key, site_digest_tokens=estimate_tokens(site),
+                page_weight_bytes=speed.get("total_bytes"), page_requests=speed.get("total_requests"),
+                page_ttfb_s=speed.get("ttfb_s"))
+        if site:
+            desc += (
+                "\n\nSite digest and measured speed facts (fetched locally; base the audit on them, "
+                "cite the measured numbers for speed findings, do not scrape these pages again):\n" + site
+            )
+            agent.tools = []
+
+    streaming = stream and streaming_supported()
+    web_tools = [t.inner if isinstance(t, GuardedTool) else t
+                 for t in agent.tools or [] if not isinstance(t, LookupTool)]
+    condense = page_condenser(agent_key, channel)
+    tools_budget: Optional[ToolBudget] = None
+
+    def _arm_tools(run_token: CancelToken) -> Optional[ToolBudget]:
+        # A fresh budget per kickoff: a runaway retry or 429 failover starts
+        # with full counters and may repeat the calls the aborted run made.
+        run_budget = tool_budget(agent_key, inputs) if web_tools else None
+        agent.tools = guard_tools(
+            web_tools, run_token, run_budget,
+            sink=knowledge.capture if knowledge is not None else None,
+            condense=condense,
+        )
+        if run_budget is not None:
+            agent.max_iter = run_budget.max_iter
+        if knowledge is not None and agent.tools:
+            # Local lookups sit outside the web budget: they are free and instant.
+            agent.tools = [LookupTool(store=knowledge)] + agent.tools
+        return run_budget
+
+    if knowledge is not None and web_tools:
+        desc += (
+            "\n\nBefore searching the web, try knowledge_lookup: it searches the results and pages "
+            "this mission already gathered."
+        )
+
+    # Routed model first; on 429 fail over to the next sibling immediately and
+    # only fall back to sleep-and-retry on the last candidate. A runaway guard
+    # aborts looping/oversized attempts; the retry uses RETRY_LLM_PARAMS.
+    tier = tier_for(agent_key, inputs)
+    models = models_for(agent_key, inputs)
+    # every candidate may serve the call: stay under the smallest output cap
+    budget = min(output_budget(agent_key, m) for m in models)
+    t0 = time.time()
+    capture: Optional[StreamCapture] = None
+    llm_params: Dict[str, Any] = {}
+    txt = ""
+    # tokens spent by attempts whose result is discarded (a runaway abort has no usage; estimate it)
+    spent = {"prompt_tokens": 0, "completion_tokens": 0}
+    for attempt in range(2):
+        guard = RunawayGuard(budget)
+        attempt_token = token.child() if token is not None else CancelToken()
+
+        def _on_chunk(chunk: str, capture: StreamCapture, guard=guard, attempt_token=attempt_token):
+            publish(channel, "token", agent=agent_key, chunk=chunk)
+            reason = guard.check_stream(capture)
+            if reason:
+                attempt_token.cancel(reason, OutputDegenerated)
+
+        # A fresh task/crew per attempt: a cancelled attempt's worker may still be winding down.
+        task = Task(description=desc, agent=agent, expected_output=expected, context=context_tasks or None)
+        crew = Crew(agents=[agent], tasks=[task], process=Process.sequential)
+        agent.step_callback = _step_guard(attempt_token)
+        try:
+            for i, model in enumerate(models):
+                last = i == len(models) - 1
+                tools_budget = _arm_tools(attempt_token)
+                handle = None
+                if prefix is not None and agent_key in AGENT_BACKSTORIES:
+                    # cached_content cannot be combined with a system prompt or tools
+                    handle = prefix.handle(model) if not agent.tools else None
+                    role = role_backstory(agent_key, inputs or {})
+                    agent.backstory = role if handle else f"{prefix.text}\n{role}"
+                    agent.use_system_prompt = not handle
+                    publish(channel, "metric", agent=agent_key, prefix_cache="cached" if handle else
+                            ("inline: tool agent" if agent.tools else prefix.skipped.get(model, "inline")))
+                agent.llm = _make_llm(
+                    model, stream=streaming, timeout=_llm_timeout(token),
+                    max_tokens=budget, **llm_params, **({"cached_content": handle} if handle else {}),
+                )
+                try:
+                    if streaming:
+                        capture = StreamCapture(on_chunk=_on_chunk)
+                        with stream_to(agent.llm, capture):
+                            kickoff_result = kickoff_with_retry(crew, retries=2 if last else 0, base_sleep=15, token=attempt_token)
+                    else:
+                        kickoff_result = kickoff_with_retry(crew, retries=2 if last else 0, base_sleep=15, token=attempt_token)
+                    break
+                except MissionCancelled:
+                    raise
+                except Exception as e:
+                    if last or not _is_429(e):
+                        raise
+                    publish(channel, "metric", agent=agent_key, failover_from=model)
+            txt = _extract_output(task, kickoff_result)
+            reason = guard.final(txt)
+        except OutputDegenerated as e:
+            reason, kickoff_result = str(e), None
+            txt = capture.text if capture else ""
+        if not reason:
+            break
+        if kickoff_result is not None:
+            used = usage_from(kickoff_result, crew)
+        else:
+            prompt_text = desc + agent.backstory + (prefix.text if handle else "")
+            used = {"prompt_tokens": estimate_tokens(prompt_text), "completion_tokens": estimate_tokens(txt)}
+        if attempt == 0:  # the last attempt's result is kept and counted below
+            spent = {k: spent[k] + used[k] for k in spent}
+        publish(channel, "metric", agent=agent_key, degenerated=reason, degenerated_attempt=attempt + 1,
+                degenerated_chars=len(txt))
+        if attempt == 0:
+            llm_params = dict(RETRY_LLM_PARAMS)
+        else:
+            txt = trim_loop(txt) if reason == "loop" else txt
+
+    total_s = round(time.time() - t0, 3)
+    usage = used if reason else usage_from(kickoff_result, crew)
+    usage = {k: usage[k] + spent[k] for k in usage}
+    call = record_call(tier, model, total_s, usage["prompt_tokens"], usage["completion_tokens"], failovers=i)
+    FAIR_SHARE.charge(call["prompt_tokens"] + call["completion_tokens"])
+    publish(
+        channel, "metric", agent=agent_key,
+        total_s=total_s,
+        ttft_s=capture.ttft_s if capture else None,
+        **(tools_budget.usage() if tools_budget is not None else {}),
+        **call,
+    )
+
+    if txt and resume_from:
+        txt = resume_from.rstrip() + "\n" + txt
+    if prior:
+        blocks = parse_delta(txt)
+        publish(channel, "metric", agent=agent_key, delta=True,
+                delta_sections=len(blocks) if blocks is not None else None)
+        if blocks is not None:
+            txt = merge_sections(prior, blocks)
+    if not txt:
+        return "No output returned (empty response)."
+    return _complete_structure(agent_key, txt, base_desc, model, token=token, channel=channel)
+
+def _complete_structure(
+    agent_key: str,
+    txt: str,
+    task_desc: str,
+    model: str,
+    token: Optional[CancelToken] = None,
+    channel: Optional[ProgressChannel] = None,
+    slot: Optional[Callable[[], Any]] = None,
+) -> str:
+    """
+    Validate an agent's deliverable shape (validators.py): repair formatting
+    locally, then ask once for only the sections still missing instead of
+    re-running the whole agent. Callers outside a fair-share slot pass
+    `slot` (a _fair_slot factory); the follow-up call then runs and is
+    charged inside it.
+    """
+    if agent_key not in VALIDATORS or not _is_usable(txt):
+        return txt
+    fixed = repair(txt)
+    problems = validate(agent_key, fixed)
+    metric: Dict[str, Any] = {"validation_repaired": fixed != txt.strip(), "validation_missing": len(problems)}
+    if problems:
+        t0 = time.time()
+        prompt = followup_prompt(fixed, problems, task=task_desc)
+        llm = _make_llm(model, timeout=_llm_timeout(token))
+        try:
+            with (slot() if slot is not None else nullcontext()):
+                addition = _call_cancellable(lambda: llm.call([{"role": "user", "content": prompt}]), token)
+                if slot is not None:
+                    FAIR_SHARE.charge(estimate_tokens(prompt) + estimate_tokens(str(addition or "")))
+            fixed = fill(fixed, str(addition or ""), agent_key)
+        except MissionCancelled:
+            raise
+        except Exception:
+            pass
+        metric["followup_s"] = round(time.time() - t0, 3)
+        metric["validation_unresolved"] = len(validate(agent_key, fixed))
+    publish(channel, "metric", agent=agent_key, **metric)
+    return fixed
+
+def _run_fused(
+    keys: List[str],
+    state: SwarmState,
+    prefix: MissionPrefix,
+    token: Optional[CancelToken] = None,
+) -> Optional[Dict[str, str]]:
+    """
+    Answer several light agents with one structured LLM call (lite tier, 429
+    failover). Returns per-agent outputs, or None so the caller runs them
+    individually.
+    """
+    role_inputs = {"directives": state.directives, "url": state.url}
+    prompts = {}
+    for k in keys:
+        desc, expected = _task_prompt(k, state)
+        prompts[k] = (f"{role_backstory(k, role_inputs)}\n\n{desc}", expected)
+
+    models = tier_models("lite")
+    t0 = time.time()
+    for i, model in enumerate(models):
+        handle = prefix.handle(model)  # the cached block replaces the inline preamble
+        prompt = build_fused_prompt("" if handle else prefix.text, prompts)
+        messages = [{"role": "user", "content": prompt}]
+        llm = _make_llm(model, timeout=_llm_timeout(token), **({"cached_content": handle} if handle else {}))
+        try:
+            text = _call_cancellable(lambda: llm.call(messages), token)
+        except MissionCancelled:
+            raise
+        except Exception as e:
+            if _is_429(e) and i < len(models) - 1:
+                continue
+            return None
+        parsed = parse_fused(str(text or ""), keys)
+        call = record_call("lite", model, round(time.time() - t0, 3),
+                           estimate_tokens(prompt), estimate_tokens(str(text or "")), failovers=i)
+        FAIR_SHARE.charge(call["prompt_tokens"] + call["completion_tokens"])
+        return parsed
+    return None
 
-    kickoff_result = kickoff_with_retry(crew, retries=2, base_sleep=15)
-    txt = _extract_output(task, kickoff_result)
-    return txt if txt else "No output returned (empty response)."
+def _fair_slot(inputs: Dict[str, Any], agent_key: str, control: Optional[RunControl] = None,
+               cost: Optional[int] = None):
+    """
+    FAIR_SHARE slot for one model-calling step of this org's mission (fair_share.py).
+    Admission is estimated from the agent's output budget; actual usage is
+    charged after the call. Stop (control.token) aborts the wait.
+    """
+    return FAIR_SHARE.slot(
+        str(inputs.get("team_id") or "default"), str(inputs.get("package") or "Lite"),
+        cost=cost or output_budget(agent_key) // 2 + 3000,
+        cancel=control.token if control is not None else None,
+    )
 
 def _build_full_report(state: SwarmState, package: str) -> str:
     now = datetime.now().strftime("%Y-%m-%d %H:%M")
@@ -464,15 +1125,55 @@ def _build_full_report(state: SwarmState, package: str) -> str:
 # ============================================================
 # PUBLIC WRAPPER (used by app.py)
 # ============================================================
-def run_marketing_swarm(inputs: Dict[str, Any]) -> Dict[str, str]:
+def run_marketing_swarm(
+    inputs: Dict[str, Any],
+    channel: Optional[ProgressChannel] = None,
+    control: Optional[RunControl] = None,
+) -> Dict[str, str]:
     """
     Returns keys that match app.py toggles exactly:
     analyst, ads, creative, strategist, social, geo, audit, seo,
     marketing_adviser, ecommerce_marketer, guest_posting, market_researcher,
     gbp_growth,
     plus full_report.
+
+    channel: optional ProgressChannel; agent_started/agent_done are published as
+    each agent runs so callers can render results without polling. With
+    inputs["stream"] the LLM streams and "token" events carry partial text.
+    inputs["resume_partial"] = {agent_key: draft} resumes interrupted drafts.
+    Research runs once per mission: the market_researcher output (or, when it is
+    not selected, a few direct searches: search_brief) is compressed into a
+    bounded brief and published as a "research_brief" event. Pass it back as inputs["research_brief"] to reuse
+    it; inputs["research_once"]=False disables the stage.
+    Safety rules + brand profile + brief form one invariant prefix
+    (shared_prefix). When it meets the model's explicit-cache minimum it is
+    registered once per model as a Gemini cached content that tool-free agents
+    and the fused call reference; otherwise it is sent inline. The
+    "prompt_cache" metric reports registrations, references and skip reasons
+    (prompt_cache.py), and the cache is deleted when the mission ends. With inputs["fused"], two or more of ads/social/
+    gbp_growth/geo are answered by one structured call and split back per key
+    (falling back to individual runs if the response cannot be parsed); the
+    call runs after market_researcher, so it sees the brief.
+    strategist runs last and receives a map-reduce digest
+    (STRATEGIST_DIGEST_TOKENS) of this run's outputs plus inputs["prior_outputs"].
+    inputs["previous_report"] = {"outputs", "inputs", "date"} (a reports_vault
+    entry) switches agents with a prior output to delta updates (delta.py).
+    Callers that keep earlier outputs pass only the agents whose
+    mission_input_hashes changed, with the reused outputs in prior_outputs.
+    Search results, scraped pages and the research output are indexed in a local
+    knowledge store (knowledge.py) scoped to inputs["mission_id"], or to
+    inputs["team_id"] when inputs["knowledge_scope"] == "tenant"; tool agents
+    query it with knowledge_lookup before searching the web again.
+    Each model-calling step waits for a FAIR_SHARE slot (fair_share.py) keyed by
+    inputs["team_id"] and weighted by inputs["package"]; "queue_wait_s" metrics
+    record the wait.
+    control: optional RunControl gate (pause/stop/pacing) checked between agents;
+    its token also cancels the in-flight agent. Every agent runs under a
+    wall-clock deadline (agent_deadline) whether or not a control is passed.
     """
     inputs = inputs or {}
+    if not str(inputs.get("mission_id") or "").strip():
+        inputs["mission_id"] = uuid.uuid4().hex  # keys this run's knowledge index (store_for)
     active_list = inputs.get("active_swarm", []) or []
     active = [str(k).strip() for k in active_list if str(k).strip()]
     active = [k for k in active if k in TOGGLE_KEYS]
@@ -485,6 +1186,8 @@ def run_marketing_swarm(inputs: Dict[str, Any]) -> Dict[str, str]:
     )
 
     package = inputs.get("package", "Lite")
+    stream = bool(inputs.get("stream"))
+    resume_partial = inputs.get("resume_partial") or {}
     agents = get_swarm_agents(inputs)
 
     # deterministic order
@@ -492,7 +1195,6 @@ def run_marketing_swarm(inputs: Dict[str, Any]) -> Dict[str, str]:
         "market_researcher",
         "analyst",
         "marketing_adviser",
-        "strategist",
         "ecommerce_marketer",
         "ads",
         "creative",
@@ -502,17 +1204,162 @@ def run_marketing_swarm(inputs: Dict[str, Any]) -> Dict[str, str]:
         "gbp_growth",
         "social",
         "audit",
+        "strategist",  # last: synthesizes everything above
     ]
 
-    for key in RUN_ORDER:
-        if key not in active:
-            continue
-        txt = _run_one(key, agents[key], state)
-        try:
-            setattr(state, key, txt)
-        except Exception:
-            pass
+    brief = str(inputs.get("research_brief") or "")
+    research_once = bool(inputs.get("research_once", True))
+    wants_brief = research_once and any(k in RESEARCH_CONSUMERS for k in active)
+    prefix = MissionPrefix(shared_prefix(inputs, brief), backend=get_backend(GOOGLE_API_KEY))
 
+    try:
+        knowledge: Optional[KnowledgeStore] = store_for(inputs)
+        knowledge.prune()
+    except Exception:  # unwritable DB: agents just search the web as before
+        knowledge = None
+
+    try:
+        def _with_brief(new_brief: str) -> MissionPrefix:
+            """Swap in a prefix that includes the brief."""
+            publish(channel, "research_brief", brief=new_brief, tokens=estimate_tokens(new_brief))
+            prefix.release()  # the old block's cached contents are never referenced again
+            return MissionPrefix(shared_prefix(inputs, new_brief), backend=prefix.backend)
+
+        if wants_brief and not brief and "market_researcher" not in active:
+            # market_researcher is not part of this mission (or not on the org's plan):
+            # a search-only brief rather than a full tool-using agent run.
+            publish(channel, "stage_started", stage="research")
+            try:
+                with _fair_slot(inputs, "research", control, cost=RESEARCH_BRIEF_TOKENS + 3000):
+                    brief = search_brief(
+                        inputs, knowledge=knowledge,
+                        token=control.token.child(DEFAULT_AGENT_DEADLINE_S) if control is not None
+                        else CancelToken(deadline_s=DEFAULT_AGENT_DEADLINE_S),
+                    )
+            except Exception:  # incl. MissionCancelled; the loop below honours Stop
+                brief = ""
+            publish(channel, "stage_done", stage="research")
+            if brief:
+                prefix = _with_brief(brief)
+
+        previous = inputs.get("previous_report") or {}
+
+        def _delta_for(key: str) -> Optional[Dict[str, Any]]:
+            out = (previous.get("outputs") or {}).get(key)
+            if not _is_usable(out):
+                return None
+            return {"output": out, "inputs": previous.get("inputs") or {}, "date": previous.get("date", "")}
+
+        fused_done: set = set()
+        # delta agents revise their own prior output, so they are not fused
+        fused_keys = fusable([k for k in active if _delta_for(k) is None]) if inputs.get("fused") else []
+
+        def _fused_stage():
+            """Fused light agents; runs once the brief exists (after market_researcher when selected)."""
+            if not fused_keys or (control is not None and not control.wait_turn()):
+                return
+            for key in fused_keys:
+                publish(channel, "agent_started", agent=key)
+            t0 = time.time()
+            try:
+                with _fair_slot(inputs, "fused", control, cost=sum(output_budget(k) for k in fused_keys) // 2 + 3000):
+                    fused_token = control.token.child(DEFAULT_AGENT_DEADLINE_S) if control is not None \
+                        else CancelToken(deadline_s=DEFAULT_AGENT_DEADLINE_S)
+                    fused = _run_fused(fused_keys, state, prefix, token=fused_token)
+            except MissionCancelled:
+                fused = None
+            publish(channel, "metric", agent="fused", fused_agents=len(fused_keys), fused_ok=bool(fused))
+            for key in (fused_keys if fused else []):
+                try:
+                    # the fused slot is released: each follow-up call queues for its own
+                    fused[key] = _complete_structure(
+                        key, fused[key], _task_prompt(key, state)[0], tier_models("lite")[0],
+                        token=fused_token, channel=channel,
+                        slot=lambda key=key: _fair_slot(inputs, key, control, cost=VALIDATION_FOLLOWUP_COST),
+                    )
+                except MissionCancelled:
+                    pass
+                setattr(state, key, fused[key])
+                fused_done.add(key)
+                publish(channel, "agent_done", agent=key, output=fused[key], seconds=round(time.time() - t0, 2))
+
+        fused_pending = bool(fused_keys)
+        for key in RUN_ORDER:
+            if fused_pending and key != "market_researcher":
+                fused_pending = False
+                _fused_stage()
+            if key not in active or key in fused_done:
+                continue
+            if control is not None and not control.wait_turn():
+                break
+            context_tasks = None
+            if key == "strategist":
+                done = dict(inputs.get("prior_outputs") or {})
+                done.update({k: getattr(state, k) for k in active if k != key})
+                try:
+                    # lite map-reduce calls: queued like any other model call, and
+                    # before (not inside) strategist's own slot
+                    with _fair_slot(inputs, key, control, cost=sum(
+                            estimate_tokens(str(v or "")) for v in done.values()) + STRATEGIST_DIGEST_TOKENS):
+                        digest, dstats = synthesis_digest(done)
+                        FAIR_SHARE.charge(dstats["input_tokens"] + dstats["digest_tokens"])
+                except MissionCancelled as e:
+                    publish(channel, "agent_cancelled", agent=key, reason=str(e))
+                    break
+                if digest:
+                    context_tasks = [_completed_context_task(
+                        digest, agents[key],
+                        description="Digest of the other agents' completed outputs (already completed).",
+                        expected="Agent output digest.",
+                    )]
+                publish(channel, "metric", agent=key, digest_sources=dstats["sources"],
+                        digest_input_tokens=dstats["input_tokens"], digest_tokens=dstats["digest_tokens"])
+            publish(channel, "agent_started", agent=key)
+            t0 = time.time()
+            deadline = agent_deadline(key, inputs)
+            try:
+                # the deadline starts once the fair-share queue admits the agent
+                with _fair_slot(inputs, key, control) as grant:
+                    publish(channel, "metric", agent=key, queue_wait_s=grant.waited_s)
+                    token = control.token.child(deadline) if control is not None else CancelToken(deadline_s=deadline)
+                    txt = _run_one(
+                        key, agents[key], state,
+                        channel=channel, stream=stream, resume_from=str(resume_partial.get(key) or ""),
+                        token=token, inputs=inputs, context_tasks=context_tasks,
+                        prefix=prefix, has_brief=bool(brief) and key in RESEARCH_CONSUMERS,
+                        delta_from=_delta_for(key), knowledge=knowledge,
+                    )
+            except AgentTimeout:
+                txt = f"⏱ Timed out after {deadline:.0f}s. Retry this agent or raise its deadline."
+            except MissionCancelled as e:
+                publish(channel, "agent_cancelled", agent=key, reason=str(e))
+                break
+            except Exception as e:
+                txt = f"❌ Error: {e}"
+            try:
+                setattr(state, key, txt)
+            except Exception:
+                pass
+            publish(channel, "agent_done", agent=key, output=txt, seconds=round(time.time() - t0, 2))
+            if key == "market_researcher" and knowledge is not None and _is_usable(txt):
+                # keyed by brand and city: a tenant-scoped store holds every location's research
+                knowledge.add(
+                    f"agent:market_researcher:{inputs.get('biz_name', '')}:{inputs.get('city', '')}"[:300],
+                    txt, title="Market research",
+                )
+            if key == "market_researcher" and research_once and not brief:
+                brief = compress_research_brief(txt)
+                if brief:
+                    prefix = _with_brief(brief)
+            if control is not None:
+                control.agent_finished()
+
+    finally:
+        publish(channel, "metric", agent="prompt_cache", **prefix.stats())
+        prefix.release()
+        if knowledge is not None:
+            publish(channel, "metric", agent="knowledge", **knowledge.usage())
+            knowledge.close()
     state.full_report = _build_full_report(state, package)
 
     master: Dict[str, str] = {
@@ -534,3 +1381,135 @@ def run_marketing_swarm(inputs: Dict[str, Any]) -> Dict[str, str]:
 
     # Always return full_report; return selected agents too
     return {k: v for k, v in master.items() if (k in active) or (k == "full_report")}
+
+# ============================================================
+# MULTI-LOCATION MISSIONS (franchise fan-out)
+# ============================================================
+def _localize(
+    agent_key: str,
+    template: str,
+    cities: List[str],
+    state: SwarmState,
+    inputs: Dict[str, Any],
+    token: Optional[CancelToken] = None,
+    briefs: Optional[Dict[str, str]] = None,
+) -> Optional[Dict[str, str]]:
+    """One batched localization call (routed tier, 429 failover); None if unusable."""
+    task, _expected = _task_prompt(agent_key, state)
+    prompt = build_localize_prompt(task, template, state.biz_name, cities, briefs=briefs)
+    messages = [{"role": "user", "content": prompt}]
+    tier = tier_for(agent_key, inputs)
+    models = models_for(agent_key, inputs)
+    t0 = time.time()
+    for i, model in enumerate(models):
+        llm = _make_llm(model, timeout=_llm_timeout(token))
+        try:
+            text = _call_cancellable(lambda: llm.call(messages), token)
+        except MissionCancelled:
+            raise
+        except Exception as e:
+            if _is_429(e) and i < len(models) - 1:
+                continue
+            return None
+        call = record_call(tier, model, round(time.time() - t0, 3),
+                           estimate_tokens(prompt), estimate_tokens(str(text or "")), failovers=i)
+        FAIR_SHARE.charge(call["prompt_tokens"] + call["completion_tokens"])
+        return parse_localized(str(text or ""), template, cities)
+    return None
+
+def run_multi_location(
+    inputs: Dict[str, Any],
+    channel: Optional[ProgressChannel] = None,
+    control: Optional[RunControl] = None,
+) -> Dict[str, Dict[str, str]]:
+    """
+    Same brand, several cities (inputs["locations"]). Every active agent runs
+    once through run_marketing_swarm as a template with CITY_TOKEN as the
+    location (research, brief, fusion, validation and metrics as usual).
+    Then the templates are localized concurrently (fanout.py):
+    city-invariant agents are filled in, the others are rewritten section-wise
+    in batches of cities per call, sized so a batch's reply fits the routed
+    models' output limit. Each city first gets a search-only brief
+    (search_brief) that its localize prompts carry, since the template run
+    researched no city.
+    Returns {city: {agent_key: output, ..., "full_report": ...}}. A batch whose
+    reply cannot be parsed falls back to the filled-in template and is
+    counted in the "fanout" metric.
+    """
+    inputs = inputs or {}
+    cities = normalize_locations(inputs.get("locations") or [inputs.get("city", "")])
+    if len(cities) <= 1:
+        single = dict(inputs, city=cities[0] if cities else inputs.get("city", "USA"))
+        single.pop("locations", None)
+        return {single["city"]: run_marketing_swarm(single, channel=channel, control=control)}
+
+    t0 = time.time()
+    templates = run_marketing_swarm(dict(inputs, city=CITY_TOKEN), channel=channel, control=control)
+    core_s = round(time.time() - t0, 3)
+    agents = [k for k in templates if k != "full_report"]
+    state = SwarmState(
+        biz_name=inputs.get("biz_name", "Unknown Brand"),
+        location=CITY_TOKEN,
+        directives=inputs.get("directives", ""),
+        url=(inputs.get("url") or inputs.get("website") or ""),
+    )
+
+    per_city: Dict[str, Dict[str, str]] = {c: {} for c in cities}
+    jobs = []
+    for key in agents:
+        template = templates[key]
+        if key in CITY_INVARIANT_AGENTS or not _is_usable(template) or CITY_TOKEN not in template:
+            for city in cities:
+                per_city[city][key] = fill_city(template, city)
+        else:
+            cap = min(max_output_tokens(m) for m in models_for(key, inputs))
+            size = localize_batch_size(estimate_tokens(template), cap)
+            jobs.extend((key, batch) for batch in batches(cities, size))
+
+    publish(channel, "stage_started", stage="localize")
+    t1 = time.time()
+    failed = 0
+    briefs: Dict[str, str] = {}
+    stopped = control is not None and control.token.cancelled
+    if jobs and not stopped:
+        token = control.token.child(DEFAULT_AGENT_DEADLINE_S) if control is not None \
+            else CancelToken(deadline_s=DEFAULT_AGENT_DEADLINE_S)
+
+        def _brief(city: str):
+            try:
+                with _fair_slot(inputs, "research", control, cost=RESEARCH_BRIEF_TOKENS + 3000):
+                    return city, search_brief(inputs, city=city, token=token)
+            except Exception:  # incl. MissionCancelled: localize without local research
+                return city, ""
+
+        with ThreadPoolExecutor(max_workers=max(1, min(FANOUT_WORKERS, len(cities)))) as pool:
+            briefs = {city: brief for city, brief in pool.map(_brief, cities) if brief}
+
+        def _job(job):
+            key, batch = job
+            try:
+                with _fair_slot(inputs, key, control, cost=estimate_tokens(templates[key]) * (len(batch) + 1)):
+                    return job, _localize(key, templates[key], batch, state, inputs, token=token, briefs=briefs)
+            except MissionCancelled:
+                return job, None
+
+        with ThreadPoolExecutor(max_workers=max(1, min(FANOUT_WORKERS, len(jobs)))) as pool:
+            for (key, batch), localized in pool.map(_job, jobs):
+                failed += localized is None
+                for city in batch:
+                    per_city[city][key] = (localized or {}).get(city) or fill_city(templates[key], city)
+    else:
+        for key, batch in jobs:
+            for city in batch:
+                per_city[city][key] = fill_city(templates[key], city)
+    publish(channel, "stage_done", stage="localize")
+    publish(channel, "metric", agent="fanout", fanout_cities=len(cities), fanout_calls=len(jobs),
+            fanout_failed=failed, fanout_city_briefs=len(briefs), fanout_core_s=core_s, fanout_localize_s=round(time.time() - t1, 3))
+
+    package = inputs.get("package", "Lite")
+    reports: Dict[str, Dict[str, str]] = {}
+    for city in cities:
+        city_state = SwarmState(biz_name=state.biz_name, location=city, directives=state.directives,
+                                url=state.url, **per_city[city])
+        reports[city] = dict(per_city[city], full_report=_build_full_report(city_state, package))
+    return reports
@@ -0,0 +1,288 @@
+"""
+Local page extraction for the conversion audit.
+
+Fetches a page once (stdlib urllib, no browser), drops boilerplate (script,
+style, nav, footer, ...) and keeps what a conversion audit needs: meta tags,
+headings, CTAs, forms, trust signals, phone numbers and a short text sample.
+render_digest() turns that into a compact Markdown digest under a token cap,
+which replaces dumping raw page text into the agent's context.
+
+fetch_page() takes any http(s) URL, so it can be pointed at a local fixture
+server (python -m http.server) to exercise extraction offline.
+"""
+import re
+import time
+import urllib.error
+import urllib.request
+from html.parser import HTMLParser
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urljoin
+
+from digest import clip_to_tokens
+
+USER_AGENT = "MarketingSwarmAudit/1.0 (+conversion audit)"
+MAX_PAGE_BYTES = 3_000_000
+DIGEST_TOKENS = 900
+
+_SKIP_TAGS = {"script", "style", "noscript", "svg", "nav", "footer", "iframe", "template"}
+_CHROME_TAGS = {"nav", "footer"}  # skipped as copy, but phone numbers there still count
+_CAPTURE_TAGS = {"title", "h1", "h2", "h3", "a", "button", "p", "li"}
+_BLOCK_CAPTURES = {"title", "h1", "h2", "h3", "p", "li"}  # implicitly close an open <p>/<li> of the same kind
+_VOID_TAGS = {"br", "img", "input", "meta", "link", "hr", "source", "wbr", "area", "base", "col", "embed", "param", "track"}
+_CTA_WORDS = re.compile(
+    r"\b(book|call|get|schedule|quote|estimate|contact|buy|shop|order|start|sign ?up|request|reserve|"
+    r"apply|download|claim|try|subscribe|join|chat)\b", re.IGNORECASE,
+)
+_TRUST_WORDS = re.compile(
+    r"\b(reviews?|rated|rating|stars?|testimonials?|certified|licensed|insured|bonded|guarantee[d]?|"
+    r"warranty|bbb|award|accredited|years? (?:of )?experience|since \d{4}|trusted)\b", re.IGNORECASE,
+)
+_PHONE = re.compile(r"(?:\+?1[\s.-]?)?\(?\d{3}\)?[\s.-]?\d{3}[\s.-]?\d{4}")
+
+
+class FetchResult(dict):
+    """url, final_url, status, headers, body (str), raw_bytes, ttfb_s, total_s, error."""
+
+
+def fetch_page(url: str, timeout: float = 15.0, headers: Optional[Dict[str, str]] = None,
+               max_bytes: int = MAX_PAGE_BYTES) -> FetchResult:
+    """GET one URL; never raises (errors land in result["error"])."""
+    req = urllib.request.Request(url, headers={"User-Agent": USER_AGENT, **(headers or {})})
+    t0 = time.time()
+    res = FetchResult(url=url, final_url=url, status=0, headers={}, body="", raw_bytes=0,
+                      ttfb_s=None, total_s=None, error="")
+    try:
+        resp = urllib.request.urlopen(req, timeout=timeout)
+    except urllib.error.HTTPError as e:
+        resp = e  # 304 / 4xx / 5xx still carry status + headers
+    except Exception as e:
+        res["error"] = str(e)
+        res["total_s"] = round(time.time() - t0, 3)
+        return res
+    res["ttfb_s"] = round(time.time() - t0, 3)
+    try:
+        raw = resp.read(max_bytes) or b""
+    except Exception as e:
+        raw, res["error"] = b"", str(e)
+    res["total_s"] = round(time.time() - t0, 3)
+    res["status"] = int(getattr(resp, "status", None) or getattr(resp, "code", 0) or 0)
+    res["final_url"] = resp.geturl() if hasattr(resp, "geturl") else url
+    res["headers"] = {k.lower(): v for k, v in (resp.headers.items() if resp.headers else [])}
+    res["raw_bytes"] = len(raw)
+    charset = "utf-8"
+    m = re.search(r"charset=([\w-]+)", res["headers"].get("content-type", ""))
+    if m:
+        charset = m.group(1)
+    res["body"] = raw.decode(charset, "replace")
+    return res
+
+
+class _Extractor(HTMLParser):
+    def __init__(self, base_url: str):
+        super().__init__(convert_charrefs=True)
+        self.base_url = base_url
+        self.skip_depth = 0
+        self.code_depth = 0  # inside script/style/... (not nav/footer)
+        self.stack: List[str] = []
+        self.title = ""
+        self.meta: Dict[str, str] = {}
+        self.headings: List[str] = []
+        self.ctas: List[str] = []
+        self.forms: List[Dict[str, Any]] = []
+        self.trust: List[str] = []
+        self.phones: List[str] = []
+        self.text: List[str] = []
+        self.links: List[str] = []
+        self.assets: List[Dict[str, Any]] = []
+        self._buf: List[str] = []
+        # open captures, outermost first: (tag, attrs, start index in _buf).
+        # Nested inline tags (<h2><a>..</a></h2>, <p>We are <a>licensed</a>..</p>)
+        # add to every open capture instead of cutting the outer one short.
+        self._captures: List[Tuple[str, Dict[str, str], int]] = []
+
+    # -- helpers
+    def _open(self, tag: str, attrs: Dict[str, str]):
+        if tag in _BLOCK_CAPTURES:
+            # <p>/<li> are often left unclosed; a new block closes them first
+            for i, (open_tag, _, _) in enumerate(self._captures):
+                if open_tag == "p" or (open_tag == tag and tag == "li"):
+                    self._close_from(i)
+                    break
+        self._captures.append((tag, attrs, len(self._buf)))
+
+    def _close_from(self, index: int):
+        """Close the capture at index and everything opened inside it, innermost first."""
+        while len(self._captures) > index:
+            tag, attrs, start = self._captures.pop()
+            txt = re.sub(r"\s+", " ", "".join(self._buf[start:])).strip()
+            self._emit(tag, attrs, txt, outermost=not self._captures)
+        if not self._captures:
+            self._buf = []
+
+    def handle_starttag(self, tag, attrs):
+        a = {k: (v or "") for k, v in attrs}
+        if tag not in _VOID_TAGS:
+            self.stack.append(tag)
+        if tag in _SKIP_TAGS or self.skip_depth:
+            if tag == "script" and a.get("src"):
+                self.assets.append({"type": "js", "url": urljoin(self.base_url, a["src"]), "in_head": "head" in self.stack,
+                                    "async": "async" in a or "defer" in a or a.get("type") == "module"})
+            href = a.get("href", "") if tag == "a" else ""
+            if href.startswith("tel:"):
+                self.phones.append(href[4:])
+            elif href and not href.startswith(("#", "mailto:", "javascript:")):
+                self.links.append(urljoin(self.base_url, href))  # nav links matter to the crawler
+            if tag in _SKIP_TAGS:
+                self.skip_depth += 1
+                if tag not in _CHROME_TAGS:
+                    self.code_depth += 1
+            return
+        if tag == "meta":
+            key = (a.get("name") or a.get("property") or "").lower()
+            if key in ("description", "robots", "viewport", "og:title", "og:description", "og:image"):
+                self.meta[key] = a.get("content", "")
+        elif tag == "link":
+            rel = a.get("rel", "").lower()
+            if rel == "canonical":
+                self.meta["canonical"] = a.get("href", "")
+            elif "stylesheet" in rel and a.get("href"):
+                self.assets.append({"type": "css", "url": urljoin(self.base_url, a["href"]), "in_head": "head" in self.stack,
+                                    "async": a.get("media", "all") not in ("all", "screen", "")})
+        elif tag == "img":
+            alt = a.get("alt", "")
+            if a.get("src"):
+                self.assets.append({"type": "img", "url": urljoin(self.base_url, a["src"]), "in_head": False, "async": a.get("loading") == "lazy"})
+            if alt and _TRUST_WORDS.search(alt):
+                self.trust.append(f"[img] {alt}")
+        elif tag == "form":
+            self.forms.append({"action": a.get("action", ""), "method": (a.get("method") or "get").upper(), "fields": [], "submit": ""})
+        elif tag in ("input", "select", "textarea") and self.forms and "form" in self.stack:
+            ftype = a.get("type", tag).lower()
+            if ftype in ("submit", "button"):
+                self.forms[-1]["submit"] = self.forms[-1]["submit"] or a.get("value", "")
+            elif ftype != "hidden":
+                self.forms[-1]["fields"].append(a.get("name") or a.get("placeholder") or ftype)
+        if tag == "a":
+            href = a.get("href", "")
+            if href.startswith("tel:"):
+                self.phones.append(href[4:])
+            elif href and not href.startswith(("#", "mailto:", "javascript:")):
+                self.links.append(urljoin(self.base_url, href))
+        if tag in _CAPTURE_TAGS:
+            self._open(tag, a)
+
+    def handle_endtag(self, tag):
+        if tag in self.stack:
+            while self.stack and self.stack.pop() != tag:
+                pass
+        if tag in _SKIP_TAGS and self.skip_depth:
+            self.skip_depth -= 1
+            if tag not in _CHROME_TAGS and self.code_depth:
+                self.code_depth -= 1
+            return
+        if self.skip_depth:
+            return
+        for i in range(len(self._captures) - 1, -1, -1):
+            if self._captures[i][0] == tag:
+                self._close_from(i)
+                break
+
+    def close(self):
+        super().close()
+        self._close_from(0)
+
+    def _emit(self, tag: str, attrs: Dict[str, str], txt: str, outermost: bool):
+        if not txt:
+            return
+        if tag == "title":
+            self.title = txt
+        elif tag in ("h1", "h2", "h3"):
+            self.headings.append(f"{tag.upper()}: {txt}")
+        elif tag in ("a", "button"):
+            cls = attrs.get("class", "").lower()
+            if _CTA_WORDS.search(txt) or "btn" in cls or "button" in cls or "cta" in cls:
+                self.ctas.append(txt[:80])
+            if "form" in self.stack and tag == "button" and self.forms:
+                self.forms[-1]["submit"] = self.forms[-1]["submit"] or txt
+        elif outermost:  # nested <p>/<li> copy is already part of the outer block
+            self.text.append(txt)
+        if outermost and _TRUST_WORDS.search(txt):
+            self.trust.append(txt[:140])
+
+    def handle_data(self, data):
+        if self.code_depth:
+            return
+        if _PHONE.search(data):
+            self.phones.extend(m.strip() for m in _PHONE.findall(data))
+        if not self.skip_depth and self._captures:
+            self._buf.append(data)
+
+
+def _dedup(items: List[str], limit: int) -> List[str]:
+    seen, out = set(), []
+    for it in items:
+        key = it.lower().strip()
+        if key and key not in seen:
+            seen.add(key)
+            out.append(it)
+        if len(out) >= limit:
+            break
+    return out
+
+
+def extract(html: str, base_url: str = "") -> Dict[str, Any]:
+    """Conversion-relevant structure of one HTML page (no network)."""
+    p = _Extractor(base_url)
+    try:
+        p.feed(html or "")
+        p.close()
+    except Exception:
+        pass
+    return {
+        "url": base_url,
+        "title": p.title,
+        "meta": p.meta,
+        "headings": _dedup(p.headings, 25),
+        "ctas": _dedup(p.ctas, 15),
+        "forms": p.forms[:5],
+        "trust": _dedup(p.trust, 10),
+        "phones": _dedup(p.phones, 5),
+        "text": _dedup([t for t in p.text if len(t) > 40], 12),
+        "links": _dedup(p.links, 200),
+        "assets": p.assets,
+    }
+
+
+def render_digest(page: Dict[str, Any], max_tokens: int = DIGEST_TOKENS) -> str:
+    """Compact Markdown digest of extract() output, hard-capped at max_tokens."""
+    meta = page.get("meta") or {}
+    lines = [f"### Page: {page.get('url', '')}", f"- Title: {page.get('title') or '[missing]'}"]
+    lines.append(f"- Meta description: {meta.get('description') or '[missing]'}")
+    lines.append(f"- Viewport meta: {'yes' if meta.get('viewport') else 'MISSING (mobile risk)'}")
+    if meta.get("robots"):
+        lines.append(f"- Robots: {meta['robots']}")
+    if meta.get("canonical"):
+        lines.append(f"- Canonical: {meta['canonical']}")
+    lines.append(f"- Phones: {', '.join(page.get('phones') or []) or 'none found'}")
+    lines.append("- CTAs: " + ("; ".join(page.get("ctas") or []) or "none found"))
+    forms = page.get("forms") or []
+    if forms:
+        for f in forms:
+            lines.append(f"- Form {f['method']} {f['action'] or '(same page)'}: {len(f['fields'])} fields "
+                         f"({', '.join(f['fields'][:8])}); submit: {f['submit'] or '[unlabeled]'}")
+    else:
+        lines.append("- Forms: none found")
+    lines.append("- Trust signals: " + ("; ".join(page.get("trust") or []) or "none found"))
+    if page.get("headings"):
+        lines.append("- Headings:\n" + "\n".join(f"  - {h}" for h in page["headings"]))
+    if page.get("text"):
+        lines.append("- Copy sample:\n" + "\n".join(f"  > {t[:220]}" for t in page["text"][:6]))
+    return clip_to_tokens("\n".join(lines), max_tokens)
+
+
+def page_digest(url: str, max_tokens: int = DIGEST_TOKENS, timeout: float = 15.0) -> str:
+    """Fetch + extract + render; "" when the page cannot be fetched."""
+    res = fetch_page(url, timeout=timeout)
+    if res["error"] or res["status"] >= 400 or not res["body"]:
+        return ""
+    return render_digest(extract(res["body"], res["final_url"]), max_tokens)
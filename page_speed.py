@@ -0,0 +1,117 @@
+"""
+Page-weight and speed measurements for the conversion audit.
+
+Given a crawled page (site_crawler / page_extract), re-fetches the HTML with
+compression negotiated and downloads its scripts, stylesheets and images
+concurrently, then reports concrete numbers the audit agent can cite instead
+of guessing:
+
+  - bytes and request counts per type (html / js / css / img)
+  - render-blocking resources (sync scripts and stylesheets in <head>)
+  - text assets served without compression
+  - time to first byte, HTML download time, total download time
+
+Sizes are transfer sizes as received (compressed when the server compresses).
+Timings are from this server's network position, not a real browser.
+"""
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List
+
+from page_extract import fetch_page
+
+ACCEPT_ENCODING = {"Accept-Encoding": "gzip, deflate, br"}
+MAX_ASSETS = 40
+MAX_ASSET_BYTES = 10_000_000
+UNCOMPRESSED_MIN_BYTES = 1024
+_TEXT_TYPES = ("html", "js", "css")
+
+
+def _fetch_asset(asset: Dict[str, Any], timeout: float) -> Dict[str, Any]:
+    res = fetch_page(asset["url"], timeout=timeout, headers=ACCEPT_ENCODING, max_bytes=MAX_ASSET_BYTES)
+    return {
+        **asset,
+        "status": res["status"],
+        "bytes": res["raw_bytes"],
+        "encoding": res["headers"].get("content-encoding", ""),
+        "total_s": res["total_s"],
+        "error": res["error"],
+    }
+
+
+def analyze(page: Dict[str, Any], timeout: float = 15.0, workers: int = 6, max_assets: int = MAX_ASSETS) -> Dict[str, Any]:
+    """Measure one page and its assets; returns a metrics dict (see render_facts)."""
+    url = page.get("url") or ""
+    t0 = time.time()
+    html = fetch_page(url, timeout=timeout, headers=ACCEPT_ENCODING)
+    seen, assets = set(), []
+    for a in page.get("assets") or []:
+        if a["url"] not in seen and a["url"].startswith(("http://", "https://")):
+            seen.add(a["url"])
+            assets.append(a)
+    assets = assets[:max_assets]
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(assets) or 1))) as pool:
+        fetched: List[Dict[str, Any]] = list(pool.map(lambda a: _fetch_asset(a, timeout), assets))
+    wall_s = round(time.time() - t0, 3)
+
+    by_type = {t: {"requests": 0, "bytes": 0} for t in ("html", "js", "css", "img")}
+    by_type["html"] = {"requests": 1, "bytes": html["raw_bytes"]}
+    for a in fetched:
+        if a["error"] or a["status"] >= 400:
+            continue
+        by_type[a["type"]]["requests"] += 1
+        by_type[a["type"]]["bytes"] += a["bytes"]
+
+    html_row = {"url": url, "type": "html", "bytes": html["raw_bytes"], "encoding": html["headers"].get("content-encoding", "")}
+    uncompressed = [
+        {"url": a["url"], "type": a["type"], "bytes": a["bytes"]}
+        for a in [html_row] + fetched
+        if a["type"] in _TEXT_TYPES and not a.get("encoding") and a.get("bytes", 0) >= UNCOMPRESSED_MIN_BYTES
+    ]
+    blocking = [a["url"] for a in fetched if a["type"] in ("js", "css") and a.get("in_head") and not a.get("async")]
+    largest = sorted(
+        [{"url": a["url"], "type": a["type"], "bytes": a["bytes"]} for a in fetched if not a["error"]],
+        key=lambda a: a["bytes"], reverse=True,
+    )[:5]
+    return {
+        "url": url,
+        "status": html["status"],
+        "ttfb_s": html["ttfb_s"],
+        "html_download_s": html["total_s"],
+        "total_download_s": wall_s,
+        "total_bytes": sum(t["bytes"] for t in by_type.values()),
+        "total_requests": sum(t["requests"] for t in by_type.values()),
+        "by_type": by_type,
+        "render_blocking": blocking,
+        "uncompressed": uncompressed,
+        "largest": largest,
+        "assets_skipped": max(0, len(page.get("assets") or []) - len(assets)),
+        "errors": sum(1 for a in fetched if a["error"] or a["status"] >= 400),
+    }
+
+
+def _kb(n: int) -> str:
+    return f"{n / 1024:.0f} KB" if n < 1024 * 1024 else f"{n / 1048576:.1f} MB"
+
+
+def render_facts(m: Dict[str, Any]) -> str:
+    """Structured facts block for the audit prompt."""
+    if not m or not m.get("status"):
+        return ""
+    bt = m["by_type"]
+    lines = [
+        f"### Measured speed facts ({m['url']})",
+        f"- TTFB: {m['ttfb_s']}s · HTML download: {m['html_download_s']}s · all resources: {m['total_download_s']}s",
+        f"- Page weight: {_kb(m['total_bytes'])} in {m['total_requests']} requests",
+        "- By type: " + ", ".join(f"{t} {_kb(v['bytes'])} / {v['requests']} req" for t, v in bt.items()),
+        f"- Render-blocking in <head>: {len(m['render_blocking'])}"
+        + (" (" + ", ".join(u.rsplit('/', 1)[-1] for u in m["render_blocking"][:6]) + ")" if m["render_blocking"] else ""),
+        f"- Uncompressed text assets: {len(m['uncompressed'])}"
+        + (" (" + ", ".join(f"{u['url'].rsplit('/', 1)[-1]} {_kb(u['bytes'])}" for u in m["uncompressed"][:6]) + ")" if m["uncompressed"] else ""),
+    ]
+    if m["largest"]:
+        lines.append("- Largest: " + ", ".join(f"{a['url'].rsplit('/', 1)[-1]} ({a['type']}, {_kb(a['bytes'])})" for a in m["largest"]))
+    if m["assets_skipped"]:
+        lines.append(f"- {m['assets_skipped']} further assets not measured")
+    lines.append("- Measured server-side (no browser rendering); treat timings as indicative.")
+    return "\n".join(lines)
@@ -0,0 +1,40 @@
+"""
+Plan policy shared by the app, the API and the scheduler.
+
+An org's allowed agents live in orgs.allowed_agents_json. When that is empty
+(or lists nothing valid) the plan default applies: the first
+PLAN_AGENT_LIMITS[plan] agents in PLAN_AGENT_ORDER.
+"""
+import json
+from typing import Any, Dict, List
+
+PLAN_AGENT_LIMITS = {"Lite": 3, "Basic": 3, "Pro": 5, "Enterprise": 8, "Unlimited": 12}
+
+# Same order as the app's agent picker (app.py AGENT_UI).
+PLAN_AGENT_ORDER = (
+    "analyst", "marketing_adviser", "market_researcher", "ecommerce_marketer", "ads", "creative",
+    "guest_posting", "strategist", "social", "geo", "gbp_growth", "audit", "seo",
+)
+
+
+def plan_agent_limit(plan: str) -> int:
+    return int(PLAN_AGENT_LIMITS.get(plan, 3))
+
+
+def default_allowed_agents_for_plan(plan: str) -> List[str]:
+    return list(PLAN_AGENT_ORDER[:min(plan_agent_limit(plan), len(PLAN_AGENT_ORDER))])
+
+
+def stored_allowed_agents(org: Dict[str, Any]) -> List[str]:
+    """The org's explicit allow-list (valid keys only); [] when unset."""
+    raw = str(org.get("allowed_agents_json") or "").strip()
+    try:
+        lst = json.loads(raw) if raw else []
+    except ValueError:
+        lst = []
+    return [x for x in lst if x in PLAN_AGENT_ORDER] if isinstance(lst, list) else []
+
+
+def allowed_agents(org: Dict[str, Any]) -> List[str]:
+    """Explicit allow-list, else the plan default (what app.get_allowed_agents returns)."""
+    return stored_allowed_agents(org) or default_allowed_agents_for_plan(str(org.get("plan") or "Lite"))
@@ -0,0 +1,339 @@
+"""
+Progress delivery for swarm missions.
+
+The mission runs on a background thread and publishes events as each agent
+starts/finishes. The UI (or any other subscriber) consumes them from a queue,
+so the next agent starts immediately and nothing waits on a timer.
+
+Event shape: {"type": str, "ts": float, ...data}
+  mission_started   agents=[...]
+  agent_started     agent=key
+  token             agent=key, chunk=str            (streaming mode only)
+  metric            agent=key, <name>=<value>...    (e.g. ttft_s, total_s)
+  agent_done        agent=key, output=str, seconds=float
+  agent_cancelled   agent=key, reason=str           (Stop pressed mid-agent)
+  stage_started     stage=name                      (hidden mission stages, e.g. research)
+  stage_done        stage=name
+  research_brief    brief=str, tokens=int
+  mission_done      results={...}
+  mission_error     error=str
+"""
+import queue
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+
+# ============================================================
+# CHANNEL (pub/sub)
+# ============================================================
+class ProgressChannel:
+    """Thread-safe fan-out of progress events to any number of subscribers."""
+
+    def __init__(self, history_limit: int = 2000):
+        self._lock = threading.Lock()
+        self._subs: List[queue.Queue] = []
+        self._listeners: List[Callable[[Dict[str, Any]], None]] = []
+        self._history: List[Dict[str, Any]] = []
+        self._history_limit = history_limit
+
+    def publish(self, event_type: str, **data) -> Dict[str, Any]:
+        evt = {"type": event_type, "ts": time.time(), **data}
+        with self._lock:
+            self._history.append(evt)
+            if len(self._history) > self._history_limit:
+                self._history = self._history[-self._history_limit:]
+            subs = list(self._subs)
+            listeners = list(self._listeners)
+        for q in subs:
+            q.put(evt)
+        for fn in listeners:
+            try:
+                fn(evt)
+            except Exception:
+                pass
+        return evt
+
+    def subscribe(self, replay: bool = True) -> queue.Queue:
+        """New subscriber queue. replay=True pre-loads events already published."""
+        q: queue.Queue = queue.Queue()
+        with self._lock:
+            if replay:
+                for evt in self._history:
+                    q.put(evt)
+            self._subs.append(q)
+        return q
+
+    def listen(self, fn: Callable[[Dict[str, Any]], None], replay: bool = False):
+        """
+        Call fn(evt) on the publishing thread for every event; nothing queues
+        up when nobody reads. replay=True first feeds it the retained history.
+        """
+        with self._lock:
+            if replay:
+                for evt in self._history:
+                    fn(evt)
+            self._listeners.append(fn)
+
+    def unsubscribe(self, q: queue.Queue):
+        with self._lock:
+            if q in self._subs:
+                self._subs.remove(q)
+
+    def history(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return list(self._history)
+
+
+def publish(channel: Optional[ProgressChannel], event_type: str, **data):
+    """No-op when there is no channel (e.g. synchronous retries)."""
+    if channel is None:
+        return
+    try:
+        channel.publish(event_type, **data)
+    except Exception:
+        pass
+
+
+# ============================================================
+# CANCELLATION
+# ============================================================
+class MissionCancelled(Exception):
+    """Raised inside a run when its CancelToken is cancelled."""
+
+
+class AgentTimeout(MissionCancelled):
+    """Raised when an agent exceeds its wall-clock deadline."""
+
+
+class OutputDegenerated(MissionCancelled):
+    """Raised when the runaway guard aborts an attempt (loop / length budget)."""
+
+
+class CancelToken:
+    """
+    Cooperative cancellation: a stop flag plus an optional wall-clock deadline.
+    Child tokens inherit the parent's cancellation (mission -> agent -> retry).
+    """
+
+    def __init__(self, parent: Optional["CancelToken"] = None, deadline_s: Optional[float] = None):
+        self._parent = parent
+        self._event = threading.Event()
+        self._reason = ""
+        self._error = MissionCancelled
+        self.deadline_s = deadline_s
+        self.deadline_at = (time.time() + float(deadline_s)) if deadline_s else None
+
+    def cancel(self, reason: str = "cancelled", error: type = MissionCancelled):
+        if not self._event.is_set():
+            self._reason, self._error = reason, error
+        self._event.set()
+
+    def child(self, deadline_s: Optional[float] = None) -> "CancelToken":
+        return CancelToken(parent=self, deadline_s=deadline_s)
+
+    @property
+    def timed_out(self) -> bool:
+        return self.deadline_at is not None and time.time() >= self.deadline_at
+
+    @property
+    def cancelled(self) -> bool:
+        if self._event.is_set() or self.timed_out:
+            return True
+        return bool(self._parent and self._parent.cancelled)
+
+    def remaining(self) -> Optional[float]:
+        """Seconds to the nearest deadline in the chain (None = no deadline)."""
+        mine = max(0.0, self.deadline_at - time.time()) if self.deadline_at else None
+        theirs = self._parent.remaining() if self._parent else None
+        vals = [v for v in (mine, theirs) if v is not None]
+        return min(vals) if vals else None
+
+    def check(self):
+        if self._event.is_set():
+            raise self._error(self._reason)
+        if self.timed_out:
+            raise AgentTimeout(f"deadline of {self.deadline_s:.0f}s exceeded")
+        if self._parent:
+            self._parent.check()
+
+    def sleep(self, seconds: float):
+        """Interruptible sleep; raises as soon as the token is cancelled."""
+        end = time.time() + max(0.0, seconds)
+        while True:
+            self.check()
+            left = end - time.time()
+            if left <= 0:
+                return
+            self._event.wait(timeout=min(0.25, left))
+
+
+# ============================================================
+# CONTROL (pause / stop / optional pacing)
+# ============================================================
+class RunControl:
+    """
+    Between-agent gate owned by the UI and honoured by the mission loop.
+    min_interval_s is an optional rate-limit policy (0 = run back-to-back).
+    """
+
+    def __init__(self, min_interval_s: float = 0.0, pause_after_each: bool = False):
+        self.min_interval_s = max(0.0, float(min_interval_s or 0))
+        self.pause_after_each = bool(pause_after_each)
+        self._resume = threading.Event()
+        self._resume.set()
+        self._stop = threading.Event()
+        self._last_start = 0.0
+        self.token = CancelToken()  # parent of every per-agent token in the run
+
+    @property
+    def paused(self) -> bool:
+        return not self._resume.is_set()
+
+    @property
+    def stopped(self) -> bool:
+        return self._stop.is_set()
+
+    def pause(self):
+        self._resume.clear()
+
+    def resume(self):
+        self._resume.set()
+
+    def stop(self):
+        self._stop.set()
+        self.token.cancel("stopped by user")  # aborts the in-flight agent too
+        self._resume.set()  # wake a paused loop so it can exit
+
+    def wait_turn(self) -> bool:
+        """Block while paused and apply pacing. Returns False once stopped."""
+        while not self._resume.wait(timeout=0.5):
+            if self.stopped:
+                return False
+        if self.stopped:
+            return False
+        if self.min_interval_s and self._last_start:
+            remaining = self._last_start + self.min_interval_s - time.time()
+            if remaining > 0 and self._stop.wait(timeout=remaining):
+                return False
+        self._last_start = time.time()
+        return True
+
+    def agent_finished(self):
+        if self.pause_after_each:
+            self.pause()
+
+
+# ============================================================
+# RUNNER (background mission thread)
+# ============================================================
+class SwarmRunner:
+    """
+    Runs run_fn(payload, channel=..., control=...) on a daemon thread.
+    run_fn is main.run_marketing_swarm; it publishes per-agent events itself.
+
+    With inbox=True (the Streamlit app) events queue until drain(). Headless
+    callers that never drain (api.py) pass inbox=False: current and metrics
+    are updated as events are published, nothing queues, and streamed token
+    text is not accumulated in partial.
+    """
+
+    def __init__(
+        self,
+        payload: Dict[str, Any],
+        agents: List[str],
+        run_fn: Callable[..., Dict[str, str]],
+        min_interval_s: float = 0.0,
+        pause_after_each: bool = False,
+        inbox: bool = True,
+    ):
+        self.payload = dict(payload)
+        self.payload["active_swarm"] = list(agents)
+        self.agents = list(agents)
+        self.run_fn = run_fn
+        self.channel = ProgressChannel()
+        self.control = RunControl(min_interval_s=min_interval_s, pause_after_each=pause_after_each)
+        self.results: Dict[str, str] = {}
+        self.partial: Dict[str, str] = {}  # streamed text of agents still running
+        self.metrics: Dict[str, Dict[str, Any]] = {}
+        self.current: Optional[str] = None
+        self.done = threading.Event()
+        self._pending: List[Dict[str, Any]] = []
+        self._thread: Optional[threading.Thread] = None
+        self._track_lock = threading.Lock()
+        self._inbox: Optional[queue.Queue] = None
+        if inbox:
+            self._inbox = self.channel.subscribe(replay=False)
+        else:
+            self.channel.listen(self._track)
+
+    def start(self) -> "SwarmRunner":
+        self._thread = threading.Thread(target=self._run, name="swarm-runner", daemon=True)
+        self._thread.start()
+        return self
+
+    def _run(self):
+        self.channel.publish("mission_started", agents=self.agents)
+        try:
+            out = self.run_fn(self.payload, channel=self.channel, control=self.control) or {}
+            self.results.update(out)
+            self.channel.publish("mission_done", results=dict(self.results))
+        except Exception as e:
+            self.channel.publish("mission_error", error=str(e))
+        finally:
+            self.done.set()
+
+    @property
+    def alive(self) -> bool:
+        return bool(self._thread and self._thread.is_alive())
+
+    def _track(self, evt: Dict[str, Any]):
+        kind, agent = evt["type"], evt.get("agent")
+        if kind == "token" and self._inbox is None:
+            return
+        with self._track_lock:
+            self._apply(kind, agent, evt)
+
+    def _apply(self, kind: str, agent: Optional[str], evt: Dict[str, Any]):
+        if kind == "agent_started":
+            self.current = agent
+            self.partial[agent] = ""
+        elif kind == "token":
+            self.partial[agent] = self.partial.get(agent, "") + str(evt.get("chunk", ""))
+        elif kind == "metric":
+            vals = {k: v for k, v in evt.items() if k not in {"type", "ts", "agent"}}
+            self.metrics.setdefault(agent, {}).update(vals)
+        elif kind == "agent_done":
+            self.current = None
+            self.partial.pop(agent, None)
+
+    def drain(self) -> List[Dict[str, Any]]:
+        """All events published since the last drain (non-blocking); [] without an inbox."""
+        events, self._pending = self._pending, []
+        while self._inbox is not None:
+            try:
+                evt = self._inbox.get_nowait()
+            except queue.Empty:
+                break
+            events.append(evt)
+        for evt in events:
+            self._track(evt)
+        return events
+
+    def wait(self, timeout: float = 0.5) -> bool:
+        """Block up to timeout for a new event; it stays pending for drain()."""
+        if self._pending:
+            return True
+        if self._inbox is None:
+            self.done.wait(timeout)
+            return False
+        try:
+            self._pending.append(self._inbox.get(timeout=timeout))
+        except queue.Empty:
+            return False
+        return True
+
+    def metrics_snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """Copy of metrics that is safe to serialize while the mission publishes."""
+        with self._track_lock:
+            return {k: dict(v) for k, v in self.metrics.items()}
@@ -0,0 +1,174 @@
+"""
+Explicit Gemini context caching of the mission's shared prompt block.
+
+Every agent's instructions include the same invariant block: safety rules,
+brand profile and research brief (main.shared_prefix). A MissionPrefix holds
+that block for one mission. When a backend is configured and the block meets
+the model's explicit-cache minimum (MIN_CACHE_TOKENS), it is registered once
+per model as a cachedContent whose system_instruction is the block; every
+call on that model then passes the handle (cached_content) and sends only its
+own role and task text. Input tokens of the block are billed at the cached
+rate and are not re-sent.
+
+Gemini rejects cached_content together with a request-level
+system_instruction or tools, so a call that uses the handle must send no
+system message and no native tools (main._run_one only uses it for tool-free
+agents with use_system_prompt=False). Everything else gets the block inline,
+which is a normal, uncached prompt.
+
+When the block is below the minimum (the usual case: ~750 tokens against
+1024-4096) nothing is registered and stats() says why ("skipped: ..."); the
+mission publishes that in its "prompt_cache" metric.
+
+Backends:
+  GeminiContextCache  google-genai caches API (one client per process)
+  LocalPromptCache    in-memory fake with the same contract, for tests
+"""
+import os
+import threading
+from typing import Any, Dict, Optional
+
+from digest import estimate_tokens
+
+# Explicit caching minimums per model (input tokens).
+MIN_CACHE_TOKENS: Dict[str, int] = {
+    "gemini-2.5-flash": 1024,
+    "gemini-2.5-pro": 2048,
+    "gemini-2.0-flash": 4096,
+    "gemini-2.0-flash-lite": 4096,
+}
+DEFAULT_MIN_CACHE_TOKENS = 4096
+DEFAULT_TTL_S = 1800  # longer than a mission; release() deletes it earlier
+
+
+def _bare_model(model: str) -> str:
+    """'google/gemini-2.0-flash' -> 'gemini-2.0-flash'."""
+    return (model or "").split("/", 1)[-1]
+
+
+def min_cache_tokens(model: str) -> int:
+    return MIN_CACHE_TOKENS.get(_bare_model(model), DEFAULT_MIN_CACHE_TOKENS)
+
+
+class LocalPromptCache:
+    """In-memory fake: records every registration and deletion; handles are "local/<n>"."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.entries: Dict[str, Dict[str, Any]] = {}
+        self.registrations = 0
+        self.deletions = 0
+
+    def create(self, model: str, text: str, ttl_s: int = DEFAULT_TTL_S) -> str:
+        with self._lock:
+            self.registrations += 1
+            handle = f"local/{self.registrations}"
+            self.entries[handle] = {"model": model, "text": text, "ttl_s": ttl_s}
+        return handle
+
+    def delete(self, handle: str):
+        with self._lock:
+            if self.entries.pop(handle, None) is not None:
+                self.deletions += 1
+
+
+class GeminiContextCache:
+    """google-genai cachedContents (optional dependency)."""
+
+    def __init__(self, api_key: str):
+        from google import genai
+        from google.genai import types
+
+        self._types = types
+        self._client = genai.Client(api_key=api_key)
+
+    def create(self, model: str, text: str, ttl_s: int = DEFAULT_TTL_S) -> str:
+        cache = self._client.caches.create(
+            model=_bare_model(model),
+            config=self._types.CreateCachedContentConfig(
+                system_instruction=text, ttl=f"{int(ttl_s)}s", display_name="swarm-mission-prefix",
+            ),
+        )
+        return cache.name
+
+    def delete(self, handle: str):
+        self._client.caches.delete(name=handle)
+
+
+_backend_lock = threading.Lock()
+_backends: Dict[str, Any] = {}
+
+
+def get_backend(api_key: Optional[str]):
+    """Process-wide Gemini backend; None when SWARM_PROMPT_CACHE=off, without a key or without google-genai."""
+    if (os.getenv("SWARM_PROMPT_CACHE") or "gemini").strip().lower() == "off" or not api_key:
+        return None
+    with _backend_lock:
+        if api_key not in _backends:
+            try:
+                _backends[api_key] = GeminiContextCache(api_key)
+            except Exception:
+                _backends[api_key] = None
+        return _backends[api_key]
+
+
+class MissionPrefix:
+    """The invariant block for one mission; registered lazily, once per model, when large enough."""
+
+    def __init__(self, text: str, backend: Any = None, ttl_s: int = DEFAULT_TTL_S):
+        self.text = text
+        self.backend = backend
+        self.ttl_s = ttl_s
+        self._lock = threading.Lock()
+        self._handles: Dict[str, Optional[str]] = {}
+        self.skipped: Dict[str, str] = {}  # model -> reason
+        self.references = 0
+
+    @property
+    def tokens(self) -> int:
+        return estimate_tokens(self.text)
+
+    def handle(self, model: str) -> Optional[str]:
+        """cachedContent name for `model` (counted as one reference), or None to send the block inline."""
+        with self._lock:
+            if model not in self._handles:
+                self._handles[model] = self._register(model)
+            handle = self._handles[model]
+            if handle:
+                self.references += 1
+        return handle
+
+    def _register(self, model: str) -> Optional[str]:
+        # caller holds self._lock
+        if self.backend is None:
+            self.skipped[model] = "off"
+            return None
+        need = min_cache_tokens(model)
+        if self.tokens < need:
+            self.skipped[model] = f"skipped: {self.tokens} < {need} tokens"
+            return None
+        try:
+            return self.backend.create(model, self.text, self.ttl_s)
+        except Exception as e:
+            self.skipped[model] = f"skipped: {type(e).__name__}"
+            return None
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            cached = sorted(m for m, h in self._handles.items() if h)
+            return {
+                "prefix_tokens": self.tokens,
+                "prefix_cache_models": cached,
+                "prefix_cache_refs": self.references,
+                "prefix_cache_skipped": dict(self.skipped),
+            }
+
+    def release(self):
+        """Delete this mission's cached contents; safe to call more than once."""
+        with self._lock:
+            handles, self._handles = [h for h in self._handles.values() if h], {}
+        for h in handles:
+            try:
+                self.backend.delete(h)
+            except Exception:
+                pass  # the TTL expires it anyway
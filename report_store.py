@@ -0,0 +1,267 @@
+"""
+Server-side report store.
+
+Seat outputs are rows in report_sections, keyed by (report_id, section), and
+listed in insertion order (position; a replaced section keeps its place). The
+report id is the mission id. A Streamlit session keeps only that id and reads
+sections through ReportView, a lazy read-only mapping. Section text sits in one
+process-wide LRU bounded by bytes (SWARM_REPORT_CACHE_MB), not in every
+session, so a session's own memory does not grow with report size. A report
+outlives the session: app.py puts its id in the ?report= query parameter, so a
+browser refresh finds it again.
+
+Multi-location missions store one report per city under "<mission id>:<n>".
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterator, List, Mapping, Optional, Tuple
+
+REPORT_DB = os.getenv("SWARM_REPORT_DB") or os.getenv("SWARM_DB_PATH", "breatheeasy.db")
+CACHE_BYTES = int(float(os.getenv("SWARM_REPORT_CACHE_MB", "64") or 64) * 1024 * 1024)
+REPORT_TTL_DAYS = 30  # unsaved reports; the vault keeps anything worth keeping
+
+
+class SectionCache:
+    """LRU of section text, bounded by total UTF-8 bytes rather than entry count."""
+
+    def __init__(self, max_bytes: int = CACHE_BYTES):
+        self.max_bytes = max(0, int(max_bytes))
+        self._items: "OrderedDict[Tuple[str, str], Tuple[Any, int]]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _size(value: Any) -> int:
+        if isinstance(value, str):
+            return len(value.encode("utf-8")) + 64
+        return sum(len(str(v)) for v in value) + 64
+
+    def get(self, key: Tuple[str, str]) -> Optional[Any]:
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                self.misses += 1
+                return None
+            self._items.move_to_end(key)
+            self.hits += 1
+            return item[0]
+
+    def put(self, key: Tuple[str, str], value: Any):
+        size = self._size(value)
+        with self._lock:
+            old = self._items.pop(key, None)
+            if old is not None:
+                self._bytes -= old[1]
+            if size > self.max_bytes:
+                return
+            self._items[key] = (value, size)
+            self._bytes += size
+            while self._bytes > self.max_bytes and self._items:
+                _, (_, dropped) = self._items.popitem(last=False)
+                self._bytes -= dropped
+
+    def discard(self, key: Tuple[str, str]):
+        with self._lock:
+            item = self._items.pop(key, None)
+            if item is not None:
+                self._bytes -= item[1]
+
+    def drop(self, report_id: str):
+        with self._lock:
+            for key in [k for k in self._items if k[0] == report_id]:
+                self._bytes -= self._items.pop(key)[1]
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"entries": len(self._items), "bytes": self._bytes, "max_bytes": self.max_bytes,
+                    "hits": self.hits, "misses": self.misses}
+
+
+_NAMES = "\x00names"  # cache key for a report's section list
+
+
+class ReportStore:
+    def __init__(self, path: str = REPORT_DB, cache_bytes: int = CACHE_BYTES):
+        self.path = path
+        self.cache = SectionCache(cache_bytes)
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+
+    def _db(self) -> sqlite3.Connection:
+        # caller holds self._lock
+        if self._conn is None:
+            conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS reports (
+                    report_id TEXT PRIMARY KEY,
+                    team_id TEXT,
+                    payload_json TEXT DEFAULT '{}',
+                    agents_json TEXT DEFAULT '[]',
+                    created_at REAL,
+                    updated_at REAL
+                )
+            """)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS report_sections (
+                    report_id TEXT,
+                    section TEXT,
+                    body TEXT,
+                    updated_at REAL,
+                    position INTEGER,
+                    PRIMARY KEY (report_id, section)
+                )
+            """)
+            cols = {r[1] for r in conn.execute("PRAGMA table_info(report_sections)")}
+            if "position" not in cols:  # DBs created before sections kept their order
+                conn.execute("ALTER TABLE report_sections ADD COLUMN position INTEGER")
+                conn.execute("UPDATE report_sections SET position=rowid")
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    def create(self, report_id: str, team_id: str, payload: Dict[str, Any], agents: List[str],
+               sections: Optional[Dict[str, str]] = None):
+        """Start (or restart) a report: meta replaced, old sections dropped."""
+        now = time.time()
+        payload = {k: v for k, v in (payload or {}).items() if k not in {"prior_outputs", "previous_report"}}
+        with self._lock:
+            conn = self._db()
+            conn.execute("DELETE FROM report_sections WHERE report_id=?", (report_id,))
+            conn.execute("""
+                INSERT OR REPLACE INTO reports (report_id,team_id,payload_json,agents_json,created_at,updated_at)
+                VALUES (?,?,?,?,?,?)
+            """, (report_id, team_id, json.dumps(payload, default=str), json.dumps(list(agents or [])), now, now))
+            conn.commit()
+        self.cache.drop(report_id)
+        if sections:
+            self.put(report_id, sections)
+
+    def put(self, report_id: str, sections: Dict[str, str]):
+        """Upsert sections (None removes one)."""
+        if not report_id or not sections:
+            return
+        now = time.time()
+        with self._lock:
+            conn = self._db()
+            for name, body in sections.items():
+                if body is None:
+                    conn.execute("DELETE FROM report_sections WHERE report_id=? AND section=?", (report_id, name))
+                else:
+                    # an upsert, not INSERT OR REPLACE: a replaced row would lose its position
+                    conn.execute("""
+                        INSERT INTO report_sections (report_id,section,body,updated_at,position)
+                        VALUES (?,?,?,?,(SELECT COALESCE(MAX(position), 0) + 1 FROM report_sections WHERE report_id=?))
+                        ON CONFLICT(report_id, section) DO UPDATE SET body=excluded.body, updated_at=excluded.updated_at
+                    """, (report_id, name, str(body), now, report_id))
+            conn.execute("UPDATE reports SET updated_at=? WHERE report_id=?", (now, report_id))
+            conn.commit()
+        for name, body in sections.items():
+            if body is None:
+                self.cache.discard((report_id, name))
+            else:
+                self.cache.put((report_id, name), str(body))
+        self.cache.discard((report_id, _NAMES))
+
+    def update_meta(self, report_id: str, payload: Optional[Dict[str, Any]] = None,
+                    agents: Optional[List[str]] = None):
+        sets, args = [], []
+        if payload is not None:
+            sets.append("payload_json=?")
+            args.append(json.dumps({k: v for k, v in payload.items() if k not in {"prior_outputs", "previous_report"}},
+                                   default=str))
+        if agents is not None:
+            sets.append("agents_json=?")
+            args.append(json.dumps(list(agents)))
+        if not sets:
+            return
+        with self._lock:
+            conn = self._db()
+            conn.execute(f"UPDATE reports SET {', '.join(sets)}, updated_at=? WHERE report_id=?",
+                         (*args, time.time(), report_id))
+            conn.commit()
+
+    def get(self, report_id: str, section: str) -> Optional[str]:
+        if not report_id:
+            return None
+        cached = self.cache.get((report_id, section))
+        if cached is not None:
+            return cached
+        with self._lock:
+            row = self._db().execute("SELECT body FROM report_sections WHERE report_id=? AND section=?",
+                                     (report_id, section)).fetchone()
+        if row is None:
+            return None
+        self.cache.put((report_id, section), row[0])
+        return row[0]
+
+    def names(self, report_id: str) -> Tuple[str, ...]:
+        if not report_id:
+            return ()
+        cached = self.cache.get((report_id, _NAMES))
+        if cached is not None:
+            return cached
+        with self._lock:
+            rows = self._db().execute("SELECT section FROM report_sections WHERE report_id=? ORDER BY position, rowid",
+                                      (report_id,)).fetchall()
+        names = tuple(r[0] for r in rows)
+        self.cache.put((report_id, _NAMES), names)
+        return names
+
+    def meta(self, report_id: str) -> Optional[Dict[str, Any]]:
+        if not report_id:
+            return None
+        with self._lock:
+            row = self._db().execute("SELECT team_id,payload_json,agents_json,updated_at FROM reports WHERE report_id=?",
+                                     (report_id,)).fetchone()
+        if row is None:
+            return None
+        return {"team_id": row[0], "payload": json.loads(row[1] or "{}"),
+                "agents": json.loads(row[2] or "[]"), "updated_at": row[3]}
+
+    def view(self, report_id: str) -> "ReportView":
+        return ReportView(self, report_id)
+
+    def prune(self, max_age_days: float = REPORT_TTL_DAYS) -> int:
+        cutoff = time.time() - max_age_days * 86400
+        with self._lock:
+            conn = self._db()
+            ids = [r[0] for r in conn.execute("SELECT report_id FROM reports WHERE updated_at < ?", (cutoff,))]
+            for rid in ids:
+                conn.execute("DELETE FROM report_sections WHERE report_id=?", (rid,))
+                conn.execute("DELETE FROM reports WHERE report_id=?", (rid,))
+            conn.commit()
+        for rid in ids:
+            self.cache.drop(rid)
+        return len(ids)
+
+
+class ReportView(Mapping):
+    """Read-only, lazy {section: text} for one stored report; text is fetched on access."""
+
+    def __init__(self, store: ReportStore, report_id: str):
+        self.store = store
+        self.report_id = report_id or ""
+
+    def __getitem__(self, section: str) -> str:
+        body = self.store.get(self.report_id, section)
+        if body is None:
+            raise KeyError(section)
+        return body
+
+    def __contains__(self, section: object) -> bool:
+        return section in self.store.names(self.report_id)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.store.names(self.report_id))
+
+    def __len__(self) -> int:
+        return len(self.store.names(self.report_id))
+
+
+REPORTS = ReportStore()
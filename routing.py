@@ -0,0 +1,142 @@
+"""
+Model routing: agent key -> tier -> ordered model candidates.
+
+Template-heavy agents run on a lite model, synthesis agents on a stronger
+one. The first candidate is the primary; the rest are siblings tried in
+order when the primary is rate-limited (429 / RESOURCE_EXHAUSTED).
+
+Per-call latency, tokens and estimated cost are recorded per tier so the
+mapping can be tuned from Root Admin -> SaaS Health.
+"""
+import os
+import threading
+from typing import Any, Dict, List, Optional
+
+# Override a tier's primary with SWARM_MODEL_LITE / _STANDARD / _STRONG.
+MODEL_TIERS: Dict[str, List[str]] = {
+    "lite": ["google/gemini-2.0-flash-lite", "google/gemini-2.0-flash"],
+    "standard": ["google/gemini-2.0-flash", "google/gemini-2.0-flash-lite"],
+    "strong": ["google/gemini-2.5-flash", "google/gemini-2.0-flash"],
+}
+
+AGENT_TIERS: Dict[str, str] = {
+    "ads": "lite",
+    "social": "lite",
+    "gbp_growth": "lite",
+    "geo": "lite",
+    "strategist": "strong",
+    "analyst": "strong",
+}
+DEFAULT_TIER = "standard"
+
+# USD per 1M tokens (input, output). Public list prices; used for estimates only.
+MODEL_PRICES_PER_1M: Dict[str, tuple] = {
+    "google/gemini-2.0-flash-lite": (0.075, 0.30),
+    "google/gemini-2.0-flash": (0.10, 0.40),
+    "google/gemini-2.5-flash": (0.30, 2.50),
+}
+
+# Provider cap on output tokens per call; max_tokens above it is rejected or ignored.
+MODEL_MAX_OUTPUT_TOKENS: Dict[str, int] = {
+    "google/gemini-2.0-flash-lite": 8192,
+    "google/gemini-2.0-flash": 8192,
+    "google/gemini-2.5-flash": 65536,
+}
+DEFAULT_MAX_OUTPUT_TOKENS = 8192
+
+
+def max_output_tokens(model: str) -> int:
+    name = model if "/" in (model or "") else f"google/{model}"
+    return MODEL_MAX_OUTPUT_TOKENS.get(name, DEFAULT_MAX_OUTPUT_TOKENS)
+
+
+def tier_for(agent_key: str, inputs: Optional[Dict[str, Any]] = None) -> str:
+    overrides = (inputs or {}).get("agent_tiers") or {}
+    tier = overrides.get(agent_key) or AGENT_TIERS.get(agent_key) or DEFAULT_TIER
+    return tier if tier in MODEL_TIERS else DEFAULT_TIER
+
+
+def models_for(agent_key: str, inputs: Optional[Dict[str, Any]] = None) -> List[str]:
+    """Primary model first, then failover siblings (deduplicated)."""
+    return tier_models(tier_for(agent_key, inputs))
+
+
+def tier_models(tier: str) -> List[str]:
+    tier = tier if tier in MODEL_TIERS else DEFAULT_TIER
+    models = list(MODEL_TIERS[tier])
+    env_primary = os.getenv(f"SWARM_MODEL_{tier.upper()}")
+    if env_primary:
+        models.insert(0, env_primary)
+    seen, ordered = set(), []
+    for m in models:
+        if m not in seen:
+            seen.add(m)
+            ordered.append(m)
+    return ordered
+
+
+def estimate_cost(model: str, prompt_tokens: int, completion_tokens: int) -> float:
+    p_in, p_out = MODEL_PRICES_PER_1M.get(model, (0.0, 0.0))
+    return round((prompt_tokens * p_in + completion_tokens * p_out) / 1_000_000, 6)
+
+
+def usage_from(kickoff_result: Any, crew: Any = None) -> Dict[str, int]:
+    """Token usage from a CrewOutput (token_usage) or the crew's usage_metrics."""
+    usage = getattr(kickoff_result, "token_usage", None) or getattr(crew, "usage_metrics", None)
+    if usage is None:
+        return {"prompt_tokens": 0, "completion_tokens": 0}
+    if isinstance(usage, dict):
+        get = usage.get
+    else:
+        get = lambda k, d=0: getattr(usage, k, d)  # noqa: E731
+    return {
+        "prompt_tokens": int(get("prompt_tokens", 0) or 0),
+        "completion_tokens": int(get("completion_tokens", 0) or 0),
+    }
+
+
+# ============================================================
+# PER-TIER STATS (process-wide)
+# ============================================================
+_STATS_LOCK = threading.Lock()
+_TIER_STATS: Dict[str, Dict[str, float]] = {}
+
+
+def record_call(tier: str, model: str, seconds: float, prompt_tokens: int, completion_tokens: int,
+                failovers: int = 0) -> Dict[str, Any]:
+    cost = estimate_cost(model, prompt_tokens, completion_tokens)
+    with _STATS_LOCK:
+        row = _TIER_STATS.setdefault(tier, {
+            "calls": 0, "seconds": 0.0, "prompt_tokens": 0, "completion_tokens": 0,
+            "cost_usd": 0.0, "failovers": 0,
+        })
+        row["calls"] += 1
+        row["seconds"] += seconds
+        row["prompt_tokens"] += prompt_tokens
+        row["completion_tokens"] += completion_tokens
+        row["cost_usd"] += cost
+        row["failovers"] += failovers
+    return {"tier": tier, "model": model, "cost_usd": cost,
+            "prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens}
+
+
+def tier_report() -> List[Dict[str, Any]]:
+    """One row per tier: routed models, calls, avg latency, tokens, cost, failovers."""
+    with _STATS_LOCK:
+        rows = []
+        for tier, r in sorted(_TIER_STATS.items()):
+            calls = int(r["calls"]) or 1
+            rows.append({
+                "tier": tier,
+                # resolved as routing does, so SWARM_MODEL_* overrides show up here
+                "primary_model": tier_models(tier)[0],
+                "models": " → ".join(tier_models(tier)),
+                "calls": int(r["calls"]),
+                "avg_latency_s": round(r["seconds"] / calls, 2),
+                "prompt_tokens": int(r["prompt_tokens"]),
+                "completion_tokens": int(r["completion_tokens"]),
+                "cost_usd": round(r["cost_usd"], 4),
+                "avg_cost_usd": round(r["cost_usd"] / calls, 5),
+                "failovers": int(r["failovers"]),
+            })
+        return rows
@@ -0,0 +1,168 @@
+"""
+Runaway-output guard.
+
+Gemini occasionally degenerates: it repeats a table row or paragraph until it
+hits the output limit, or returns nothing at all. RunawayGuard inspects the
+streamed text as it grows (and the final text when not streaming) and
+reports why an attempt should be abandoned:
+
+  loop     the output ends in the same line or block repeated back-to-back
+  length   the output exceeded the agent's token budget
+  empty    no usable text came back
+
+Callers abort the attempt, retry once with RETRY_LLM_PARAMS, and fall back
+to trim_loop() on the best text they have.
+"""
+import re
+from typing import Dict, List, Optional, Tuple
+
+from digest import CHARS_PER_TOKEN, estimate_tokens
+from routing import max_output_tokens
+
+DEFAULT_OUTPUT_BUDGET = 6000
+OUTPUT_TOKEN_BUDGETS: Dict[str, int] = {
+    "social": 10000,
+    "gbp_growth": 8000,
+    "creative": 8000,
+    "seo": 8000,
+}
+
+# Second attempt after a loop: a little more entropy, penalize repeats.
+RETRY_LLM_PARAMS: Dict[str, float] = {"temperature": 0.5, "frequency_penalty": 0.4, "presence_penalty": 0.2}
+
+_CHECK_EVERY_CHARS = 400
+_TAIL_CHARS = 120
+_WINDOW_CHARS = 8000
+_MIN_REPEATS = 4
+_MAX_BLOCK_LINES = 8
+# "**CTA:** Book Online Today": label lines legitimately repeat across items.
+_LABEL = re.compile(r"^\s*(?:[-*•]\s+)?\*\*[^*]{1,40}\*\*")
+_LABEL_MAX_CHARS = 80
+
+
+def output_budget(agent_key: str, model: Optional[str] = None) -> int:
+    """The agent's output budget, clamped to the model's output limit when a model is given."""
+    budget = OUTPUT_TOKEN_BUDGETS.get(agent_key, DEFAULT_OUTPUT_BUDGET)
+    return min(budget, max_output_tokens(model)) if model else budget
+
+
+def _is_trivial(line: str) -> bool:
+    s = line.strip().strip("|").replace("-", "").replace(":", "").replace("|", "").strip()
+    return len(s) < 8
+
+
+def _is_label(line: str) -> bool:
+    return len(line.strip()) <= _LABEL_MAX_CHARS and bool(_LABEL.match(line))
+
+
+def _line_repeat(lines: List[str]) -> Optional[Tuple[int, int]]:
+    """
+    (block length, index where the repeats start) when the lines end in one
+    block of up to _MAX_BLOCK_LINES lines repeated back-to-back at least
+    _MIN_REPEATS times. A single repeated line counts only if it is not
+    blank, trivial or a short label line.
+    """
+    keys = [ln.strip() for ln in lines]
+    while keys and not keys[-1]:
+        keys.pop()
+    for size in range(1, _MAX_BLOCK_LINES + 1):
+        if len(keys) < size * _MIN_REPEATS:
+            break
+        block = keys[-size:]
+        if not any(k and not _is_trivial(k) and not _is_label(k) for k in block):
+            continue
+        copies = 1
+        while len(keys) >= size * (copies + 1) and keys[-size * (copies + 1):-size * copies] == block:
+            copies += 1
+        if copies >= _MIN_REPEATS:
+            return size, len(keys) - size * copies
+    return None
+
+
+def _char_repeat(text: str) -> Optional[int]:
+    """Period of a block repeated back-to-back at the end of text (for loops without line breaks)."""
+    window = text[-_WINDOW_CHARS:]
+    if len(window) < _TAIL_CHARS * _MIN_REPEATS:
+        return None
+    tail = window[-_TAIL_CHARS:]
+    prev = window.rfind(tail, 0, len(window) - _TAIL_CHARS)
+    if prev < 0:
+        return None
+    period = len(window) - _TAIL_CHARS - prev
+    copies = max(_MIN_REPEATS, -(-_TAIL_CHARS * _MIN_REPEATS // period))
+    if period * copies > len(window) or not window.endswith(window[-period:] * copies):
+        return None
+    return period
+
+
+def detect_loop(text: str) -> bool:
+    """True when the output ends in a line, block or span repeated back-to-back."""
+    lines = (text or "").splitlines()
+    # a streamed text may end mid-line: also try without the partial last line
+    if _line_repeat(lines) or (len(lines) > 1 and _line_repeat(lines[:-1])):
+        return True
+    return _char_repeat(text or "") is not None
+
+
+def is_empty(text: str) -> bool:
+    s = (text or "").strip()
+    return not s or "no output returned" in s.lower()
+
+
+class RunawayGuard:
+    """Stateful check for one attempt; cheap enough to call on every chunk."""
+
+    def __init__(self, max_tokens: int = DEFAULT_OUTPUT_BUDGET):
+        self.max_tokens = max_tokens
+        self.reason: Optional[str] = None
+        self._checked_at = 0
+
+    def check(self, text: str) -> Optional[str]:
+        """Reason to abort ("loop" / "length"), or None. Rate-limited by text growth."""
+        if self.reason:
+            return self.reason
+        if len(text) - self._checked_at < _CHECK_EVERY_CHARS:
+            return None
+        self._checked_at = len(text)
+        if estimate_tokens(text) > self.max_tokens:
+            self.reason = "length"
+        elif detect_loop(text):
+            self.reason = "loop"
+        return self.reason
+
+    def check_stream(self, capture) -> Optional[str]:
+        """check() for a streaming.StreamCapture: length from the running count, loops from the tail."""
+        if self.reason:
+            return self.reason
+        if capture.length - self._checked_at < _CHECK_EVERY_CHARS:
+            return None
+        self._checked_at = capture.length
+        if (capture.length + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN > self.max_tokens:
+            self.reason = "length"
+        elif detect_loop(capture.tail(_WINDOW_CHARS)):
+            self.reason = "loop"
+        return self.reason
+
+    def final(self, text: str) -> Optional[str]:
+        """Check a complete output (non-streaming runs and the end of a stream)."""
+        if is_empty(text):
+            return "empty"
+        self._checked_at = 0
+        return self.check(text) if len(text) >= _CHECK_EVERY_CHARS else None
+
+
+def trim_loop(text: str) -> str:
+    """Drop the back-to-back repeats at the end of a looping output, keeping one copy."""
+    lines = (text or "").rstrip().splitlines()
+    for candidate in (lines, lines[:-1]):
+        found = _line_repeat(candidate)
+        if found:
+            size, start = found
+            return "\n".join(candidate[:start + size]).rstrip() + "\n\n…[repetition trimmed]"
+    period = _char_repeat((text or "").rstrip())
+    if period:
+        body = (text or "").rstrip()
+        while body.endswith(body[-period:] * 2):
+            body = body[:-period]
+        return body.rstrip() + "\n\n…[repetition trimmed]"
+    return text
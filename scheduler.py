@@ -0,0 +1,383 @@
+"""
+Recurring missions, run off-peak.
+
+mission_schedules (in the app DB) holds one row per recurring mission: the
+mission payload, the agents, a cadence (daily / weekly / monthly) and an
+execution window in the org's timezone, e.g. 01:00-05:00. next_run_at is
+placed inside the window with a per-schedule, per-day jitter, so a hundred
+nightly schedules spread across the window instead of firing together and
+contending for quota.
+
+The runner is a separate process:
+
+    python scheduler.py            # poll forever
+    python scheduler.py --once     # run what is due, then exit (cron)
+
+Due rows are claimed with a lease (locked_until), so several runners can
+share one DB without running a mission twice. A running mission renews its
+lease every LEASE_S / 3 (LeaseHeartbeat), however long it takes; a lease
+only lapses when its runner died, and the row is then reclaimed. Each run is saved to
+reports_vault (created_by "scheduler"), so the report is there before the
+client opens the app. A run missed while no runner was up is caught up on
+the next poll, and the following run is booked in the next window.
+
+The org is re-read at run time: a suspended org's run is skipped, the
+current plan is used, and agents no longer allowed are dropped. Payloads
+with several locations run through run_multi_location and save one vault
+report per city. Resuming a paused schedule books its next run afresh
+instead of firing a stale one.
+"""
+import argparse
+import hashlib
+import json
+import os
+import random
+import re
+import sqlite3
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, List, Optional
+
+try:
+    from zoneinfo import ZoneInfo
+except ImportError:  # pragma: no cover - Python < 3.9
+    ZoneInfo = None
+
+from plans import allowed_agents
+
+DB_PATH = os.getenv("SWARM_DB_PATH", "breatheeasy.db")
+CADENCES = ("daily", "weekly", "monthly")
+DEFAULT_WINDOW = ("01:00", "05:00")
+LEASE_S = 600  # renewed while the mission runs; a dead runner's row is reclaimed after this
+POLL_S = 60
+MAX_PARALLEL = int(os.getenv("SWARM_SCHED_WORKERS", "1") or 1)  # keep low: the point is a flat quota curve
+SCHEDULER_USER = "scheduler"
+
+
+def db_conn(path: str = DB_PATH) -> sqlite3.Connection:
+    conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+
+def init_schedule_tables(conn: sqlite3.Connection):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS mission_schedules (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            team_id TEXT,
+            name TEXT,
+            created_by TEXT,
+            payload_json TEXT,
+            agents_json TEXT,
+            cadence TEXT DEFAULT 'weekly',
+            weekday INTEGER DEFAULT 0,
+            window_start TEXT DEFAULT '01:00',
+            window_end TEXT DEFAULT '05:00',
+            tz TEXT DEFAULT 'UTC',
+            active INTEGER DEFAULT 1,
+            next_run_at TEXT,
+            locked_until TEXT,
+            last_run_at TEXT,
+            last_status TEXT DEFAULT '',
+            last_error TEXT DEFAULT '',
+            last_report_id INTEGER,
+            created_at TEXT DEFAULT (datetime('now'))
+        )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_mission_schedules_due ON mission_schedules(active, next_run_at)")
+    conn.commit()
+
+
+_HHMM = re.compile(r"\s*(\d{1,2}):(\d{2})\s*")
+
+
+def _tz(name: str):
+    if ZoneInfo is not None and name:
+        try:
+            return ZoneInfo(name)
+        except Exception:
+            pass
+    return timezone.utc
+
+
+def _minutes(hhmm: str) -> int:
+    m = _HHMM.fullmatch(str(hhmm or ""))
+    if not m or int(m.group(1)) > 23 or int(m.group(2)) > 59:
+        raise ValueError(f"Time must be HH:MM (00:00-23:59), got {hhmm!r}")
+    return int(m.group(1)) * 60 + int(m.group(2))
+
+
+def validate_schedule(cadence: str, window: tuple, tz: str):
+    """Raises ValueError with a user-facing message for a bad cadence, window or timezone."""
+    if cadence not in CADENCES:
+        raise ValueError(f"Cadence must be one of: {', '.join(CADENCES)}")
+    if _minutes(window[0]) == _minutes(window[1]):
+        raise ValueError("Window start and end must differ")
+    if ZoneInfo is not None:
+        try:
+            ZoneInfo(str(tz or ""))
+        except Exception:
+            raise ValueError(f"Unknown timezone {tz!r}; use an IANA name such as America/Chicago")
+
+
+def _iso(dt: datetime) -> str:
+    return dt.astimezone(timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+
+
+def _jitter_minutes(schedule_id: Any, day: str, span: int) -> int:
+    """Deterministic offset into the window, different per schedule and per day."""
+    seed = int(hashlib.sha256(f"{schedule_id}:{day}".encode("utf-8")).hexdigest()[:12], 16)
+    return random.Random(seed).randrange(max(1, span))
+
+
+def next_run(
+    schedule: Dict[str, Any],
+    after: Optional[datetime] = None,
+) -> datetime:
+    """
+    Next UTC start strictly after `after` (default now): the first day that
+    matches the cadence, at window_start plus jitter, inside the window.
+    Windows may cross midnight (e.g. 22:00-04:00).
+    """
+    after = (after or datetime.now(timezone.utc)).astimezone(timezone.utc)
+    tz = _tz(schedule.get("tz") or "UTC")
+    cadence = schedule.get("cadence") if schedule.get("cadence") in CADENCES else "weekly"
+    start = _minutes(schedule.get("window_start") or DEFAULT_WINDOW[0])
+    end = _minutes(schedule.get("window_end") or DEFAULT_WINDOW[1])
+    span = (end - start) % 1440 or 1440
+    weekday = int(schedule.get("weekday") or 0) % 7
+    local_day = after.astimezone(tz).date() - timedelta(days=1)  # a window opened yesterday may still be ahead
+    for _ in range(400):
+        local_day += timedelta(days=1)
+        if cadence == "weekly" and local_day.weekday() != weekday:
+            continue
+        if cadence == "monthly" and local_day.day != 1:
+            continue
+        offset = start + _jitter_minutes(schedule.get("id"), local_day.isoformat(), span)
+        local = datetime(local_day.year, local_day.month, local_day.day, tzinfo=tz) + timedelta(minutes=offset)
+        if local.astimezone(timezone.utc) > after:
+            return local.astimezone(timezone.utc).replace(microsecond=0)
+    raise ValueError("no run time found for schedule")
+
+
+def create_schedule(
+    conn: sqlite3.Connection,
+    team_id: str,
+    name: str,
+    payload: Dict[str, Any],
+    agents: List[str],
+    created_by: str = "",
+    cadence: str = "weekly",
+    weekday: int = 0,
+    window: tuple = DEFAULT_WINDOW,
+    tz: str = "UTC",
+) -> int:
+    """Insert a schedule and book its first run; raises ValueError on invalid input."""
+    window = (str(window[0]).strip(), str(window[1]).strip())
+    tz = str(tz or "").strip()
+    validate_schedule(cadence, window, tz)
+    cur = conn.execute("""
+        INSERT INTO mission_schedules (team_id,name,created_by,payload_json,agents_json,cadence,weekday,window_start,window_end,tz)
+        VALUES (?,?,?,?,?,?,?,?,?,?)
+    """, (team_id, name, created_by, json.dumps(payload), json.dumps(list(agents)),
+          cadence, int(weekday), window[0], window[1], tz))
+    sid = cur.lastrowid
+    row = dict(id=sid, cadence=cadence, weekday=weekday, window_start=window[0], window_end=window[1], tz=tz)
+    conn.execute("UPDATE mission_schedules SET next_run_at=? WHERE id=?", (_iso(next_run(row)), sid))
+    conn.commit()
+    return sid
+
+
+def set_active(conn: sqlite3.Connection, schedule_id: int, team_id: str, active: bool) -> bool:
+    """Pause or resume; a resumed schedule is booked in its next window, not run late."""
+    row = conn.execute("SELECT * FROM mission_schedules WHERE id=? AND team_id=?",
+                       (int(schedule_id), team_id)).fetchone()
+    if row is None:
+        return False
+    next_at = row["next_run_at"]
+    if active and not row["active"]:
+        try:
+            next_at = _iso(next_run(dict(row)))
+        except ValueError:  # a row saved before validation; leave it paused
+            return False
+    conn.execute("UPDATE mission_schedules SET active=?, next_run_at=? WHERE id=?",
+                 (1 if active else 0, next_at, int(schedule_id)))
+    conn.commit()
+    return True
+
+
+def claim_due(conn: sqlite3.Connection, now: Optional[datetime] = None, limit: int = MAX_PARALLEL) -> List[Dict[str, Any]]:
+    """Lease up to `limit` due schedules; a row is claimed by at most one runner."""
+    now = now or datetime.now(timezone.utc)
+    rows = conn.execute("""
+        SELECT * FROM mission_schedules
+        WHERE active=1 AND next_run_at <= ? AND (locked_until IS NULL OR locked_until < ?)
+        ORDER BY next_run_at LIMIT ?
+    """, (_iso(now), _iso(now), int(limit))).fetchall()
+    claimed = []
+    for row in rows:
+        cur = conn.execute("""
+            UPDATE mission_schedules SET locked_until=?
+            WHERE id=? AND (locked_until IS NULL OR locked_until < ?)
+        """, (_iso(now + timedelta(seconds=LEASE_S)), row["id"], _iso(now)))
+        if cur.rowcount == 1:
+            claimed.append(dict(row))
+    conn.commit()
+    return claimed
+
+
+def renew_lease(path: str, schedule_id: int, now: Optional[datetime] = None) -> bool:
+    """Push a held lease LEASE_S into the future; False when the row is no longer leased."""
+    now = now or datetime.now(timezone.utc)
+    conn = db_conn(path)
+    try:
+        cur = conn.execute("UPDATE mission_schedules SET locked_until=? WHERE id=? AND locked_until IS NOT NULL",
+                           (_iso(now + timedelta(seconds=LEASE_S)), int(schedule_id)))
+        conn.commit()
+        return cur.rowcount == 1
+    finally:
+        conn.close()
+
+
+class LeaseHeartbeat:
+    """Renews a schedule's lease every `every_s` seconds while the `with` block runs."""
+
+    def __init__(self, path: str, schedule_id: int, every_s: float = LEASE_S / 3):
+        self.path = path
+        self.schedule_id = schedule_id
+        self.every_s = every_s
+        self.renewals = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._beat, daemon=True)
+
+    def _beat(self):
+        while not self._stop.wait(self.every_s):
+            try:
+                if renew_lease(self.path, self.schedule_id):
+                    self.renewals += 1
+            except sqlite3.Error:
+                traceback.print_exc()  # try again on the next beat; the lease still has 2/3 left
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+
+def _save_report(conn: sqlite3.Connection, schedule: Dict[str, Any], payload: Dict[str, Any],
+                 agents: List[str], rep: Dict[str, str]) -> int:
+    from main import VAULT_PAYLOAD_FIELDS  # same fields as app.py's vault save
+
+    name = f"{schedule['name']} • scheduled {datetime.now(_tz(schedule.get('tz') or 'UTC')).strftime('%Y-%m-%d')}"
+    cur = conn.execute("""
+        INSERT INTO reports_vault (team_id,name,created_by,location,biz_name,selected_agents_json,report_json,full_report,payload_json)
+        VALUES (?,?,?,?,?,?,?,?,?)
+    """, (schedule["team_id"], name, SCHEDULER_USER, payload.get("city", ""), payload.get("biz_name", ""),
+          json.dumps(agents), json.dumps(rep), rep.get("full_report", ""),
+          json.dumps({k: payload.get(k, "") for k in VAULT_PAYLOAD_FIELDS})))
+    return cur.lastrowid
+
+
+def _load_org(path: str, team_id: str) -> Optional[Dict[str, Any]]:
+    conn = db_conn(path)
+    try:
+        row = conn.execute("SELECT * FROM orgs WHERE team_id=?", (team_id,)).fetchone()
+    except sqlite3.OperationalError:  # no orgs table (scheduler used without the app)
+        row = None
+    finally:
+        conn.close()
+    return dict(row) if row else None
+
+
+def run_schedule(schedule: Dict[str, Any], run_fn: Optional[Callable[..., Dict[str, str]]] = None,
+                 path: str = DB_PATH,
+                 multi_fn: Optional[Callable[..., Dict[str, Dict[str, str]]]] = None) -> Dict[str, Any]:
+    """Run one claimed schedule under the org's current plan, save the report(s), and book the next slot."""
+    payload = json.loads(schedule.get("payload_json") or "{}")
+    agents = json.loads(schedule.get("agents_json") or "[]")
+    status, error, report_id = "ok", "", None
+    t0 = time.time()
+    org = _load_org(path, schedule.get("team_id", ""))
+    if org is not None:
+        allowed = allowed_agents(org)
+        agents = [a for a in agents if a in allowed]
+        payload["package"] = str(org.get("plan") or payload.get("package") or "Lite")
+    if org is not None and str(org.get("status") or "active") != "active":
+        status, error = "skipped", "Organization is not active"
+    elif not agents:
+        status, error = "skipped", "None of the scheduled agents are enabled for this organization"
+    else:
+        payload.update(active_swarm=agents, stream=False, mission_id=uuid.uuid4().hex,
+                       team_id=schedule.get("team_id", ""))
+        payload.pop("prior_outputs", None)
+        try:
+            with LeaseHeartbeat(path, schedule["id"]):
+                if len(payload.get("locations") or []) > 1:
+                    if multi_fn is None:
+                        from main import run_multi_location as multi_fn
+                    reports = multi_fn(payload) or {}
+                else:
+                    if run_fn is None:
+                        from main import run_marketing_swarm as run_fn
+                    reports = {payload.get("city", ""): run_fn(payload) or {}}
+            conn = db_conn(path)
+            for city, rep in reports.items():
+                named = dict(schedule, name=f"{schedule['name']} • {city}") if len(reports) > 1 else schedule
+                report_id = _save_report(conn, named, dict(payload, city=city or payload.get("city", "")),
+                                         agents, rep)
+            conn.commit(); conn.close()
+        except Exception as e:
+            status, error = "error", f"{e}\n{traceback.format_exc(limit=3)}"[:2000]
+    try:
+        next_at, active = _iso(next_run(schedule)), 1
+    except ValueError as e:  # invalid window saved before validation: pause instead of retrying forever
+        next_at, active = None, 0
+        status, error = "error", str(e)
+    conn = db_conn(path)
+    conn.execute("""
+        UPDATE mission_schedules
+        SET last_run_at=?, last_status=?, last_error=?, last_report_id=COALESCE(?, last_report_id),
+            next_run_at=?, active=?, locked_until=NULL
+        WHERE id=?
+    """, (_iso(datetime.now(timezone.utc)), status, error, report_id, next_at, active, schedule["id"]))
+    conn.commit(); conn.close()
+    return {"id": schedule["id"], "status": status, "report_id": report_id, "seconds": round(time.time() - t0, 1)}
+
+
+def run_due(path: str = DB_PATH, workers: int = MAX_PARALLEL,
+            run_fn: Optional[Callable[..., Dict[str, str]]] = None,
+            multi_fn: Optional[Callable[..., Dict[str, Dict[str, str]]]] = None) -> List[Dict[str, Any]]:
+    conn = db_conn(path)
+    init_schedule_tables(conn)
+    due = claim_due(conn, limit=workers)
+    conn.close()
+    if not due:
+        return []
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        return list(pool.map(lambda s: run_schedule(s, run_fn=run_fn, path=path, multi_fn=multi_fn), due))
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Run scheduled marketing missions in their off-peak windows.")
+    ap.add_argument("--db", default=DB_PATH)
+    ap.add_argument("--once", action="store_true", help="run what is due now, then exit")
+    ap.add_argument("--poll", type=float, default=POLL_S, help="seconds between checks")
+    ap.add_argument("--workers", type=int, default=MAX_PARALLEL, help="missions run in parallel")
+    args = ap.parse_args()
+    while True:
+        for res in run_due(args.db, workers=args.workers):
+            print(f"⏰ schedule {res['id']}: {res['status']} in {res['seconds']}s (report {res['report_id']})", flush=True)
+        if args.once:
+            break
+        time.sleep(max(1.0, args.poll))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+"""
+Near-duplicate mission detection.
+
+Missions are normalized (directives, city matched exactly) into word
+shingles and summarized with a MinHash signature. The brand itself is not
+part of the signature, so "Acme HVAC" and "Cool Air HVAC" in Chicago with the
+same boilerplate directives are near-identical. The brand is mapped to a
+trade from a fixed vocabulary (TRADES: "Cool Air HVAC" -> "hvac", "Smith
+Dental" -> "dental"); the trade is a shingle of the signature and a match
+must have the same, known trade. A brand that names no trade in the
+vocabulary never matches anything. Storage and lookups live in app.py; this
+module is pure.
+
+Privacy rules for reusing another mission's outputs:
+  - Outputs are scrubbed before indexing: brand -> {{BRAND}}, website/domain
+    -> {{URL}}, e-mails and phone numbers removed.
+  - Same tenant: any agent, except URL_AGENTS unless the website is identical.
+  - Other tenants: only CROSS_TENANT_AGENTS (market-level content that never
+    sees the client URL or strategy), and only when both orgs opted in to
+    the shared pool.
+  - strategist synthesizes the mission's own outputs and is never reused.
+"""
+import hashlib
+import random
+import re
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+NUM_PERM = 64
+DEFAULT_THRESHOLD = 0.8
+
+URL_AGENTS = ("audit", "gbp_growth")
+CROSS_TENANT_AGENTS = ("market_researcher", "seo", "geo", "social", "ads", "creative")
+
+_PRIME = (1 << 61) - 1
+_rng = random.Random(1729)
+_PERMS = [(_rng.randrange(1, _PRIME), _rng.randrange(0, _PRIME)) for _ in range(NUM_PERM)]
+
+_STOPWORDS = {
+    "a", "an", "and", "the", "of", "for", "in", "on", "to", "with", "our", "we", "is", "are",
+    "inc", "llc", "ltd", "co", "company", "corp",
+}
+_EMAIL = re.compile(r"[\w.+-]+@[\w-]+\.[\w.-]+")
+# NANP-shaped numbers (10 digits, optional +1): "(312) 555-0100", "+1 312.555.0100".
+# Years and ranges such as "1998-2004" are not phone-shaped and stay.
+_PHONE = re.compile(r"(?<![\w+])(?:\+?1[\s.-]?)?(?:\(\d{3}\)|\d{3})[\s.-]?\d{3}[\s.-]?\d{4}(?!\w)")
+
+
+def normalize(text: str) -> List[str]:
+    words = re.findall(r"[a-z0-9]+", (text or "").lower())
+    return [w for w in words if w not in _STOPWORDS]
+
+
+def normalize_city(city: str) -> str:
+    return " ".join(normalize(city))
+
+
+def shingles(words: List[str], k: int = 2) -> Set[str]:
+    """Unigrams plus k-word shingles (unigrams keep very short texts comparable)."""
+    out = set(words)
+    out.update(" ".join(words[i:i + k]) for i in range(len(words) - k + 1))
+    return out
+
+
+def mission_text(payload: Dict[str, str]) -> str:
+    return payload.get("directives") or "standard growth optimization"
+
+
+# trade -> normalized brand words or phrases that name it
+TRADES: Dict[str, Tuple[str, ...]] = {
+    "hvac": ("hvac", "heating", "cooling", "air conditioning", "furnace", "furnaces"),
+    "plumbing": ("plumbing", "plumber", "plumbers", "drain", "drains", "sewer"),
+    "electrical": ("electric", "electrical", "electrician", "electricians"),
+    "roofing": ("roofing", "roofer", "roofers", "roof", "roofs"),
+    "landscaping": ("landscaping", "landscape", "lawn", "tree", "garden"),
+    "cleaning": ("cleaning", "cleaners", "maid", "janitorial"),
+    "pest control": ("pest", "exterminator", "exterminating", "termite"),
+    "auto repair": ("auto", "automotive", "collision", "mechanic", "tire", "tires"),
+    "dental": ("dental", "dentist", "dentistry", "orthodontics", "orthodontist"),
+    "medical": ("clinic", "medical", "chiropractic", "chiropractor", "physical therapy", "dermatology"),
+    "veterinary": ("vet", "veterinary", "animal hospital"),
+    "legal": ("law", "lawyer", "lawyers", "attorney", "attorneys", "legal"),
+    "accounting": ("accounting", "accountant", "cpa", "tax", "bookkeeping"),
+    "real estate": ("realty", "real estate", "realtor", "realtors", "properties"),
+    "restaurant": ("pizza", "pizzeria", "restaurant", "grill", "cafe", "bistro", "diner", "kitchen", "tacos"),
+    "bakery": ("bakery", "bakeshop", "bakehouse", "cakes", "donuts"),
+    "salon": ("salon", "barber", "barbershop", "spa", "nails", "hair"),
+    "fitness": ("gym", "fitness", "yoga", "pilates", "crossfit"),
+}
+
+
+def trade(payload: Dict[str, str]) -> str:
+    """Trade named by the brand ("Chicago Roofing" -> "roofing"); several join with "+", none is ""."""
+    text = f" {' '.join(normalize(payload.get('biz_name', '')))} "
+    found = [t for t, words in TRADES.items() if any(f" {w} " in text for w in words)]
+    return "+".join(found)
+
+
+def minhash(items: Iterable[str]) -> List[int]:
+    hashes = [int.from_bytes(hashlib.blake2b(s.encode("utf-8"), digest_size=8).digest(), "big") for s in items]
+    if not hashes:
+        return [_PRIME] * NUM_PERM
+    return [min((a * h + b) % _PRIME for h in hashes) for a, b in _PERMS]
+
+
+def signature(payload: Dict[str, str]) -> List[int]:
+    return minhash(shingles(normalize(mission_text(payload))) | {f"trade:{trade(payload)}"})
+
+
+def similarity(sig_a: List[int], sig_b: List[int]) -> float:
+    """Estimated Jaccard similarity of the underlying shingle sets."""
+    if not sig_a or len(sig_a) != len(sig_b):
+        return 0.0
+    return sum(1 for a, b in zip(sig_a, sig_b) if a == b) / len(sig_a)
+
+
+def _domain(url: str) -> str:
+    m = re.search(r"(?:https?://)?(?:www\.)?([^/\s]+)", url or "")
+    return m.group(1) if m else ""
+
+
+def scrub(text: str, brand: str, url: str = "") -> str:
+    """Strip tenant identifiers from an output before it is indexed."""
+    out = _EMAIL.sub("[email]", str(text or ""))
+    out = _PHONE.sub("[phone]", out)
+    if url.strip():
+        out = out.replace(url.strip(), "{{URL}}")
+        dom = _domain(url)
+        if dom:
+            out = re.sub(r"(?:https?://)?(?:www\.)?" + re.escape(dom) + r"\S*", "{{URL}}", out, flags=re.IGNORECASE)
+    if brand.strip():
+        out = re.sub(re.escape(brand.strip()), "{{BRAND}}", out, flags=re.IGNORECASE)
+    return out
+
+
+def restore(text: str, brand: str, url: str = "") -> str:
+    return str(text or "").replace("{{BRAND}}", brand or "your business").replace("{{URL}}", url or "your website")
+
+
+def allowed_agents(agents: Iterable[str], same_team: bool, url_matches: bool, both_opted_in: bool) -> List[str]:
+    """Apply the privacy rules to the agents a match could supply."""
+    agents = [a for a in agents if a != "strategist"]
+    if same_team:
+        return [a for a in agents if url_matches or a not in URL_AGENTS]
+    if not both_opted_in:
+        return []
+    return [a for a in agents if a in CROSS_TENANT_AGENTS]
+
+
+def best_match(sig: List[int], candidates: List[Dict], trade: str,
+               threshold: float = DEFAULT_THRESHOLD) -> Optional[Dict]:
+    """
+    Highest-similarity candidate (each has a "signature" list and a "trade")
+    at or above threshold. Only candidates of the same, non-empty trade count.
+    """
+    if not trade:
+        return None
+    best, best_score = None, threshold
+    for cand in candidates:
+        if cand.get("trade") != trade:
+            continue
+        score = similarity(sig, cand.get("signature") or [])
+        if score >= best_score:
+            best, best_score = dict(cand, similarity=round(score, 3)), score
+    return best
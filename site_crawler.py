@@ -0,0 +1,254 @@
+"""
+Bounded concurrent crawler for conversion audits.
+
+Starting from the client URL, crawls same-host pages breadth-first with a
+thread pool, preferring conversion pages (contact, booking, services,
+pricing, ...). It honours robots.txt, caps depth and page count, and keeps
+an on-disk cache keyed by URL: repeat audits send If-None-Match /
+If-Modified-Since and reuse the cached body on 304. The cache is bounded by
+age (SWARM_CRAWL_CACHE_DAYS) and total size (SWARM_CRAWL_CACHE_MB).
+
+The site's origin is taken from where the start URL lands after redirects
+(http -> https, example.com -> www.example.com); "www." and bare host count
+as the same site.
+
+site_digest() merges the per-page extracts (page_extract.py) into one
+token-capped digest for the audit agent.
+"""
+import hashlib
+import json
+import os
+import time
+import urllib.robotparser
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urldefrag, urlparse
+
+from digest import clip_to_tokens
+from page_extract import USER_AGENT, extract, fetch_page, render_digest
+
+DEFAULT_MAX_PAGES = 6
+DEFAULT_MAX_DEPTH = 2
+DEFAULT_WORKERS = 4
+CACHE_DIR = os.getenv("SWARM_CRAWL_CACHE", os.path.join(".cache", "site_crawl"))
+CACHE_TTL_DAYS = float(os.getenv("SWARM_CRAWL_CACHE_DAYS", "14") or 14)
+CACHE_MAX_BYTES = int(float(os.getenv("SWARM_CRAWL_CACHE_MB", "50") or 50) * 1024 * 1024)
+
+# Higher score = crawled first. Matched against the URL path.
+PAGE_PRIORITY: List[Tuple[str, int]] = [
+    ("book", 5), ("schedule", 5), ("appointment", 5), ("contact", 5), ("quote", 5), ("estimate", 5),
+    ("service", 4), ("pricing", 4), ("price", 4), ("plans", 3), ("about", 2), ("reviews", 2), ("faq", 1),
+]
+_SKIP_EXT = (".jpg", ".jpeg", ".png", ".gif", ".webp", ".svg", ".pdf", ".zip", ".mp4", ".css", ".js", ".ico", ".xml")
+
+
+def _normalize(url: str) -> str:
+    url, _frag = urldefrag(url)
+    return url.rstrip("/") or url
+
+
+def _site(url: str) -> str:
+    """Host without port or a leading "www.", for same-site checks."""
+    host = (urlparse(url).hostname or "").lower()
+    return host[4:] if host.startswith("www.") else host
+
+
+def _score(url: str) -> int:
+    path = urlparse(url).path.lower()
+    return max((s for kw, s in PAGE_PRIORITY if kw in path), default=0)
+
+
+class DiskCache:
+    """
+    One JSON file per URL: validators (ETag / Last-Modified) plus the body.
+    Entries older than max_age_days are ignored; prune() also drops the
+    oldest files until the directory fits in max_bytes.
+    """
+
+    def __init__(self, root: str = CACHE_DIR, max_age_days: float = CACHE_TTL_DAYS,
+                 max_bytes: int = CACHE_MAX_BYTES):
+        self.root = root
+        self.max_age_s = max(0.0, float(max_age_days)) * 86400
+        self.max_bytes = max(0, int(max_bytes))
+
+    def _path(self, url: str) -> str:
+        return os.path.join(self.root, hashlib.sha256(url.encode("utf-8")).hexdigest()[:32] + ".json")
+
+    def get(self, url: str) -> Optional[Dict[str, Any]]:
+        try:
+            with open(self._path(url), "r", encoding="utf-8") as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if time.time() - float(entry.get("fetched_at") or 0) > self.max_age_s:
+            return None
+        return entry
+
+    def put(self, url: str, entry: Dict[str, Any]):
+        try:
+            os.makedirs(self.root, exist_ok=True)
+            tmp = self._path(url) + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(entry, f)
+            os.replace(tmp, self._path(url))
+        except OSError:
+            pass
+
+    def prune(self) -> int:
+        """Delete expired entries, then the oldest until under max_bytes. Returns files removed."""
+        try:
+            names = [n for n in os.listdir(self.root) if n.endswith((".json", ".tmp"))]
+        except OSError:
+            return 0
+        files = []
+        for name in names:
+            path = os.path.join(self.root, name)
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            files.append((st.st_mtime, st.st_size, path))
+        files.sort()  # oldest first
+        cutoff = time.time() - self.max_age_s
+        total = sum(size for _, size, _ in files)
+        removed = 0
+        for mtime, size, path in files:
+            if mtime >= cutoff and total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            removed += 1
+        return removed
+
+
+def conditional_fetch(url: str, cache: Optional[DiskCache], timeout: float = 15.0) -> Dict[str, Any]:
+    """fetch_page with ETag / Last-Modified revalidation; adds "cache": hit|miss|none."""
+    cached = cache.get(url) if cache else None
+    headers = {}
+    if cached:
+        if cached.get("etag"):
+            headers["If-None-Match"] = cached["etag"]
+        if cached.get("last_modified"):
+            headers["If-Modified-Since"] = cached["last_modified"]
+    res = fetch_page(url, timeout=timeout, headers=headers)
+    if res["status"] == 304 and cached:
+        res.update(body=cached.get("body", ""), final_url=cached.get("final_url", url), status=200, cache="hit")
+        return res
+    res["cache"] = "miss" if cache else "none"
+    if cache and res["status"] == 200 and res["body"] and (res["headers"].get("etag") or res["headers"].get("last-modified")):
+        cache.put(url, {
+            "etag": res["headers"].get("etag", ""),
+            "last_modified": res["headers"].get("last-modified", ""),
+            "final_url": res["final_url"],
+            "body": res["body"],
+            "fetched_at": time.time(),
+        })
+    return res
+
+
+def _robots(start_url: str, timeout: float) -> urllib.robotparser.RobotFileParser:
+    parts = urlparse(start_url)
+    rp = urllib.robotparser.RobotFileParser()
+    res = fetch_page(f"{parts.scheme}://{parts.netloc}/robots.txt", timeout=timeout)
+    if res["status"] == 200 and res["body"]:
+        rp.parse(res["body"].splitlines())
+    else:
+        rp.parse([])  # no robots.txt (or unreachable): everything allowed
+    return rp
+
+
+def crawl_site(
+    start_url: str,
+    max_pages: int = DEFAULT_MAX_PAGES,
+    max_depth: int = DEFAULT_MAX_DEPTH,
+    workers: int = DEFAULT_WORKERS,
+    cache: Optional[DiskCache] = None,
+    timeout: float = 15.0,
+) -> Dict[str, Any]:
+    """
+    Returns {"pages": [page], "stats": {...}}. Each page is extract() output
+    plus status, depth, ttfb_s, total_s, raw_bytes, headers and cache state.
+    """
+    if cache is None:
+        cache = DiskCache()
+    cache.prune()
+    start = _normalize(start_url if "://" in start_url else f"https://{start_url}")
+    origin = urlparse(start)
+    site = _site(start)
+    robots = _robots(start, timeout)
+    stats = {"fetched": 0, "cache_hits": 0, "blocked_by_robots": 0, "errors": 0}
+    seen = {start}
+    bodies: set = set()  # "/" and "/index.html" are the same page
+    pages: List[Dict[str, Any]] = []
+    level = [start]
+
+    def _one(url: str) -> Optional[Dict[str, Any]]:
+        res = conditional_fetch(url, cache, timeout=timeout)
+        if res["error"] or res["status"] >= 400 or "html" not in res["headers"].get("content-type", "text/html"):
+            return {"url": url, "error": res["error"] or f"HTTP {res['status']}"}
+        page = extract(res["body"], res["final_url"])
+        page.update({k: res[k] for k in ("status", "ttfb_s", "total_s", "raw_bytes", "headers", "cache")})
+        page["body_hash"] = hashlib.sha256(res["body"].encode("utf-8")).hexdigest()
+        return page
+
+    for depth in range(max_depth + 1):
+        allowed = []
+        for url in level:
+            if robots.can_fetch(USER_AGENT, url):
+                allowed.append(url)
+            else:
+                stats["blocked_by_robots"] += 1
+        allowed = allowed[: max(0, max_pages - len(pages))]
+        if not allowed:
+            break
+        with ThreadPoolExecutor(max_workers=max(1, min(workers, len(allowed)))) as pool:
+            results = list(pool.map(_one, allowed))
+        next_links: List[str] = []
+        for page in results:
+            if page.get("error"):
+                stats["errors"] += 1
+                continue
+            if page["body_hash"] in bodies:
+                continue
+            bodies.add(page["body_hash"])
+            if depth == 0 and not pages:
+                # Links resolve against where the start page landed; crawl that origin.
+                landed = urlparse(page.get("url") or start)
+                if landed.hostname and (landed.scheme, landed.netloc) != (origin.scheme, origin.netloc):
+                    origin, site = landed, _site(page["url"])
+                    robots = _robots(page["url"], timeout)
+                    seen.add(_normalize(page["url"]))
+            page["depth"] = depth
+            pages.append(page)
+            stats["fetched"] += 1
+            stats["cache_hits"] += 1 if page.get("cache") == "hit" else 0
+            for link in page.get("links") or []:
+                parts = urlparse(_normalize(link))
+                if parts.scheme not in ("http", "https") or _site(link) != site:
+                    continue
+                # www./bare-host and http/https variants of one page collapse to the landed origin
+                link = parts._replace(scheme=origin.scheme, netloc=origin.netloc).geturl()
+                if link in seen or link.lower().endswith(_SKIP_EXT):
+                    continue
+                seen.add(link)
+                next_links.append(link)
+        if len(pages) >= max_pages:
+            break
+        level = sorted(next_links, key=_score, reverse=True)
+    return {"pages": pages, "stats": stats}
+
+
+def site_digest(crawl: Dict[str, Any], max_tokens: int) -> str:
+    """Merge per-page digests; the home page gets a double share of the budget."""
+    pages = crawl.get("pages") or []
+    if not pages:
+        return ""
+    share = max(120, max_tokens // (len(pages) + 1))
+    parts = [render_digest(p, share * (2 if i == 0 else 1)) for i, p in enumerate(pages)]
+    st = crawl.get("stats") or {}
+    head = (f"Crawled {len(pages)} page(s) "
+            f"({st.get('cache_hits', 0)} unchanged since last audit, {st.get('blocked_by_robots', 0)} blocked by robots.txt).")
+    return clip_to_tokens(head + "\n\n" + "\n\n".join(parts), max_tokens)
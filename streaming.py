@@ -0,0 +1,104 @@
+"""
+Token streaming from CrewAI LLM calls.
+
+CrewAI emits LLMStreamChunkEvent on its global event bus (source = the LLM
+instance) when an LLM is created with stream=True. One bus handler is installed
+lazily and routes chunks to whichever capture registered that LLM instance, so
+concurrent missions never see each other's tokens.
+"""
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional
+
+try:  # crewai >= 1.0
+    from crewai.events import crewai_event_bus, LLMStreamChunkEvent
+except Exception:  # pragma: no cover - older crewai layout
+    try:
+        from crewai.utilities.events import crewai_event_bus, LLMStreamChunkEvent
+    except Exception:
+        crewai_event_bus = None
+        LLMStreamChunkEvent = None
+
+_LOCK = threading.Lock()
+_ROUTES: Dict[int, Callable[[str], None]] = {}
+_INSTALLED = False
+
+
+def streaming_supported() -> bool:
+    return crewai_event_bus is not None and LLMStreamChunkEvent is not None
+
+
+def _install_handler():
+    global _INSTALLED
+    with _LOCK:
+        if _INSTALLED or not streaming_supported():
+            return
+
+        @crewai_event_bus.on(LLMStreamChunkEvent)
+        def _route_chunk(source, event):
+            cb = _ROUTES.get(id(source))
+            if cb is not None:
+                cb(str(getattr(event, "chunk", "") or ""))
+
+        _INSTALLED = True
+
+
+class StreamCapture:
+    """Accumulates chunks for one agent run and times the first token."""
+
+    def __init__(self, on_chunk: Optional[Callable[[str, "StreamCapture"], None]] = None):
+        self.on_chunk = on_chunk  # (chunk, capture); read capture.length / tail() per chunk, not text
+        self.started = time.time()
+        self.first_token_at: Optional[float] = None
+        self.length = 0
+        self._parts: List[str] = []
+
+    def feed(self, chunk: str):
+        if not chunk:
+            return
+        if self.first_token_at is None:
+            self.first_token_at = time.time()
+        self._parts.append(chunk)
+        self.length += len(chunk)
+        if self.on_chunk is not None:
+            try:
+                self.on_chunk(chunk, self)
+            except Exception:
+                pass
+
+    @property
+    def text(self) -> str:
+        if len(self._parts) > 1:
+            self._parts = ["".join(self._parts)]
+        return self._parts[0] if self._parts else ""
+
+    def tail(self, chars: int) -> str:
+        """The last `chars` characters, without joining the whole stream."""
+        out, n = [], 0
+        for part in reversed(self._parts):
+            out.append(part)
+            n += len(part)
+            if n >= chars:
+                break
+        return "".join(reversed(out))[-chars:]
+
+    @property
+    def ttft_s(self) -> Optional[float]:
+        if self.first_token_at is None:
+            return None
+        return round(self.first_token_at - self.started, 3)
+
+
+@contextmanager
+def stream_to(llm, capture: StreamCapture):
+    """Route stream chunks emitted by `llm` into `capture` for the duration."""
+    _install_handler()
+    key = id(llm)
+    with _LOCK:
+        _ROUTES[key] = capture.feed
+    try:
+        yield capture
+    finally:
+        with _LOCK:
+            _ROUTES.pop(key, None)
@@ -0,0 +1,63 @@
+import threading
+
+from digest import CHARS_PER_TOKEN, SummaryCache, digest_document, estimate_tokens
+
+
+class CountingLLM:
+    """Stands in for an LLM: returns a short bullet per call and counts the calls."""
+
+    def __init__(self, reply="- compressed facts"):
+        self.reply = reply
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def call(self, messages):
+        with self._lock:
+            self.calls += 1
+        return self.reply
+
+
+def _document(chunks=4, chunk_tokens=200):
+    return "\n".join(f"Paragraph {i}: " + f"fact {i} " * (chunk_tokens * CHARS_PER_TOKEN // 8) for i in range(chunks))
+
+
+def test_second_digest_is_all_cache_hits(tmp_path):
+    cache = SummaryCache(root=str(tmp_path))
+    llm = CountingLLM()
+    doc = _document()
+    first, stats = digest_document(doc, 120, lambda: llm, chunk_tokens=200, cache=cache)
+    assert stats["chunks"] > 1 and stats["cache_hits"] == 0 and llm.calls == stats["chunks"]
+    calls = llm.calls
+    again, stats = digest_document(doc, 120, lambda: llm, chunk_tokens=200, cache=cache)
+    assert again == first
+    assert stats["cache_hits"] == stats["chunks"] and llm.calls == calls
+    assert estimate_tokens(again) <= 120
+
+
+def test_disk_entries_survive_a_new_cache(tmp_path):
+    llm = CountingLLM()
+    doc = _document()
+    _, stats = digest_document(doc, 120, lambda: llm, chunk_tokens=200, cache=SummaryCache(root=str(tmp_path)))
+    _, stats = digest_document(doc, 120, lambda: llm, chunk_tokens=200, cache=SummaryCache(root=str(tmp_path)))
+    assert stats["cache_hits"] == stats["chunks"] and llm.calls == stats["chunks"]
+
+
+def test_failed_summaries_are_not_cached():
+    cache = SummaryCache(root=None)
+    llm = CountingLLM(reply="")
+    doc = _document()
+    _, stats = digest_document(doc, 120, lambda: llm, chunk_tokens=200, cache=cache)
+    _, stats = digest_document(doc, 120, lambda: llm, chunk_tokens=200, cache=cache)
+    assert stats["cache_hits"] == 0 and llm.calls == 2 * stats["chunks"]
+
+
+def test_memory_lru_is_bounded_by_bytes():
+    cache = SummaryCache(root=None, max_bytes=3 * (100 + 64))
+    for key in "abc":
+        cache.put(key, key * 100)
+    assert cache.get("a") == "a" * 100  # a is now the most recent
+    cache.put("d", "d" * 100)
+    assert cache.get("b") is None
+    assert [cache.get(k) is not None for k in "acd"] == [True, True, True]
+    cache.put("big", "x" * 1000)  # larger than the whole cache: not kept, nothing evicted
+    assert cache.get("big") is None and cache.get("a") is not None
@@ -0,0 +1,92 @@
+import threading
+import time
+
+import pytest
+
+from fair_share import ORG_TPM, FairShareScheduler
+from progress import AgentTimeout, CancelToken, MissionCancelled
+
+
+def _wait_queued(fs, org, n, timeout=5.0):
+    end = time.time() + timeout
+    while time.time() < end:
+        if sum(r["queued"] for r in fs.snapshot() if r["org"] == org) >= n:
+            return
+        time.sleep(0.005)
+    raise AssertionError(f"{org} never queued {n}")
+
+
+def _run_queue(fs, requests):
+    """Queue (org, plan) requests in order behind a held slot, release it, return the admission order."""
+    order, lock, threads = [], threading.Lock(), []
+    blocker = fs.acquire("blocker", "Unlimited")
+
+    def _one(org, plan):
+        with fs.slot(org, plan, cost=6000):
+            with lock:
+                order.append(org)
+
+    queued = {}
+    for org, plan in requests:
+        t = threading.Thread(target=_one, args=(org, plan))
+        t.start()
+        threads.append(t)
+        queued[org] = queued.get(org, 0) + 1
+        _wait_queued(fs, org, queued[org])
+    fs.release(blocker)
+    for t in threads:
+        t.join(10)
+    return order
+
+
+def test_small_org_is_not_stuck_behind_a_big_backlog():
+    fs = FairShareScheduler(global_concurrency=1)
+    order = _run_queue(fs, [("big", "Unlimited")] * 6 + [("small", "Lite")])
+    assert order.index("small") <= 1
+
+
+def test_admissions_follow_plan_weights():
+    fs = FairShareScheduler(global_concurrency=1)
+    order = _run_queue(fs, [("pro", "Pro")] * 6 + [("lite", "Lite")] * 6)
+    assert order[:6].count("pro") == 4 and order[:6].count("lite") == 2
+
+
+def test_cancelled_wait_refunds_virtual_time():
+    fs = FairShareScheduler(global_concurrency=1)
+    blocker = fs.acquire("blocker", "Unlimited")
+    token, errors = CancelToken(), []
+
+    def _wait():
+        try:
+            fs.acquire("org", "Lite", cost=6000, cancel=token)
+        except MissionCancelled as e:
+            errors.append(e)
+
+    t = threading.Thread(target=_wait)
+    t.start()
+    _wait_queued(fs, "org", 1)
+    assert fs._orgs["org"].finish == 6000
+    token.cancel()
+    t.join(5)
+    assert errors and fs._orgs["org"].finish == 0
+    assert [r["queued"] for r in fs.snapshot() if r["org"] == "org"] == [0]
+    fs.release(blocker)
+    assert fs.acquire("org", "Lite", cost=6000).waited_s < 0.5
+
+
+def test_charge_replaces_the_estimate_in_the_tpm_window():
+    fs = FairShareScheduler()
+    with fs.slot("org", "Lite", cost=50_000):
+        fs.charge(1200)
+    row = next(r for r in fs.snapshot() if r["org"] == "org")
+    assert row["tokens_last_min"] == 1200 and row["running"] == 0
+
+
+@pytest.mark.parametrize("plan", ["Lite", "Pro"])
+def test_org_over_its_tpm_waits(plan):
+    fs = FairShareScheduler()
+    with fs.slot("org", plan, cost=ORG_TPM[plan]):
+        pass
+    token = CancelToken(deadline_s=0.6)
+    with pytest.raises(AgentTimeout):  # still waiting on TPM room at the deadline
+        fs.acquire("org", plan, cost=1000, cancel=token)
@@ -0,0 +1,40 @@
+import pytest
+
+from fanout import LOCALIZE_BATCH, _REPLY_OVERHEAD, batches, localize_batch_size, normalize_locations
+
+CAP = 8192
+
+CITIES = [f"City {i}" for i in range(12)]
+
+
+def test_short_templates_use_the_full_batch():
+    assert localize_batch_size(300, CAP) == LOCALIZE_BATCH
+
+
+@pytest.mark.parametrize("template_tokens", [300, 1500, 2500, 4000, 7000, 20000])
+def test_batch_reply_fits_the_output_cap(template_tokens):
+    size = localize_batch_size(template_tokens, CAP)
+    assert 1 <= size <= LOCALIZE_BATCH
+    if size > 1:
+        assert size * (template_tokens * _REPLY_OVERHEAD + 50) <= CAP * 0.9
+
+
+def test_longer_templates_get_smaller_batches():
+    sizes = [localize_batch_size(t, CAP) for t in (300, 1500, 2500, 4000, 7000)]
+    assert sizes == sorted(sizes, reverse=True)
+    assert sizes[0] > sizes[-1] == 1
+
+
+def test_template_over_the_cap_still_gets_one_city_per_call():
+    assert localize_batch_size(CAP * 2, CAP) == 1
+
+
+def test_batches_cover_every_city_in_order():
+    size = localize_batch_size(2500, CAP)
+    out = batches(CITIES, size)
+    assert [c for b in out for c in b] == CITIES
+    assert all(len(b) <= size for b in out) and len(out) == -(-len(CITIES) // size)
+
+
+def test_normalize_locations_drops_blanks_and_duplicates():
+    assert normalize_locations([" Austin ", "", "austin", "Dallas", None]) == ["Austin", "Dallas"]
@@ -0,0 +1,99 @@
+import functools
+import threading
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import pytest
+
+from digest import clip_to_tokens, estimate_tokens
+from page_extract import DIGEST_TOKENS, extract, fetch_page, page_digest, render_digest
+
+FIXTURE = (Path(__file__).parent / "fixtures" / "nested_inline.html").read_text(encoding="utf-8")
+
+
+def page():
+    return extract(FIXTURE, "https://breatheeasy.example/")
+
+
+def test_headings_keep_nested_inline_text():
+    headings = page()["headings"]
+    assert "H1: Same-day AC repair in Austin" in headings
+    assert "H2: Spring tune-up special" in headings
+
+
+def test_paragraph_keeps_text_around_a_link():
+    text = page()["text"]
+    assert "We are licensed and insured, serving Central Texas homeowners since 2009." in text
+
+
+def test_unclosed_paragraphs_are_split():
+    text = page()["text"]
+    assert any(t.startswith("Unclosed paragraph about fast scheduling") and "Second" not in t for t in text)
+    assert "Second unclosed paragraph that explains our parts warranty in plain words." in text
+
+
+def test_ctas_trust_and_phones():
+    p = page()
+    assert "Book Online" in p["ctas"]
+    assert p["forms"][0]["submit"] == "Get my free quote"
+    assert any(t.startswith("We are licensed and insured") for t in p["trust"])
+    assert any("4.9 stars" in t for t in p["trust"])
+    assert "+15125550143" in p["phones"]
+    assert p["title"] == "Austin AC Repair | BreatheEasy HVAC"
+
+
+def test_digest_contains_nested_copy():
+    digest = render_digest(page())
+    assert "Spring tune-up special" in digest
+    assert "licensed and insured" in digest
+
+
+@pytest.fixture
+def fixture_server():
+    """tests/fixtures over http.server on a free local port."""
+
+    class Quiet(SimpleHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+    handler = functools.partial(Quiet, directory=str(Path(__file__).parent / "fixtures"))
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+def test_fetch_page_over_http(fixture_server):
+    res = fetch_page(f"{fixture_server}/nested_inline.html", timeout=5)
+    assert res["error"] == "" and res["status"] == 200
+    assert res["raw_bytes"] == len(FIXTURE.encode("utf-8"))
+    assert res["headers"]["content-type"].startswith("text/html")
+    assert res["body"] == FIXTURE
+    assert res["ttfb_s"] is not None and res["total_s"] >= res["ttfb_s"]
+
+
+def test_page_digest_over_http(fixture_server):
+    digest = page_digest(f"{fixture_server}/nested_inline.html", timeout=5)
+    assert digest.startswith(f"### Page: {fixture_server}/nested_inline.html")
+    assert "H1: Same-day AC repair in Austin" in digest
+    assert estimate_tokens(digest) <= DIGEST_TOKENS
+
+
+def test_page_digest_token_cap_over_http(fixture_server):
+    full = page_digest(f"{fixture_server}/nested_inline.html", timeout=5)
+    capped = page_digest(f"{fixture_server}/nested_inline.html", max_tokens=40, timeout=5)
+    assert estimate_tokens(full) > 40 >= estimate_tokens(capped)
+    assert capped.endswith("…[truncated]")
+    assert full.startswith(capped[:capped.rindex("\n")])
+
+
+def test_clip_cap_includes_the_marker():
+    for cap in (5, 12, 40):
+        assert estimate_tokens(clip_to_tokens("x" * 1000, cap)) <= cap
+
+
+def test_page_digest_missing_page_is_empty(fixture_server):
+    assert fetch_page(f"{fixture_server}/missing.html", timeout=5)["status"] == 404
+    assert page_digest(f"{fixture_server}/missing.html", timeout=5) == ""
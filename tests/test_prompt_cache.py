@@ -0,0 +1,49 @@
+from prompt_cache import LocalPromptCache, MissionPrefix, min_cache_tokens
+
+MODEL = "google/gemini-2.5-flash"
+
+
+def _big_block(model=MODEL):
+    return "brand rule " * (min_cache_tokens(model) * 2)
+
+
+def test_registers_once_and_references_every_call():
+    backend = LocalPromptCache()
+    prefix = MissionPrefix(_big_block(), backend=backend)
+    handles = {prefix.handle(MODEL) for _ in range(5)}
+    assert len(handles) == 1 and None not in handles
+    assert backend.registrations == 1
+    assert prefix.stats()["prefix_cache_refs"] == 5
+    assert prefix.stats()["prefix_cache_models"] == [MODEL]
+
+
+def test_one_registration_per_model():
+    backend = LocalPromptCache()
+    prefix = MissionPrefix(_big_block("gemini-2.0-flash"), backend=backend)
+    assert prefix.handle(MODEL) != prefix.handle("gemini-2.0-flash")
+    prefix.handle(MODEL)
+    assert backend.registrations == 2
+
+
+def test_below_minimum_is_skipped_visibly():
+    backend = LocalPromptCache()
+    prefix = MissionPrefix("short safety rules", backend=backend)
+    assert prefix.handle(MODEL) is None
+    assert backend.registrations == 0
+    assert prefix.stats()["prefix_cache_skipped"][MODEL].startswith("skipped:")
+    assert prefix.stats()["prefix_cache_refs"] == 0
+
+
+def test_without_backend_is_off():
+    prefix = MissionPrefix(_big_block())
+    assert prefix.handle(MODEL) is None
+    assert prefix.skipped[MODEL] == "off"
+
+
+def test_release_deletes_handles():
+    backend = LocalPromptCache()
+    prefix = MissionPrefix(_big_block(), backend=backend)
+    prefix.handle(MODEL)
+    prefix.release()
+    prefix.release()
+    assert backend.deletions == 1 and not backend.entries
@@ -0,0 +1,51 @@
+from report_store import ReportStore, SectionCache
+
+
+def _store(tmp_path, cache_bytes=1024 * 1024):
+    return ReportStore(str(tmp_path / "reports.db"), cache_bytes=cache_bytes)
+
+
+def test_upsert_keeps_the_section_position(tmp_path):
+    store = _store(tmp_path)
+    store.create("r1", "T1", {"biz_name": "Acme"}, ["seo", "ads", "geo"])
+    store.put("r1", {"seo": "v1", "ads": "v1", "geo": "v1"})
+    store.put("r1", {"seo": "v2"})
+    assert list(store.view("r1")) == ["seo", "ads", "geo"]
+    assert store.get("r1", "seo") == "v2"
+    store.put("r1", {"ads": None, "social": "new"})
+    assert list(store.view("r1")) == ["seo", "geo", "social"]
+
+
+def test_order_survives_a_cold_cache(tmp_path):
+    store = _store(tmp_path)
+    store.create("r1", "T1", {}, [], sections={"b": "1", "a": "2"})
+    store.put("r1", {"b": "3"})
+    fresh = _store(tmp_path)
+    assert list(fresh.view("r1")) == ["b", "a"] and fresh.view("r1")["b"] == "3"
+
+
+def test_lru_evicts_by_bytes_not_entries():
+    cache = SectionCache(max_bytes=2 * (1000 + 64))
+    cache.put(("r", "a"), "a" * 1000)
+    cache.put(("r", "b"), "b" * 1000)
+    cache.get(("r", "a"))  # b is now least recently used
+    cache.put(("r", "c"), "c" * 1000)
+    assert cache.get(("r", "b")) is None
+    assert cache.get(("r", "a")) is not None and cache.get(("r", "c")) is not None
+    assert cache.stats()["bytes"] <= cache.max_bytes
+    for i in range(20):  # many small entries fit where two large ones did
+        cache.put(("r", f"s{i}"), "x" * 10)
+    assert cache.stats()["entries"] > 2 and cache.stats()["bytes"] <= cache.max_bytes
+
+
+def test_multibyte_text_is_measured_in_utf8_bytes():
+    cache = SectionCache(max_bytes=1000)
+    cache.put(("r", "emoji"), "🔥" * 300)  # 300 characters, 1200 bytes
+    assert cache.get(("r", "emoji")) is None
+
+
+def test_evicted_sections_are_read_back_from_the_db(tmp_path):
+    store = _store(tmp_path, cache_bytes=1500)
+    store.create("r1", "T1", {}, [], sections={f"s{i}": str(i) * 1000 for i in range(5)})
+    assert store.cache.stats()["bytes"] <= 1500
+    assert [store.get("r1", f"s{i}") for i in range(5)] == [str(i) * 1000 for i in range(5)]
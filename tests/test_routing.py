@@ -0,0 +1,14 @@
+import routing
+
+
+def test_tier_report_shows_env_override(monkeypatch):
+    monkeypatch.setenv("SWARM_MODEL_LITE", "google/custom-lite")
+    routing.record_call("lite", "google/custom-lite", 1.0, 10, 5)
+    row = next(r for r in routing.tier_report() if r["tier"] == "lite")
+    assert row["primary_model"] == "google/custom-lite"
+    assert row["models"].split(" → ") == routing.tier_models("lite")
+
+
+def test_max_output_tokens_accepts_bare_names():
+    assert routing.max_output_tokens("gemini-2.5-flash") == routing.max_output_tokens("google/gemini-2.5-flash")
+    assert routing.max_output_tokens("unknown") == routing.DEFAULT_MAX_OUTPUT_TOKENS
@@ -0,0 +1,85 @@
+import time
+from datetime import datetime, timedelta, timezone
+
+import scheduler
+from scheduler import (LEASE_S, LeaseHeartbeat, claim_due, create_schedule, db_conn, init_schedule_tables,
+                       next_run, renew_lease)
+
+NOON = datetime(2026, 3, 4, 12, 0, tzinfo=timezone.utc)  # a Wednesday
+
+
+def _schedule(sid=1, **kw):
+    return dict({"id": sid, "cadence": "daily", "weekday": 0, "window_start": "01:00",
+                 "window_end": "05:00", "tz": "America/Chicago"}, **kw)
+
+
+def _local(dt, tz="America/Chicago"):
+    return dt.astimezone(scheduler._tz(tz))
+
+
+def test_next_run_is_inside_the_local_window():
+    for sid in range(50):
+        run = next_run(_schedule(sid), after=NOON)
+        local = _local(run)
+        assert run > NOON and run - NOON < timedelta(days=1)
+        assert 60 <= local.hour * 60 + local.minute < 300
+
+
+def test_window_crossing_midnight():
+    for sid in range(50):
+        local = _local(next_run(_schedule(sid, window_start="22:00", window_end="02:00"), after=NOON))
+        minutes = local.hour * 60 + local.minute
+        assert minutes >= 22 * 60 or minutes < 2 * 60
+
+
+def test_weekly_runs_on_its_weekday():
+    run = next_run(_schedule(cadence="weekly", weekday=0), after=NOON)
+    assert _local(run).weekday() == 0 and run - NOON < timedelta(days=7)
+
+
+def test_jitter_spreads_schedules_and_is_stable():
+    runs = [next_run(_schedule(sid), after=NOON) for sid in range(100)]
+    assert len(set(runs)) > 50
+    assert runs == [next_run(_schedule(sid), after=NOON) for sid in range(100)]
+    assert next_run(_schedule(7), after=NOON) != next_run(_schedule(7), after=NOON + timedelta(days=1))
+
+
+def _db(tmp_path):
+    path = str(tmp_path / "sched.db")
+    conn = db_conn(path)
+    init_schedule_tables(conn)
+    sid = create_schedule(conn, "T1", "Nightly", {"biz_name": "Acme HVAC"}, ["seo"], cadence="daily", tz="UTC")
+    return path, conn, sid
+
+
+def test_claim_is_exclusive_until_the_lease_expires(tmp_path):
+    path, conn, sid = _db(tmp_path)
+    due = datetime.strptime(conn.execute("SELECT next_run_at FROM mission_schedules").fetchone()[0],
+                            "%Y-%m-%d %H:%M:%S").replace(tzinfo=timezone.utc)
+    assert claim_due(conn, now=due - timedelta(minutes=1)) == []
+    assert [r["id"] for r in claim_due(conn, now=due)] == [sid]
+    assert claim_due(db_conn(path), now=due + timedelta(seconds=LEASE_S - 1)) == []
+    assert [r["id"] for r in claim_due(db_conn(path), now=due + timedelta(seconds=LEASE_S + 1))] == [sid]
+
+
+def test_renewed_lease_is_not_reclaimed(tmp_path):
+    path, conn, sid = _db(tmp_path)
+    due = datetime.strptime(conn.execute("SELECT next_run_at FROM mission_schedules").fetchone()[0],
+                            "%Y-%m-%d %H:%M:%S").replace(tzinfo=timezone.utc)
+    claim_due(conn, now=due)
+    later = due + timedelta(seconds=LEASE_S - 60)
+    assert renew_lease(path, sid, now=later)
+    assert claim_due(conn, now=due + timedelta(seconds=LEASE_S + 1)) == []
+    assert [r["id"] for r in claim_due(conn, now=later + timedelta(seconds=LEASE_S + 1))] == [sid]
+
+
+def test_heartbeat_renews_while_running(tmp_path):
+    path, conn, sid = _db(tmp_path)
+    conn.execute("UPDATE mission_schedules SET locked_until='2000-01-01 00:00:00' WHERE id=?", (sid,))
+    conn.commit()
+    with LeaseHeartbeat(path, sid, every_s=0.02) as beat:
+        time.sleep(0.15)
+    assert beat.renewals >= 2
+    locked = conn.execute("SELECT locked_until FROM mission_schedules WHERE id=?", (sid,)).fetchone()[0]
+    assert locked > scheduler._iso(datetime.now(timezone.utc))
+    assert not renew_lease(path, 999)
@@ -0,0 +1,46 @@
+import similarity
+
+DIRECTIVES = "standard growth optimization for local search and reviews"
+
+
+def _mission(brand, city="Chicago", directives=DIRECTIVES):
+    return {"biz_name": brand, "city": city, "directives": directives}
+
+
+def _candidate(payload):
+    return {"signature": similarity.signature(payload), "trade": similarity.trade(payload), "brand": payload["biz_name"]}
+
+
+def test_trade_from_brand():
+    assert similarity.trade(_mission("Cool Air HVAC")) == "hvac"
+    assert similarity.trade(_mission("Smith Dental")) == "dental"
+    assert similarity.trade(_mission("Smith Law Group")) == "legal"
+    assert similarity.trade(_mission("Chicago Pizza Co")) == "restaurant"
+    assert similarity.trade(_mission("Chicago Roofing")) == "roofing"
+    assert similarity.trade(_mission("Smith & Sons")) == ""
+
+
+def test_same_city_different_trade_never_matches():
+    for a, b in [("Smith Dental", "Smith Law Group"), ("Chicago Pizza Co", "Chicago Roofing"),
+                 ("Sweet Rise Bakery", "Cool Air HVAC")]:
+        mine = _mission(a)
+        assert similarity.best_match(similarity.signature(mine), [_candidate(_mission(b))],
+                                     similarity.trade(mine), threshold=0.0) is None
+
+
+def test_same_trade_and_directives_match():
+    mine = _mission("Acme HVAC")
+    match = similarity.best_match(similarity.signature(mine), [_candidate(_mission("Cool Air HVAC"))],
+                                  similarity.trade(mine))
+    assert match is not None and match["brand"] == "Cool Air HVAC" and match["similarity"] == 1.0
+
+
+def test_unknown_trade_never_matches():
+    mine = _mission("Smith & Sons")
+    other = _mission("Jones & Sons")
+    assert similarity.best_match(similarity.signature(mine), [_candidate(other)],
+                                 similarity.trade(mine), threshold=0.0) is None
+
+
+def test_trade_is_part_of_the_signature():
+    assert similarity.signature(_mission("Smith Dental")) != similarity.signature(_mission("Smith Law Group"))
@@ -0,0 +1,96 @@
+from validators import fill, validate
+
+GBP_SUBHEADINGS = """## Weekly GBP posts (7 drafts)
+""" + "\n".join(
+    f"### Post {i}: Spring tune-up\nBook your AC check before the heat.\n**CTA:** Book Online Today\n**Photo idea:** Tech at a condenser"
+    for i in range(1, 8)
+) + """
+## Positive review replies
+- Thanks, Dana!
+"""
+
+GBP_BOLD_LABELS = """## Weekly GBP posts
+""" + "\n".join(
+    f"**Post {i}:** Spring tune-up, book your AC check.\n**CTA:** Book Online Today" for i in range(1, 8)
+) + """
+
+## Review replies
+"""
+
+CREATIVE_SUBHEADINGS = """## Creative Concepts
+""" + "\n".join(
+    f"### Concept {i}: Cool Comfort\n- Angle: relief from heat\n- Visual: family indoors" for i in range(1, 6)
+) + """
+## Prompt Pack
+""" + "\n".join(f"{i}. Photo of a technician, prompt {i}" for i in range(1, 13))
+
+CREATIVE_ITEM_HEADINGS = """# Creative
+""" + "\n".join(f"### Concept {i}: Cool Comfort\nOne line pitch." for i in range(1, 6))
+
+
+def test_subheading_per_post_counts_posts():
+    assert not any(p.startswith("Weekly GBP posts") for p in validate("gbp_growth", GBP_SUBHEADINGS))
+
+
+def test_section_ends_at_same_level_heading():
+    six = GBP_SUBHEADINGS.split("### Post 7")[0] + "## Positive review replies\n" + "- Thanks!\n" * 5
+    problems = validate("gbp_growth", six)
+    assert "Weekly GBP posts (7 drafts): 6 of 7" in problems
+    assert not any(p.startswith("Positive review replies") for p in problems)
+
+
+def test_bold_label_posts_are_items_and_plain_labels_are_not():
+    assert not any(p.startswith("Weekly GBP posts") for p in validate("gbp_growth", GBP_BOLD_LABELS))
+    six = GBP_BOLD_LABELS.replace("**Post 7:** Spring tune-up, book your AC check.\n", "")
+    assert "Weekly GBP posts (7 drafts): 6 of 7" in validate("gbp_growth", six)
+
+
+def test_subheading_per_concept_counts_concepts():
+    problems = validate("creative", CREATIVE_SUBHEADINGS)
+    assert not any(p.startswith("Creative concepts") for p in problems)
+    assert not any(p.startswith("Prompt pack") for p in problems)
+
+
+def test_matched_item_heading_counts_its_siblings():
+    assert not any(p.startswith("Creative concepts") for p in validate("creative", CREATIVE_ITEM_HEADINGS))
+    four = CREATIVE_ITEM_HEADINGS.split("### Concept 5")[0]
+    assert "Creative concepts: 4 of 5" in validate("creative", four)
+
+
+def test_short_pack_is_still_flagged():
+    three = GBP_SUBHEADINGS.split("### Post 4")[0] + "## Positive review replies\n"
+    assert "Weekly GBP posts (7 drafts): 3 of 7" in validate("gbp_growth", three)
+
+
+def _table(heading, column, n, start=1):
+    return f"## {heading}\n| # | {column} |\n|---|---|\n" + "\n".join(f"| {i} | {column} {i} |" for i in range(start, start + n))
+
+
+ADS_TWO_TABLES = (
+    _table("Google Search descriptions", "Description", 3) + "\n\n"
+    + _table("Google Search headlines", "Headline", 10) + "\n\n## Notes\nKeep the brand voice."
+)
+
+
+def test_fill_rows_go_to_the_failing_sections_table():
+    assert "Google Search descriptions: 3 of 6" in validate("ads", ADS_TWO_TABLES)
+    rows = "\n".join(f"| {i} | Description {i} |" for i in range(4, 7))
+    filled = fill(ADS_TWO_TABLES, rows, "ads")
+    assert not any(p.startswith("Google Search descriptions") for p in validate("ads", filled))
+    assert not any(p.startswith("Google Search headlines") for p in validate("ads", filled))
+    lines = filled.splitlines()
+    assert lines.index("| 3 | Description 3 |") + 1 == lines.index("| 4 | Description 4 |")
+    assert lines.index("| 6 | Description 6 |") < lines.index("## Google Search headlines")
+    assert filled.endswith("## Notes\nKeep the brand voice.")
+
+
+def test_fill_rows_with_a_header_go_to_the_table_with_that_header():
+    rows = "| # | Headline |\n|---|---|\n| 11 | Headline 11 |"
+    filled = fill(ADS_TWO_TABLES, rows, "ads").splitlines()
+    assert filled.index("| 11 | Headline 11 |") == filled.index("| 10 | Headline 10 |") + 1
+    assert filled.count("| # | Headline |") == 1
+
+
+def test_fill_appends_what_is_not_table_rows():
+    filled = fill(ADS_TWO_TABLES, "## Meta hooks\n- Beat the heat", "ads")
+    assert filled.endswith("## Meta hooks\n- Beat the heat")
@@ -0,0 +1,154 @@
+"""
+Per-run wrappers around CrewAI tools.
+
+Tools are shared module-level instances in main.py; a GuardedTool wraps one
+for a single agent run so run-scoped policy applies without mutating the
+shared tool: cancellation, and a ToolBudget (tool calls, scraped bytes,
+repeated identical calls), an optional sink that receives every result
+(the mission knowledge store indexes them) and an optional condense step
+that shrinks long results (map-reduce page digests) before they reach the
+agent's context. When the budget is spent the tool answers with
+an instruction to stop and write the final answer, which ends the ReAct
+loop without failing the task.
+"""
+import json
+import threading
+from typing import Any, Callable, Dict, List, Optional
+
+try:  # crewai >= 0.80
+    from crewai.tools import BaseTool
+except Exception:  # pragma: no cover - older crewai_tools layout
+    from crewai_tools import BaseTool
+
+from progress import CancelToken
+
+# Per-agent caps for tool-using agents: ReAct iterations (Agent.max_iter),
+# tool calls and bytes of tool output. Scaled by plan; override per run with
+# inputs["tool_budgets"] = {agent_key: {"max_iter": .., "tool_calls": .., "tool_bytes": ..}}.
+TOOL_BUDGETS: Dict[str, Dict[str, int]] = {
+    "market_researcher": {"max_iter": 8, "tool_calls": 6, "tool_bytes": 200_000},
+    "analyst": {"max_iter": 6, "tool_calls": 4, "tool_bytes": 120_000},
+    "guest_posting": {"max_iter": 6, "tool_calls": 4, "tool_bytes": 120_000},
+    "audit": {"max_iter": 5, "tool_calls": 3, "tool_bytes": 300_000},
+}
+DEFAULT_TOOL_BUDGET = {"max_iter": 6, "tool_calls": 4, "tool_bytes": 120_000}
+PLAN_TOOL_SCALE: Dict[str, float] = {"Lite": 0.75, "Basic": 0.75, "Pro": 1.0, "Enterprise": 1.5, "Unlimited": 2.0}
+
+BUDGET_SPENT_MSG = (
+    "Tool budget for this task is used up. Do not call any more tools; "
+    "write your Final Answer now from the information you already have."
+)
+REPEAT_CALL_MSG = (
+    "You already called {name} with exactly these arguments and have its result above. "
+    "Do not repeat it; use what you have and write your Final Answer."
+)
+
+
+class ToolBudget:
+    """Shared by the tools of one agent kickoff; thread-safe counters for metrics."""
+
+    def __init__(self, tool_calls: int, tool_bytes: int, max_iter: int = 0):
+        self.max_calls = max(0, int(tool_calls))
+        self.max_bytes = max(0, int(tool_bytes))
+        self.max_iter = int(max_iter)
+        self.calls = 0
+        self.bytes = 0
+        self.repeats = 0
+        self.exhausted = False
+        self._seen: set = set()
+        self._lock = threading.Lock()
+
+    def admit(self, name: str, args: Dict[str, Any]) -> Optional[str]:
+        """None to run the call, or the message to return instead of running it."""
+        key = f"{name}:{json.dumps(args, sort_keys=True, default=str)}"
+        with self._lock:
+            if key in self._seen:
+                self.repeats += 1
+                return REPEAT_CALL_MSG.format(name=name)
+            if self.calls >= self.max_calls or self.bytes >= self.max_bytes:
+                self.exhausted = True
+                return BUDGET_SPENT_MSG
+            self._seen.add(key)
+            self.calls += 1
+            return None
+
+    def clip(self, result: Any) -> Any:
+        """Count the output against the byte budget; truncate what does not fit."""
+        text = result if isinstance(result, str) else str(result)
+        with self._lock:
+            room = max(0, self.max_bytes - self.bytes)
+            size = len(text.encode("utf-8"))
+            self.bytes += min(size, room)
+            if size <= room:
+                return result
+            self.exhausted = True
+        return text.encode("utf-8")[:room].decode("utf-8", "ignore") + "\n…[truncated: tool byte budget reached]"
+
+    def usage(self) -> Dict[str, Any]:
+        return {
+            "tool_calls": self.calls, "tool_calls_max": self.max_calls,
+            "tool_bytes": self.bytes, "tool_bytes_max": self.max_bytes,
+            "tool_repeats": self.repeats, "tool_budget_hit": self.exhausted,
+        }
+
+
+def tool_budget(agent_key: str, inputs: Optional[Dict[str, Any]] = None) -> ToolBudget:
+    inputs = inputs or {}
+    # a missing or unknown package gets the smallest budget, never Pro's
+    scale = PLAN_TOOL_SCALE.get(str(inputs.get("package") or "Lite"), PLAN_TOOL_SCALE["Lite"])
+    cfg = {k: max(1, int(round(v * scale))) for k, v in TOOL_BUDGETS.get(agent_key, DEFAULT_TOOL_BUDGET).items()}
+    cfg.update((inputs.get("tool_budgets") or {}).get(agent_key) or {})
+    return ToolBudget(cfg["tool_calls"], cfg["tool_bytes"], cfg["max_iter"])
+
+
+class GuardedTool(BaseTool):
+    """Delegates to `inner`; enforces cancellation and the run's ToolBudget."""
+
+    name: str = ""
+    description: str = ""
+    inner: Any = None
+    token: Any = None
+    budget: Any = None
+    sink: Any = None
+    condense: Any = None
+
+    def _run(self, *args, **kwargs) -> Any:
+        if self.token is not None:
+            self.token.check()
+        if self.budget is not None:
+            refusal = self.budget.admit(self.name, {"args": list(args), **kwargs})
+            if refusal:
+                return refusal
+        result = self.inner.run(*args, **kwargs)
+        if self.token is not None:
+            self.token.check()
+        if self.sink is not None:
+            try:
+                self.sink(self.name, {"args": list(args), **kwargs}, result)
+            except Exception:
+                pass  # indexing is best-effort; never fail the tool call
+        if self.condense is not None:
+            result = self.condense(self.name, result)
+        if self.budget is not None:
+            result = self.budget.clip(result)
+        return result
+
+
+def guard_tools(
+    tools: Optional[List[Any]],
+    token: Optional[CancelToken],
+    budget: Optional[ToolBudget] = None,
+    sink: Optional[Callable[[str, Dict[str, Any], Any], None]] = None,
+    condense: Optional[Callable[[str, Any], Any]] = None,
+) -> List[Any]:
+    guarded = []
+    for tool in tools or []:
+        if isinstance(tool, GuardedTool):
+            tool = tool.inner
+        kwargs = dict(name=tool.name, description=tool.description, inner=tool, token=token, budget=budget, sink=sink,
+                      condense=condense)
+        schema = getattr(tool, "args_schema", None)
+        if schema is not None:
+            kwargs["args_schema"] = schema
+        guarded.append(GuardedTool(**kwargs))
+    return guarded
@@ -0,0 +1,257 @@
+"""
+Structural validators for agent outputs.
+
+Each agent with a fixed deliverable shape declares Requirements (a section
+keyword and a minimum item count, or a numbered range like Day 1..30).
+validate() reports what is missing; repair() fixes formatting locally
+(code fences, chatter, broken Markdown tables). Only what is still missing
+after repair is sent back to the model, in one narrow follow-up prompt
+(followup_prompt), and the answer is spliced in with fill().
+"""
+import re
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+
+class Requirement(NamedTuple):
+    name: str
+    keyword: str          # regex matched against heading/bold/table-header lines
+    min_items: int = 0    # list items or table rows in that section
+    day_range: Optional[Tuple[int, int]] = None  # "Day N" numbering that must be complete
+
+
+VALIDATORS: Dict[str, List[Requirement]] = {
+    "ads": [
+        Requirement("Google Search headlines", r"headline", 10),
+        Requirement("Google Search descriptions", r"description", 6),
+        Requirement("Meta hooks", r"hook", 8),
+        Requirement("Meta primary texts", r"primary text", 6),
+        Requirement("Meta CTAs", r"\bcta", 5),
+    ],
+    "social": [
+        Requirement("30-day calendar rows", r"day", day_range=(1, 30)),
+    ],
+    "gbp_growth": [
+        Requirement("Weekly GBP posts (7 drafts)", r"gbp posts|weekly posts", 7),
+        Requirement("Positive review replies", r"positive", 5),
+        Requirement("Negative review replies", r"negative", 5),
+        Requirement("GBP keyword phrases", r"keyword", 15),
+        Requirement("Ranking drop triage", r"triage", 1),
+    ],
+    "creative": [
+        Requirement("Creative concepts", r"concept", 5),
+        Requirement("Prompt pack", r"prompt", 12),
+    ],
+    "guest_posting": [
+        Requirement("Pitch angles", r"pitch angle", 10),
+        Requirement("Article topic titles", r"topic", 12),
+    ],
+}
+
+_HEADING = re.compile(r"^\s*(#{1,6}\s+.+|\*\*[^*]+\*\*:?\s*|\d+\)\s+.+|\d+\.\s+\*\*.+)$")
+_ITEM = re.compile(r"^\s*(?:[-*•]\s+\S|\d+[.)]\s+\S)")
+_TABLE_SEP = re.compile(r"^\s*\|?\s*:?-{3,}")
+_DAY = re.compile(r"\bday\s*(\d{1,2})\b", re.IGNORECASE)
+# An enumerated item written as a heading or bold label: "### Post 1", "**Concept 2: Cool Comfort**".
+_ENUMERATED = re.compile(r"^\s*(?:#{1,6}\s+)?(?:\*\*)?\s*[A-Za-z][\w ]{0,24}?#?\d{1,2}\s*(?:[:.)\u2014\u2013-]|\*\*|$)")
+# A bold label carrying an item number: "**Post 1:** Book now…" (but not "**CTA:** Book now").
+_BOLD_ITEM = re.compile(r"^\s*(?:[-*•]\s+)?\*\*[^*]*\b\d{1,2}\b[^*]*\*\*")
+_CHATTER = re.compile(r"^(sure|certainly|of course|here(?:'s| is| are))\b[^\n]*\n+", re.IGNORECASE)
+
+
+def _is_table_row(line: str) -> bool:
+    s = line.strip()
+    return s.startswith("|") or (s.count("|") >= 2 and not _HEADING.match(s))
+
+
+def _level(line: str) -> int:
+    """Markdown heading level; bold-line and numbered headings rank below ######."""
+    m = re.match(r"^\s*(#{1,6})\s", line)
+    return len(m.group(1)) if m else 7
+
+
+def _is_heading(line: str) -> bool:
+    return bool(_HEADING.match(line)) and not _ITEM.match(line)
+
+
+def _section_span(lines: List[str], keyword: str) -> Optional[Tuple[int, int]]:
+    """
+    [start, end) of the lines under the first heading or table header
+    matching keyword, up to the next heading of the same or a higher level.
+    Sub-headings stay in the section (one "### Post N" per item). Enumerated
+    item headings never end a section; when the match is itself one
+    ("### Concept 1"), the section is it and its siblings, up to the parent's
+    next heading.
+    """
+    pat = re.compile(keyword, re.IGNORECASE)
+    for i, line in enumerate(lines):
+        header = _HEADING.match(line) or (_is_table_row(line) and i + 1 < len(lines) and _TABLE_SEP.match(lines[i + 1]))
+        if not (header and pat.search(line)):
+            continue
+        if not _HEADING.match(line):  # a table keeps its header row
+            end = next((j for j in range(i + 1, len(lines)) if _is_heading(lines[j])), len(lines))
+            return i, end
+        level = _level(line)
+        sibling_scope = bool(_ENUMERATED.match(line))
+        for j in range(i + 1, len(lines)):
+            nxt = lines[j]
+            if _is_heading(nxt) and not _ENUMERATED.match(nxt):
+                if _level(nxt) < level or (_level(nxt) == level and not sibling_scope):
+                    return (i if sibling_scope else i + 1), j
+        return (i if sibling_scope else i + 1), len(lines)
+    return None
+
+
+def _section(lines: List[str], keyword: str) -> Optional[List[str]]:
+    span = _section_span(lines, keyword)
+    return lines[span[0]:span[1]] if span is not None else None
+
+
+def _count_items(lines: List[str]) -> int:
+    """Largest of: table rows, list items, numbered bold labels, top-level sub-headings."""
+    rows = [ln for ln in lines if _is_table_row(ln) and not _TABLE_SEP.match(ln)]
+    # a table's first row is its header
+    table_rows = max(0, len(rows) - 1) if rows else 0
+    items = sum(1 for ln in lines if _ITEM.match(ln))
+    labels = sum(1 for ln in lines if _BOLD_ITEM.match(ln))
+    levels = [_level(ln) for ln in lines if _is_heading(ln)]
+    subs = levels.count(min(levels)) if levels else 0
+    return max(table_rows, items, labels, subs)
+
+
+def _missing_days(text: str, lo: int, hi: int) -> List[int]:
+    seen = {int(d) for d in _DAY.findall(text)}
+    # tables with a "Day" column often number the rows without the word
+    for line in _section(text.splitlines(), r"\bday\b") or []:
+        if _is_table_row(line):
+            first = line.strip().strip("|").split("|")[0].strip()
+            if first.isdigit():
+                seen.add(int(first))
+    return [d for d in range(lo, hi + 1) if d not in seen]
+
+
+def validate(agent_key: str, text: str) -> List[str]:
+    """Human-readable descriptions of what the output is missing ([] when valid)."""
+    problems: List[str] = []
+    lines = (text or "").splitlines()
+    for req in VALIDATORS.get(agent_key, []):
+        if req.day_range:
+            missing = _missing_days(text, *req.day_range)
+            if missing:
+                problems.append(f"{req.name}: Day {', '.join(map(str, missing))}")
+            continue
+        sec = _section(lines, req.keyword)
+        if sec is None:
+            problems.append(f"{req.name}: section missing (need {req.min_items})")
+            continue
+        n = _count_items(sec)
+        if n < req.min_items:
+            problems.append(f"{req.name}: {n} of {req.min_items}")
+    return problems
+
+
+def _repair_tables(lines: List[str]) -> List[str]:
+    out: List[str] = []
+    width = 0
+    for i, line in enumerate(lines):
+        if not _is_table_row(line):
+            width = 0
+            out.append(line)
+            continue
+        cells = [c.strip() for c in line.strip().strip("|").split("|")]
+        starts_table = width == 0
+        if starts_table:
+            width = len(cells)
+        elif not _TABLE_SEP.match(line):
+            cells = (cells + [""] * width)[:width]
+        if _TABLE_SEP.match(line):
+            out.append("|" + "|".join(["---"] * width) + "|")
+            continue
+        out.append("| " + " | ".join(cells) + " |")
+        nxt = lines[i + 1] if i + 1 < len(lines) else ""
+        if starts_table and not _TABLE_SEP.match(nxt):
+            out.append("|" + "|".join(["---"] * width) + "|")
+    return out
+
+
+def _unwrap(text: str) -> str:
+    s = (text or "").strip()
+    fenced = re.match(r"^```(?:markdown|md)?\s*\n(.*)\n```$", s, re.DOTALL | re.IGNORECASE)
+    if fenced:
+        s = fenced.group(1).strip()
+    return _CHATTER.sub("", s, count=1)
+
+
+def repair(text: str) -> str:
+    """Local, content-preserving fixes: unwrap fences, drop chatter, normalize tables."""
+    return "\n".join(_repair_tables(_unwrap(text).splitlines())).strip()
+
+
+def followup_prompt(text: str, problems: List[str], task: str = "") -> str:
+    """Narrow prompt for only the missing parts; shows the existing headings, not the full output."""
+    headings = [ln.strip() for ln in (text or "").splitlines() if _HEADING.match(ln)]
+    return (
+        (f"Original task:\n{task.strip()}\n\n" if task else "")
+        + "A draft deliverable is incomplete. Write ONLY the missing parts listed below, "
+        "in Markdown, matching the draft's format (same table columns where a table is used). "
+        "Do not repeat anything that already exists.\n"
+        "Missing:\n" + "\n".join(f"- {p}" for p in problems)
+        + ("\n\nExisting sections:\n" + "\n".join(headings[:40]) if headings else "")
+    )
+
+
+def _cells(row: str) -> List[str]:
+    return [c.strip().lower() for c in row.strip().strip("|").split("|")]
+
+
+def _last_table_row(lines: List[str], start: int, end: int) -> int:
+    return max((i for i in range(start, end) if _is_table_row(lines[i])), default=-1)
+
+
+def _target_table(lines: List[str], agent_key: str, header: Optional[str]) -> int:
+    """
+    Index of the last row of the table that follow-up rows belong to: the
+    table with the same header row, else the table in the first failing
+    section of agent_key's requirements; -1 when neither is found.
+    """
+    if header is not None:
+        for i, line in enumerate(lines):
+            if _is_table_row(line) and i + 1 < len(lines) and _TABLE_SEP.match(lines[i + 1]) \
+                    and _cells(line) == _cells(header):
+                end = next((j for j in range(i + 2, len(lines)) if not _is_table_row(lines[j])), len(lines))
+                return end - 1
+    text = "\n".join(lines)
+    for req in VALIDATORS.get(agent_key, []):
+        span = _section_span(lines, r"\bday\b" if req.day_range else req.keyword)
+        if span is None:
+            continue
+        failing = (_missing_days(text, *req.day_range) if req.day_range
+                   else _count_items(lines[span[0]:span[1]]) < req.min_items)
+        row = _last_table_row(lines, *span)
+        if failing and row >= 0:
+            return row
+    return -1
+
+
+def fill(text: str, addition: str, agent_key: str = "") -> str:
+    """
+    Splice follow-up content in: table rows continue the table they belong
+    to (same header, else the failing section's table), anything else is
+    appended.
+    """
+    raw = [ln for ln in _unwrap(addition).splitlines() if _is_table_row(ln)]
+    # repair() gives bare rows a separator after the first; only a sent one marks a header
+    has_header = len(raw) > 1 and bool(_TABLE_SEP.match(raw[1]))
+    addition = repair(addition)
+    if not addition:
+        return text
+    add_lines = addition.splitlines()
+    lines = (text or "").splitlines()
+    rows = [ln for ln in add_lines if _is_table_row(ln)]
+    if rows and len(rows) == len([ln for ln in add_lines if ln.strip()]):
+        if not has_header:
+            rows = [ln for ln in rows if not _TABLE_SEP.match(ln)]
+        target = _target_table(lines, agent_key, rows[0] if has_header else None)
+        if target >= 0:
+            lines[target + 1:target + 1] = rows[2:] if has_header else rows
+            return "\n".join(lines)
+    return (text or "").rstrip() + "\n\n" + addition